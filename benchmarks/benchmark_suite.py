@@ -0,0 +1,246 @@
+# benchmark_suite.py
+#
+# Benchmarks for the simulation engine of the SMT assembly line models
+# (../model and ../model_2).
+#
+# Benchmarks:
+#   model_2 : AssemblyLine.RunSimulation() for batch sizes of 1k, 16k and 256k PCBs,
+#             each without buffering, with single buffering and with double buffering.
+#   model   : SMT_simulation.run_simulation() for 10^4, 10^5 and 10^6 simulated seconds.
+#
+# Each benchmark runs in a separate Python process (the two models use
+# modules with the same names, and the peak memory of each run is measured
+# separately). For each benchmark, the following are reported:
+#   wall_time       : seconds (the best of <repeat> runs)
+#   events          : number of SimPy events processed
+#   events_per_sec  : events processed per second of wall time
+#   PCBs_finished   : number of PCBs finished
+#   events_per_PCB  : events processed per finished PCB
+#   peak_RSS_MB     : peak resident set size of the process (in MB)
+#
+# The results can be saved as a JSON baseline. In the comparison mode,
+# the results are compared with a saved baseline, and a benchmark is
+# flagged as a regression if its wall time per finished PCB or its peak_RSS_MB
+# grew, or its events_per_sec dropped, by more than <threshold> (a fraction).
+# The exit status is then 1. (A change that adds events is thus flagged even if
+# the events are processed as fast as before.) A change in the number of events
+# per PCB indicates a change in the model itself (not only in its speed), and is also reported.
+#
+# Usage:
+#   $ python3 benchmark_suite.py --save baseline.json
+#   $ python3 benchmark_suite.py --compare baseline.json --threshold 0.1
+#   $ python3 benchmark_suite.py --filter model_2.batch_1k --repeat 3
+#   $ python3 benchmark_suite.py --list
+#
+# Note: the 256k benchmarks of model_2 take a long time to run.
+#
+# Author: Neha Karanjkar
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+
+
+MODEL_DIRS = {
+    "model"   : os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model"),
+    "model_2" : os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_2"),
+}
+
+
+#===============================================
+# The benchmarks
+#===============================================
+
+def get_benchmarks():
+    benchmarks = []
+    buffering = [
+        ("no_buffering",     {"buffering_enabled":False}),
+        ("single_buffering", {"buffering_enabled":True, "double_buffering_enabled":False}),
+        ("double_buffering", {"buffering_enabled":True, "double_buffering_enabled":True}),
+    ]
+    for size_name, batch_size in [("1k", 1024), ("16k", 16*1024), ("256k", 256*1024)]:
+        for buffering_name, parameters in buffering:
+            p = dict(parameters)
+            p["batch_size"] = batch_size
+            # the run should end when the batch is finished
+            p["max_simulation_time_in_hours"] = 10**6
+            benchmarks.append({"name":"model_2.batch_"+size_name+"."+buffering_name, "model":"model_2", "parameters":p})
+    for simulation_time in [10**4, 10**5, 10**6]:
+        benchmarks.append({"name":"model.time_1e%d"%(len(str(simulation_time))-1), "model":"model", "simulation_time":simulation_time})
+    return benchmarks
+
+
+#===============================================
+# Running a single benchmark
+# (in a separate process)
+#===============================================
+
+# The models create their own SimPy environments. To count the events
+# processed, the environments are created from a subclass that keeps a list
+# of its instances (the processing of events is not affected). The number of
+# events processed is the number of events scheduled minus those still pending.
+def track_environments(simpy):
+    Environment = simpy.Environment
+    class TrackedEnvironment(Environment):
+        instances = []
+        def __init__(self, *args, **kwargs):
+            Environment.__init__(self, *args, **kwargs)
+            TrackedEnvironment.instances.append(self)
+    simpy.Environment = TrackedEnvironment
+    return TrackedEnvironment
+
+def get_events_processed(env):
+    return next(env._eid) - len(env._queue)
+
+
+def run_model_2(benchmark):
+    import AssemblyLine
+    for name, value in benchmark["parameters"].items():
+        assert(hasattr(AssemblyLine, name)),("unknown parameter "+name)
+        setattr(AssemblyLine, name, value)
+    AssemblyLine.print_activity_log = False
+    # keep a reference to the line, to count the PCBs finished
+    lines = []
+    build = AssemblyLine.BuildAssemblyLine
+    def build_and_keep(env):
+        lines.append(build(env))
+        return lines[-1]
+    AssemblyLine.BuildAssemblyLine = build_and_keep
+    AssemblyLine.RunSimulation()
+    return lines[0].sink_1.num_items_finished
+
+def run_model(benchmark):
+    import SMT_simulation
+    simulator = SMT_simulation.SMT_simulation(cache_size=1)
+    finished = []
+    def progress(simulated_time, num_PCBs_completed, get_snapshot):
+        if(simulated_time>=benchmark["simulation_time"]):
+            finished.append(num_PCBs_completed)
+        return True
+    simulator.run_simulation(benchmark["simulation_time"], False, progress_callback=progress, progress_step=benchmark["simulation_time"])
+    return finished[0]
+
+
+def run_benchmark(benchmark):
+    sys.path.insert(0, os.path.abspath(MODEL_DIRS[benchmark["model"]]))
+    import simpy
+    environments = track_environments(simpy)
+
+    # the models print their reports into sys.stdout
+    original_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        start = time.perf_counter()
+        if(benchmark["model"]=="model_2"):
+            PCBs_finished = run_model_2(benchmark)
+        else:
+            PCBs_finished = run_model(benchmark)
+        wall_time = time.perf_counter() - start
+    finally:
+        sys.stdout = original_stdout
+
+    events = sum([get_events_processed(env) for env in environments.instances])
+    return {"wall_time":wall_time, "events":events, "events_per_sec":events/wall_time,
+            "PCBs_finished":PCBs_finished, "events_per_PCB":events/float(max(PCBs_finished,1)),
+            "peak_RSS_MB":resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0}
+
+
+# run a benchmark in a new process (<repeat> times) and keep the fastest run
+def run_in_subprocess(benchmark, repeat):
+    best = None
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-one", json.dumps(benchmark)],
+                                stdout=subprocess.PIPE, check=True, cwd=os.path.abspath(MODEL_DIRS[benchmark["model"]])).stdout
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        if(best==None or result["wall_time"]<best["wall_time"]):
+            best = result
+    return best
+
+
+#===============================================
+# Comparison with a baseline
+#===============================================
+
+# Returns a list of (benchmark name, message, is_regression)
+def compare(results, baseline, threshold):
+    findings = []
+    for name, r in results.items():
+        if(name not in baseline):
+            continue
+        b = baseline[name]
+        r_time = r["wall_time"]/max(r["PCBs_finished"],1)
+        b_time = b["wall_time"]/max(b["PCBs_finished"],1)
+        change = r_time/b_time - 1.0
+        if(change > threshold):
+            findings.append((name, "wall time per PCB grew by %0.1f%% (%0.3g s -> %0.3g s)"%(change*100, b_time, r_time), True))
+        elif(change < -threshold):
+            findings.append((name, "wall time per PCB improved by %0.1f%% (%0.3g s -> %0.3g s)"%(-change*100, b_time, r_time), False))
+        change = r["events_per_sec"]/b["events_per_sec"] - 1.0
+        if(change < -threshold):
+            findings.append((name, "events/sec dropped by %0.1f%% (%0.0f -> %0.0f)"%(-change*100, b["events_per_sec"], r["events_per_sec"]), True))
+        elif(change > threshold):
+            findings.append((name, "events/sec improved by %0.1f%% (%0.0f -> %0.0f)"%(change*100, b["events_per_sec"], r["events_per_sec"]), False))
+        change = r["peak_RSS_MB"]/b["peak_RSS_MB"] - 1.0
+        if(change > threshold):
+            findings.append((name, "peak RSS grew by %0.1f%% (%0.1f MB -> %0.1f MB)"%(change*100, b["peak_RSS_MB"], r["peak_RSS_MB"]), True))
+        if(abs(r["events_per_PCB"]-b["events_per_PCB"]) > 1e-6*b["events_per_PCB"]):
+            findings.append((name, "events per PCB changed (%0.2f -> %0.2f): the model behaves differently"%(b["events_per_PCB"], r["events_per_PCB"]), False))
+    return findings
+
+
+def print_results(results, file=None):
+    file = file if file!=None else sys.stdout
+    print("%-40s %10s %12s %14s %10s %12s %10s"%("benchmark", "wall (s)", "events", "events/sec", "PCBs", "events/PCB", "RSS (MB)"), file=file)
+    for name, r in results.items():
+        print("%-40s %10.2f %12d %14.0f %10d %12.2f %10.1f"%(name, r["wall_time"], r["events"], r["events_per_sec"], r["PCBs_finished"], r["events_per_PCB"], r["peak_RSS_MB"]), file=file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the SMT assembly line models")
+    parser.add_argument("--filter", default="", help="run only the benchmarks whose names contain this string")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs per benchmark (the fastest is kept)")
+    parser.add_argument("--save", default=None, help="save the results as a JSON baseline into this file")
+    parser.add_argument("--compare", default=None, help="compare the results with the JSON baseline in this file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="fraction by which a benchmark may get worse before it is flagged")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    parser.add_argument("--run-one", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if(args.run_one!=None):
+        print(json.dumps(run_benchmark(json.loads(args.run_one))))
+        sys.exit(0)
+
+    benchmarks = [b for b in get_benchmarks() if args.filter in b["name"]]
+    if(args.list):
+        for b in benchmarks:
+            print(b["name"])
+        sys.exit(0)
+
+    results = {}
+    for b in benchmarks:
+        results[b["name"]] = run_in_subprocess(b, args.repeat)
+        print("%-40s %10.2f seconds, %14.0f events/sec"%(b["name"], results[b["name"]]["wall_time"], results[b["name"]]["events_per_sec"]), file=sys.stderr)
+    print_results(results)
+
+    if(args.save!=None):
+        baseline = {"python":platform.python_version(), "machine":platform.machine(), "results":results}
+        with open(args.save, "w") as f:
+            json.dump(baseline, f, indent=1)
+        print("Baseline saved in", args.save)
+
+    if(args.compare!=None):
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        findings = compare(results, baseline, args.threshold)
+        print("\nComparison with", args.compare, "(threshold = %0.0f%%):"%(args.threshold*100))
+        for name, message, is_regression in findings:
+            print(("REGRESSION " if is_regression else "           ")+name+": "+message)
+        if(len(findings)==0):
+            print("no significant changes")
+        if(any([f[2] for f in findings])):
+            sys.exit(1)
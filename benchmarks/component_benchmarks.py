@@ -0,0 +1,218 @@
+# component_benchmarks.py
+#
+# Micro-benchmarks for individual components of the assembly line
+# model in ../model_2: Buffer, ConveyorBelt, ReflowOven and the
+# PCB buffering modules (single, double and multi-bank).
+#
+# Each component is driven in isolation by a synthetic producer,
+# which puts a PCB at its input every <interval> seconds (at the middle of
+# time-slots), and a consumer, which takes PCBs from its output as soon as
+# they are available (at integer time instants). This follows the timing
+# convention of the model (see ../model_2/README.txt).
+#
+# The size parameter of each component is swept:
+#   Buffer              : capacity (1 to 10^6). The consumer starts only after
+#                         the buffer has been filled, so that it stays full.
+#   ConveyorBelt        : num_stages (2 to 1000)
+#   ReflowOven          : num_stages (2 to 1000)
+#   buffering modules   : capacity_per_stage (2 to 10^6), with 1, 2 and 4 banks
+#
+# For each run, the cost per item is reported, in SimPy events and in
+# nanoseconds of wall time (the events are counted as in benchmark_suite.py).
+# The results can be saved as JSON, and compared with a previous run.
+#
+# Usage:
+#   $ python3 component_benchmarks.py --save components.json
+#   $ python3 component_benchmarks.py --filter ConveyorBelt --max-size 1000
+#   $ python3 component_benchmarks.py --compare components.json
+#
+# Note: the largest sizes take a long time to run.
+#
+# Author: Neha Karanjkar
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_2"))
+import simpy
+from PCB import PCB
+from Buffer import Buffer
+from ConveyorBelt import ConveyorBelt
+from ReflowOven import ReflowOven
+from PCBMultiBufferingModule import PCBMultiBufferingModule
+
+from benchmark_suite import get_events_processed
+
+
+#===============================================
+# Synthetic producer and consumer
+#===============================================
+
+class Producer():
+
+    def __init__(self, env, outp, interval, num_items):
+        self.env = env
+        self.outp = outp
+        self.interval = interval
+        self.num_items = num_items
+        self.num_items_produced = 0
+        self.process = env.process(self.behavior())
+
+    def behavior(self):
+        # put at the middle of time-slots
+        yield self.env.timeout(0.5)
+        while(self.num_items_produced < self.num_items):
+            self.num_items_produced += 1
+            yield self.outp.put(PCB(type_ID=0, serial_ID=self.num_items_produced, creation_timestamp=self.env.now))
+            yield self.env.timeout(self.interval)
+
+
+class Consumer():
+
+    def __init__(self, env, inp, num_items, start_time=0):
+        self.env = env
+        self.inp = inp
+        self.num_items = num_items
+        self.start_time = start_time
+        self.num_items_consumed = 0
+        self.done = simpy.events.Event(env)
+        self.process = env.process(self.behavior())
+
+    def behavior(self):
+        yield self.env.timeout(self.start_time)
+        while(self.num_items_consumed < self.num_items):
+            # get at integer time instants
+            if(self.inp.can_get()):
+                yield self.inp.get()
+                self.num_items_consumed += 1
+                yield self.env.timeout(1)
+            else:
+                yield self.env.timeout(1)
+        self.done.succeed()
+
+
+#===============================================
+# Harnesses for each component.
+# Each returns (the component's input, output, and
+# the time at which the consumer should start).
+#===============================================
+
+def setup_buffer(env, size, num_items, interval):
+    buffer = Buffer(env, "buffer", capacity=size)
+    # start consuming once the buffer is full
+    return buffer, buffer, math.ceil(size*interval)
+
+def setup_conveyor_belt(env, size, num_items, interval):
+    belt = ConveyorBelt(env, "belt", num_stages=size, delay_per_stage=1)
+    return belt, belt, 0
+
+def setup_reflow_oven(env, size, num_items, interval):
+    inp = Buffer(env, "inp", capacity=1)
+    outp = Buffer(env, "outp", capacity=1)
+    oven = ReflowOven(env, "reflow_oven", inp=inp, outp=outp)
+    oven.num_stages = size
+    oven.delay_per_stage = 1
+    return inp, outp, 0
+
+def make_buffering_module_setup(num_banks):
+    def setup_buffering_module(env, size, num_items, interval):
+        inp = Buffer(env, "inp", capacity=1)
+        outp = Buffer(env, "outp", capacity=1)
+        module = PCBMultiBufferingModule(env, "buffering_module", inp=inp, outp=outp, num_banks=num_banks)
+        module.capacity_per_stage = size
+        module.enable_buffering()
+        return inp, outp, 0
+    return setup_buffering_module
+
+
+def sizes_up_to(max_size, min_size=1):
+    sizes = []
+    s = 1
+    while(s<=max_size):
+        if(s>=min_size):
+            sizes.append(s)
+        s *= 10
+    return sizes
+
+def get_benchmarks(max_size, num_items):
+    benchmarks = []
+    for size in sizes_up_to(min(max_size, 10**6)):
+        benchmarks.append({"name":"Buffer.capacity_%d"%size, "setup":setup_buffer, "size":size,
+                           "num_items":num_items+size})
+    for size in [2]+sizes_up_to(min(max_size, 1000), min_size=10):
+        benchmarks.append({"name":"ConveyorBelt.num_stages_%d"%size, "setup":setup_conveyor_belt, "size":size, "num_items":num_items})
+        benchmarks.append({"name":"ReflowOven.num_stages_%d"%size, "setup":setup_reflow_oven, "size":size, "num_items":num_items})
+    for num_banks in [1, 2, 4]:
+        for size in [2]+sizes_up_to(min(max_size, 10**6), min_size=10):
+            # the banks are drained only when full
+            n = max(num_items, 2*num_banks*size)
+            n = int(math.ceil(n/float(size)))*size
+            benchmarks.append({"name":"BufferingModule_%d_banks.capacity_%d"%(num_banks, size),
+                               "setup":make_buffering_module_setup(num_banks), "size":size, "num_items":n})
+    return benchmarks
+
+
+def run_benchmark(benchmark, interval):
+    env = simpy.Environment()
+    inp, outp, start_time = benchmark["setup"](env, benchmark["size"], benchmark["num_items"], interval)
+    producer = Producer(env, inp, interval, benchmark["num_items"])
+    consumer = Consumer(env, outp, benchmark["num_items"], start_time)
+
+    # the components print an activity log into sys.stdout
+    original_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        start = time.perf_counter()
+        env.run(until=consumer.done)
+        wall_time = time.perf_counter() - start
+    finally:
+        sys.stdout = original_stdout
+
+    n = consumer.num_items_consumed
+    events = get_events_processed(env)
+    return {"size":benchmark["size"], "items":n, "simulated_time":env.now, "wall_time":wall_time,
+            "events":events, "events_per_item":events/float(n), "ns_per_item":wall_time*1e9/n}
+
+
+def print_results(results, file=None):
+    file = file if file!=None else sys.stdout
+    print("%-45s %10s %12s %12s %14s"%("benchmark", "items", "wall (s)", "events/item", "ns/item"), file=file)
+    for name, r in results.items():
+        print("%-45s %10d %12.3f %12.2f %14.0f"%(name, r["items"], r["wall_time"], r["events_per_item"], r["ns_per_item"]), file=file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the components of model_2")
+    parser.add_argument("--filter", default="", help="run only the benchmarks whose names contain this string")
+    parser.add_argument("--max-size", type=int, default=10**6, help="largest size (capacity or number of stages) to run")
+    parser.add_argument("--items", type=int, default=10000, help="number of items to pass through each component")
+    parser.add_argument("--interval", type=int, default=1, help="time between items put by the producer (seconds)")
+    parser.add_argument("--save", default=None, help="save the results as JSON into this file")
+    parser.add_argument("--compare", default=None, help="compare the results with those saved in this file")
+    args = parser.parse_args()
+
+    results = {}
+    for b in get_benchmarks(args.max_size, args.items):
+        if(args.filter not in b["name"]):
+            continue
+        results[b["name"]] = run_benchmark(b, args.interval)
+        print("%-45s %14.0f ns/item"%(b["name"], results[b["name"]]["ns_per_item"]), file=sys.stderr)
+    print_results(results)
+
+    if(args.save!=None):
+        with open(args.save, "w") as f:
+            json.dump({"items":args.items, "interval":args.interval, "results":results}, f, indent=1)
+        print("Results saved in", args.save)
+
+    if(args.compare!=None):
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+        print("\nComparison with", args.compare, "(ns per item, events per item):")
+        for name, r in results.items():
+            if(name in previous):
+                p = previous[name]
+                print("%-45s %+7.1f%% %+7.1f%%"%(name, (r["ns_per_item"]/p["ns_per_item"]-1)*100, (r["events_per_item"]/p["events_per_item"]-1)*100))
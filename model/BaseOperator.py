@@ -54,6 +54,15 @@ class BaseOperator(object):
         self.state_change_timestamp=self.env.now
 
 
+    # fraction of time spent in each state so far
+    # (including the time spent in the current state).
+    # Unlike print_utilization, this does not modify the stats.
+    def get_utilization(self):
+        t = list(self.time_spent_in_state)
+        t[self.states.index(self.current_state)] += self.env.now - self.state_change_timestamp
+        total_time = max(sum(t),1e-9)
+        return [x/total_time for x in t]
+
     # print time spent in each state
     def print_utilization(self):
         
@@ -96,6 +96,13 @@ class ConveyorBelt(BaseOperator):
         s+= "*|" if(len(self.output_buf.items)!=0 and self.output_buf.items[0]!=None) else " |"
         return s
       
+    # number of jobs currently on the belt
+    def get_occupancy(self):
+        n = len([x for x in self.input_buf.items if x!=None])
+        n+= len([1 for i in range(1,self.capacity-1) if self.stages[i]!=None])
+        n+= len([x for x in self.output_buf.items if x!=None])
+        return n
+
     def empty(self):
         if (len(self.input_buf.items)!=0):
             return False
@@ -42,6 +42,16 @@ class HumanOperator(BaseOperator):
 
     def behavior(self):
         
+        self.task_is_ongoing = False
+        self.current_task=None
+        self.current_task_delay = 0
+        self.current_task_start_time = 0
+
+        #queued-up tasks to be performed.
+        #(a machine can interrupt the operator while
+        # it is busy with another task)
+        self.pending_tasks_queue = []
+
         self.change_state("idle")
         # stay idle until interrupted by a machine.
         # when interrupted, perform the assigned task
@@ -49,14 +59,41 @@ class HumanOperator(BaseOperator):
         while True:
 
             try:
-                # wait for some arbitrary time
-                # until interrupted
-                yield self.env.timeout(10)
+                # if a task was ongoing before we were interrupted,
+                # resume and finish the task.
+                if(self.task_is_ongoing):
+                    print("T=",self.env.now,self.name,"resuming task",self.current_task.task_name)
+                    self.current_task_start_time = self.env.now
+                    yield self.env.timeout(self.current_task_delay)
+                    self.task_is_ongoing = False
+                    self.current_task.task_ptr(machine=self.current_task.machine_ptr)
+                    print("T=",self.env.now,self.name,"finished task",self.current_task.task_name)
+                    self.change_state("idle")
+
+                # if there are any pending tasks,
+                # perform the first task in the list.
+                if(len(self.pending_tasks_queue)>=1):
+                    self.current_task = self.pending_tasks_queue.pop(0)
+                    self.current_task_delay = self.current_task.delay
+                    self.current_task_start_time = self.env.now
+                    self.task_is_ongoing = True
+                    self.change_state("busy")
+
+                    #perform the task
+                    print("T=",self.env.now,self.name,"starting task",self.current_task.task_name)
+                    yield self.env.timeout(self.current_task_delay)
+                    self.task_is_ongoing = False
+                    self.current_task.task_ptr(machine=self.current_task.machine_ptr)
+                    print("T=",self.env.now,self.name,"finished task",self.current_task.task_name)
+                    self.change_state("idle")
+
+                else:
+                    # wait for some arbitrary time
+                    # until interrupted
+                    yield self.env.timeout(10)
 
             except simpy.Interrupt as i:
                 
-                self.change_state("busy")
-                            
                 machine_name, cause = i.cause.split(":")
                 print("T=",self.env.now,self.name,"was interrupted by",machine_name,"for",cause)
 
@@ -68,13 +105,11 @@ class HumanOperator(BaseOperator):
                 assert(len(task)==1)
                 task=task[0]
 
-                
-                #perform the task
-                print("T=",self.env.now,self.name,"starting task",cause)
-                yield self.env.timeout(task.delay)
-                
-                task.task_ptr(machine=task.machine_ptr)
-                print("T=",self.env.now,self.name,"finished task",cause)
-
-                self.change_state("idle")
+                # add the requested task to the pending_tasks_queue
+                # to be performed later.
+                self.pending_tasks_queue.append(task)
 
+                # if there was a task ongoing when this interrupt happened,
+                # note down the remaining time for this task.
+                if(self.task_is_ongoing):
+                    self.current_task_delay = self.current_task_delay - (self.env.now - self.current_task_start_time)
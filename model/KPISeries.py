@@ -0,0 +1,73 @@
+# KPISeries.py
+#
+# A time-series of KPI values (for live plotting) that holds
+# at most <max_points> points, irrespective of the length of the run.
+#
+# Incoming samples are averaged into buckets of <stride> samples.
+# When the series becomes full, adjacent points are merged pairwise
+# (halving the number of points) and the stride is doubled.
+# Thus the memory used and the cost of redrawing a plot
+# remain constant, while the points always span the entire run.
+#
+# Usage:
+#   series = KPISeries(max_points=256)
+#   series.add(t, value)
+#   series.get_points()  # --> [(t0,v0),(t1,v1),...]
+#
+# Author: Neha Karanjkar
+
+
+class KPISeries():
+
+    def __init__(self, max_points=256):
+        assert(isinstance(max_points,int) and max_points>=2 and max_points%2==0)
+        self.max_points = max_points
+
+        # downsampled points
+        self.times = []
+        self.values = []
+
+        # number of samples averaged into each point
+        self.stride = 1
+
+        # the bucket currently being filled
+        self.bucket_time = 0.0
+        self.bucket_sum = 0.0
+        self.bucket_count = 0
+
+        self.num_samples = 0
+
+    def add(self, t, value):
+        self.num_samples += 1
+        self.bucket_time = t
+        self.bucket_sum += value
+        self.bucket_count += 1
+        if(self.bucket_count < self.stride):
+            return
+
+        # the bucket is full. Append it as a new point.
+        self.times.append(self.bucket_time)
+        self.values.append(self.bucket_sum/self.bucket_count)
+        self.bucket_sum = 0.0
+        self.bucket_count = 0
+
+        # merge adjacent points if the series is full
+        if(len(self.times) >= self.max_points):
+            self.times = self.times[1::2]
+            self.values = [(self.values[i]+self.values[i+1])/2.0 for i in range(0,len(self.values),2)]
+            self.stride *= 2
+
+    # list of (time,value) points including
+    # the partially filled bucket (if any)
+    def get_points(self):
+        points = list(zip(self.times, self.values))
+        if(self.bucket_count>0):
+            points.append((self.bucket_time, self.bucket_sum/self.bucket_count))
+        return points
+
+    def get_last_value(self):
+        if(self.bucket_count>0):
+            return self.bucket_sum/self.bucket_count
+        if(len(self.values)>0):
+            return self.values[-1]
+        return None
@@ -0,0 +1,112 @@
+# ParameterSweep.py
+#
+# Runs the SMT simulation for every point in a grid
+# of values of one or two model parameters, in parallel,
+# using a pool of worker processes.
+#
+# The results of each point (the final values of the KPIs,
+# see SMT_simulation.get_kpi_snapshot) become available as soon
+# as that point finishes, so that a table of results can be
+# filled progressively.
+#
+# Usage:
+#   sweep = ParameterSweep(parameter_values, simulation_time,
+#               sweep_parameters=[("screen_printer","delay",[5,10,15]), ("line_loader","delay",[1,2])])
+#   sweep.start()
+#   ...
+#   for (index, kpis) in sweep.get_completed_points():  # (non-blocking)
+#       ...  # index is a tuple (i,) or (i,j) into the lists of values
+#   sweep.cancel()
+#
+# Author: Neha Karanjkar
+
+import copy
+import itertools
+import multiprocessing
+import os
+import concurrent.futures
+
+import SMT_simulation
+
+
+# Function executed in a worker process:
+# run the simulation for one point and
+# return the final values of the KPIs.
+def run_sweep_point(parameter_values, simulation_time):
+    simulator = SMT_simulation.SMT_simulation()
+    simulator.set_parameter_values(parameter_values)
+    snapshot = {}
+    def save_snapshot(simulated_time, num_pcbs_completed, get_snapshot):
+        if(simulated_time >= simulation_time):
+            snapshot.update(get_snapshot())
+        return True
+    simulator.run_simulation(simulation_time, False, progress_callback=save_snapshot, progress_step=simulation_time)
+    return snapshot
+
+
+class ParameterSweep():
+
+    def __init__(self, parameter_values, simulation_time, sweep_parameters, num_workers=None):
+        assert(simulation_time>=1)
+        assert(len(sweep_parameters)==1 or len(sweep_parameters)==2)
+        for (machine_id, param, values) in sweep_parameters:
+            assert(param in parameter_values[machine_id])
+            assert(len(values)>=1)
+
+        self.parameter_values = parameter_values
+        self.simulation_time = simulation_time
+        self.sweep_parameters = sweep_parameters
+        self.num_workers = num_workers if num_workers!=None else max(os.cpu_count()-1,1)
+
+        # indices of all points in the grid
+        self.points = list(itertools.product(*[range(len(p[2])) for p in sweep_parameters]))
+        self.results = {}
+        self.futures = {}
+        self.executor = None
+
+    # parameter values at a point in the grid
+    def get_point_parameter_values(self, index):
+        values = copy.deepcopy(self.parameter_values)
+        for k in range(len(index)):
+            machine_id, param, param_values = self.sweep_parameters[k]
+            values[machine_id][param] = param_values[index[k]]
+        return values
+
+    def start(self):
+        # A "spawn" context is used, so that the worker processes do not
+        # inherit the state of the GUI (windows, graphics context etc).
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.num_workers, mp_context=multiprocessing.get_context("spawn"))
+        for index in self.points:
+            future = self.executor.submit(run_sweep_point, self.get_point_parameter_values(index), self.simulation_time)
+            self.futures[future] = index
+
+    # return a list of (index, kpis) for all points that have
+    # finished since the last call. (does not block)
+    def get_completed_points(self):
+        completed = []
+        for future in [f for f in self.futures if f.done()]:
+            index = self.futures.pop(future)
+            if(future.cancelled()):
+                continue
+            if(future.exception()!=None):
+                kpis = {"error":str(future.exception())}
+            else:
+                kpis = future.result()
+            self.results[index] = kpis
+            completed.append((index, kpis))
+        if(len(self.futures)==0 and self.executor!=None):
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        return completed
+
+    def is_running(self):
+        return len(self.futures)!=0
+
+    def get_num_completed_points(self):
+        return len(self.results)
+
+    # cancel all points that have not yet started.
+    # (points that are already running are allowed to finish)
+    def cancel(self):
+        if(self.executor!=None):
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,77 @@
+# ResultsCache.py
+#
+# A cache of simulation results, indexed by a key
+# (see SMT_simulation.get_cache_key).
+#
+# Results are held in a bounded in-memory LRU (least recently used)
+# table of at most <max_entries> entries. If a <cache_dir> is specified,
+# results are also written into files in that directory (one file per key),
+# so that they are available across sessions. A result found on disk is
+# moved into the in-memory table.
+#
+# Usage:
+#   cache = ResultsCache(max_entries=32, cache_dir=None)
+#   cache.put(key, results_text)
+#   cache.get(key)  # --> results_text or None
+#
+# Author: Neha Karanjkar
+
+import os
+from collections import OrderedDict
+
+
+class ResultsCache():
+
+    def __init__(self, max_entries=32, cache_dir=None):
+        assert(isinstance(max_entries,int) and max_entries>=1)
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        if(cache_dir!=None and not os.path.isdir(cache_dir)):
+            os.makedirs(cache_dir)
+
+        # key --> results, in the order of use
+        # (the least recently used entry is first)
+        self.entries = OrderedDict()
+
+        #stats
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def get_file_name(self, key):
+        return os.path.join(self.cache_dir, key+".txt")
+
+    # returns the cached results for a key, or None
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.num_hits += 1
+            return self.entries[key]
+        if(self.cache_dir!=None and os.path.isfile(self.get_file_name(key))):
+            with open(self.get_file_name(key)) as f:
+                results = f.read()
+            self.add_entry(key, results)
+            self.num_hits += 1
+            return results
+        self.num_misses += 1
+        return None
+
+    def put(self, key, results):
+        self.add_entry(key, results)
+        if(self.cache_dir!=None):
+            # write to a temporary file first, so that
+            # a partially written file is never read.
+            file_name = self.get_file_name(key)
+            with open(file_name+".tmp", "w") as f:
+                f.write(results)
+            os.replace(file_name+".tmp", file_name)
+
+    # add an entry into the in-memory table,
+    # evicting the least recently used entry if required.
+    def add_entry(self, key, results):
+        self.entries[key] = results
+        self.entries.move_to_end(key)
+        if(len(self.entries) > self.max_entries):
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries = OrderedDict()
@@ -17,10 +17,17 @@ from kivy.uix.image  import Image
 from kivy.uix.tabbedpanel import TabbedPanel
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.checkbox import CheckBox
-from kivy.graphics import Color, Rectangle
+from kivy.uix.spinner import Spinner
+from kivy.graphics import Color, Rectangle, Line
+from kivy.properties import StringProperty
+from collections import OrderedDict
+from kivy.clock import Clock
 
 # Simulator-related
 import SMT_simulation
+from SimulationWorker import SimulationWorker
+from KPISeries import KPISeries
+from ParameterSweep import ParameterSweep
 
 
 Builder.load_string("""
@@ -94,11 +101,20 @@ Builder.load_string("""
                     text: 'Generate detailed activity log:'
                 CheckBox:
                     id:checkbox_enable_activity_log
-            Button:
-                text: 'Run Simulation'
-                on_press:root.run_simulation()
+            GridLayout:
+                cols:2
+                spacing:5
                 size_hint_y:None
                 height:60
+                Button:
+                    id: button_run_simulation
+                    text: 'Run Simulation'
+                    on_press:root.run_simulation()
+                Button:
+                    id: button_cancel_simulation
+                    text: 'Cancel'
+                    disabled: True
+                    on_press:root.cancel_simulation()
             Label:
                 id: activity_log
                 text: ""
@@ -119,6 +135,120 @@ Builder.load_string("""
                         size_hint: None, None
                         width: self.texture_size[0]
                         height: self.texture_size[1]
+
+    TabbedPanelItem:
+        text: 'Live KPIs'
+        GridLayout:
+            cols:2
+            spacing:10
+            padding:10
+            KPIPlot:
+                id:plot_throughput
+                title:"Throughput (stacks per minute)"
+            KPIPlot:
+                id:plot_cycle_time
+                title:"Average cycle-time per stack (seconds)"
+            KPIPlot:
+                id:plot_utilization
+                title:"Utilization (fraction of time not idle)"
+            KPIPlot:
+                id:plot_belt_occupancy
+                title:"Belt occupancy (PCBs)"
+
+    TabbedPanelItem:
+        text: 'Parameter Sweep'
+        GridLayout:
+            cols:1
+            spacing:10
+            padding:10
+
+            Label:
+                text: 'Run the simulation for a range of values of one or two parameters'
+                size_hint_y:None
+                height:40
+            GridLayout:
+                cols:5
+                spacing:5
+                size_hint_y:None
+                height:130
+                Label:
+                    text:''
+                Label:
+                    text:'Parameter'
+                Label:
+                    text:'From'
+                Label:
+                    text:'To'
+                Label:
+                    text:'Step'
+                Label:
+                    text:'Parameter 1:'
+                Spinner:
+                    id:sweep_param_1
+                FloatInput:
+                    id:sweep_from_1
+                    multiline:False
+                FloatInput:
+                    id:sweep_to_1
+                    multiline:False
+                FloatInput:
+                    id:sweep_step_1
+                    multiline:False
+                Label:
+                    text:'Parameter 2:'
+                Spinner:
+                    id:sweep_param_2
+                FloatInput:
+                    id:sweep_from_2
+                    multiline:False
+                FloatInput:
+                    id:sweep_to_2
+                    multiline:False
+                FloatInput:
+                    id:sweep_step_2
+                    multiline:False
+            GridLayout:
+                cols:6
+                spacing:5
+                size_hint_y:None
+                height:40
+                Label:
+                    text:'Simulation time (s):'
+                IntegerInput:
+                    id:sweep_simulation_time
+                    multiline:False
+                    text:str(app.param_simulation_time_default)
+                Label:
+                    text:'Show:'
+                Spinner:
+                    id:sweep_kpi
+                    text:'throughput'
+                    values:['throughput','average_cycle_time','num_PCBs_completed']
+                    on_text:root.show_sweep_results()
+                Button:
+                    id:button_run_sweep
+                    text:'Run Sweep'
+                    on_press:root.run_sweep()
+                Button:
+                    id:button_cancel_sweep
+                    text:'Cancel'
+                    disabled:True
+                    on_press:root.cancel_sweep()
+            Label:
+                id:sweep_status
+                text:''
+                size_hint_y:None
+                height:30
+            ScrollView:
+                Label:
+                    id:sweep_results
+                    text:''
+                    font_name:'RobotoMono-Regular'
+                    font_size: 15
+                    text_size: None, None
+                    size_hint: None, None
+                    width: self.texture_size[0]
+                    height: self.texture_size[1]
   """)
 
 # The following code can be used for displaying 
@@ -170,6 +300,70 @@ class FloatInput(TextInput):
         return super(FloatInput, self).insert_text(s, from_undo=from_undo)
 
 
+# A widget that plots one or more KPIs against the simulated time.
+# Each KPI is stored as a downsampled KPISeries, so that
+# the cost of redrawing the plot does not grow with the length of the run.
+PLOT_COLORS = [(0.12,0.47,0.71),(1.0,0.5,0.05),(0.17,0.63,0.17),(0.84,0.15,0.16),
+               (0.58,0.40,0.74),(0.55,0.34,0.29),(0.89,0.47,0.76),(0.5,0.5,0.5)]
+PLOT_MAX_POINTS = 256
+
+class KPIPlot(Widget):
+
+    title = StringProperty("")
+
+    def __init__(self, **kwargs):
+        super(KPIPlot, self).__init__(**kwargs)
+        self.series = OrderedDict()
+        self.label = Label(font_size=13, halign="left", valign="top")
+        self.add_widget(self.label)
+        self.bind(pos=self.redraw, size=self.redraw, title=self.redraw)
+
+    def clear(self):
+        self.series = OrderedDict()
+        self.redraw()
+
+    # add a sample for each KPI in the dictionary {kpi_name:value}
+    def add_sample(self, t, values):
+        for name in values:
+            if name not in self.series:
+                self.series[name] = KPISeries(PLOT_MAX_POINTS)
+            self.series[name].add(t, values[name])
+
+    def redraw(self, *args):
+        self.label.pos = (self.x, self.top-self.label.height)
+        self.label.size = (self.width, 20+16*len(self.series))
+        self.label.text_size = self.label.size
+
+        legend = [self.title]
+        self.canvas.before.clear()
+
+        # plotting area and scale (common to all the KPIs)
+        x0, y0 = self.x+10, self.y+10
+        w, h = self.width-20, self.height-30-self.label.height
+        points = [p for s in self.series.values() for p in s.get_points()]
+        if(len(points)==0 or w<=0 or h<=0):
+            self.label.text = self.title
+            return
+        t_max = max(max([p[0] for p in points]),1e-9)
+        v_max = max(max([p[1] for p in points]),1e-9)
+
+        with self.canvas.before:
+            Color(0.3,0.3,0.3)
+            Line(points=[x0,y0+h, x0,y0, x0+w,y0], width=1)
+            for i, (name, s) in enumerate(self.series.items()):
+                c = PLOT_COLORS[i%len(PLOT_COLORS)]
+                Color(*c)
+                line = []
+                for (t,v) in s.get_points():
+                    line += [x0 + w*t/t_max, y0 + h*v/v_max]
+                if(len(line)>=4):
+                    Line(points=line, width=1.2)
+                legend.append("[color=%02x%02x%02x]%s = %.3g[/color]"%(int(c[0]*255),int(c[1]*255),int(c[2]*255), name, s.get_last_value()))
+        legend.append("(max = %.3g, T = %d s)"%(v_max, t_max))
+        self.label.markup = True
+        self.label.text = "\n".join(legend)
+
+
 PARAM_HEIGHT= 40
 PARAM_FONT_SIZE=15
 
@@ -216,13 +410,28 @@ class SMT_dashboard(TabbedPanel):
     
     def __init__(self,**kwargs):
         # Create a simulator object
-        self.simulator  = SMT_simulation.SMT_simulation()
+        app = App.get_running_app()
+        self.simulator  = SMT_simulation.SMT_simulation(cache_dir=app.results_cache_dir if app!=None else None)
         # Obtain the default parameter values:
         self.model_parameters = self.simulator.model_parameters
+        # background worker process for running simulations
+        self.worker = None
         super(SMT_dashboard, self).__init__(**kwargs)
 
         #add input boxes for setting model parameters:
         self.ids.id_parameter_setup.add_parameters(self.model_parameters)
+
+        # parameters that can be swept:
+        # "machine label: parameter label" --> (machine_id, parameter_name)
+        self.sweep = None
+        self.sweep_choices = OrderedDict()
+        for machine in self.model_parameters.items():
+            for param in machine[1]["parameters"].items():
+                self.sweep_choices[machine[1]["label"]+": "+param[1]["label"]] = (machine[0], param[0])
+        self.ids.sweep_param_1.values = list(self.sweep_choices.keys())
+        self.ids.sweep_param_1.text = self.ids.sweep_param_1.values[0]
+        self.ids.sweep_param_2.values = ["None"] + list(self.sweep_choices.keys())
+        self.ids.sweep_param_2.text = "None"
         
     def set_parameters(self):
         # read values of the model parameters
@@ -251,18 +460,173 @@ class SMT_dashboard(TabbedPanel):
             self.ids.activity_log.text = ""
         
         
-        results_string = self.simulator.run_simulation(simulation_time,generate_activity_log)
-        
-        #display aggregate results 
-        self.ids.simulation_results.text="\nSimulation Results:\n"+ results_string.getvalue()
-        pass
+        # run the simulation in a background worker process
+        # and poll for progress messages periodically,
+        # so that the GUI remains responsive.
+        if(self.worker!=None and self.worker.is_running()):
+            return
+        self.simulation_time = simulation_time
+        self.log_text = self.ids.activity_log.text
+
+        # if this configuration has been simulated before,
+        # show the saved results. (runs that generate an activity log
+        # are always re-simulated, to produce the log file)
+        self.run_key = self.simulator.get_cache_key(simulation_time)
+        if(not generate_activity_log):
+            results = self.simulator.get_cached_results(simulation_time)
+            if(results!=None):
+                self.ids.simulation_results.text="\nSimulation Results (from a previous run):\n"+ results
+                return
+
+        self.worker = SimulationWorker(self.simulator.get_parameter_values(), simulation_time, generate_activity_log)
+        self.worker.start()
+        self.ids.button_run_simulation.disabled = True
+        self.ids.button_cancel_simulation.disabled = False
+        self.ids.simulation_results.text="\nSimulation Results:\n"+ "Running..."
+        for plot in self.get_kpi_plots():
+            plot.clear()
+        Clock.schedule_interval(self.check_simulation_progress, 0.1)
+
+    # list of values of a swept parameter, from the
+    # "From", "To" and "Step" input boxes
+    def get_sweep_values(self, choice, from_box, to_box, step_box):
+        machine_id, param = self.sweep_choices[choice]
+        parameter_format = self.model_parameters[machine_id]["parameters"][param]["format"]
+        start, stop, step = float(from_box.text), float(to_box.text), float(step_box.text)
+        assert(step>0 and stop>=start)
+        n = int((stop-start)/step + 1e-9) + 1
+        values = [start + i*step for i in range(n)]
+        if(parameter_format=="int"):
+            values = sorted(set([int(round(v)) for v in values]))
+        return (machine_id, param, values)
+
+    def run_sweep(self):
+        if(self.sweep!=None and self.sweep.is_running()):
+            return
+        try:
+            sweep_parameters = [self.get_sweep_values(self.ids.sweep_param_1.text, self.ids.sweep_from_1, self.ids.sweep_to_1, self.ids.sweep_step_1)]
+            if(self.ids.sweep_param_2.text!="None"):
+                sweep_parameters.append(self.get_sweep_values(self.ids.sweep_param_2.text, self.ids.sweep_from_2, self.ids.sweep_to_2, self.ids.sweep_step_2))
+            simulation_time = int(self.ids.sweep_simulation_time.text)
+        except (ValueError, AssertionError):
+            self.ids.sweep_status.text = "Please enter a valid range (From <= To, Step > 0) for each parameter."
+            return
+        self.sweep = ParameterSweep(self.simulator.get_parameter_values(), simulation_time, sweep_parameters)
+        self.sweep.start()
+        self.ids.button_run_sweep.disabled = True
+        self.ids.button_cancel_sweep.disabled = False
+        self.show_sweep_results()
+        Clock.schedule_interval(self.check_sweep_progress, 0.2)
+
+    def cancel_sweep(self):
+        if(self.sweep!=None):
+            self.sweep.cancel()
+            self.ids.button_cancel_sweep.disabled = True
+
+    # called periodically by the Kivy clock while a sweep is running.
+    def check_sweep_progress(self, dt):
+        if(len(self.sweep.get_completed_points())!=0):
+            self.show_sweep_results()
+        if(self.sweep.is_running()):
+            return True
+        self.show_sweep_results()
+        self.ids.button_run_sweep.disabled = False
+        self.ids.button_cancel_sweep.disabled = True
+        return False
+
+    # display the results of the sweep as a table
+    # (one row per value of parameter 1, and one column
+    # per value of parameter 2)
+    def show_sweep_results(self):
+        if(self.sweep==None):
+            return
+        kpi = self.ids.sweep_kpi.text
+        sweep_parameters = self.sweep.sweep_parameters
+
+        def cell(index):
+            if index not in self.sweep.results:
+                return "..."
+            kpis = self.sweep.results[index]
+            if "error" in kpis:
+                return "error"
+            return "%.4g"%(kpis[kpi])
+
+        rows_values = sweep_parameters[0][2]
+        if(len(sweep_parameters)==1):
+            header = ["%s.%s"%(sweep_parameters[0][0],sweep_parameters[0][1]), kpi]
+            table = [[str(v), cell((i,))] for i,v in enumerate(rows_values)]
+        else:
+            cols_values = sweep_parameters[1][2]
+            header = ["%s.%s \\ %s.%s"%(sweep_parameters[0][0],sweep_parameters[0][1],sweep_parameters[1][0],sweep_parameters[1][1])] + [str(v) for v in cols_values]
+            table = [[str(v)] + [cell((i,j)) for j in range(len(cols_values))] for i,v in enumerate(rows_values)]
+        width = max([len(x) for x in header[1:]] + [len(x) for row in table for x in row[1:]]) + 2
+        first_width = max([len(header[0])] + [len(row[0]) for row in table]) + 2
+        lines = [header[0].ljust(first_width) + "".join([x.rjust(width) for x in header[1:]])]
+        for row in table:
+            lines.append(row[0].ljust(first_width) + "".join([x.rjust(width) for x in row[1:]]))
+        self.ids.sweep_results.text = "\n".join(lines)
+        self.ids.sweep_status.text = "Completed %d of %d points (%s)"%(self.sweep.get_num_completed_points(), len(self.sweep.points), kpi)
+
+    def get_kpi_plots(self):
+        return [self.ids.plot_throughput, self.ids.plot_cycle_time, self.ids.plot_utilization, self.ids.plot_belt_occupancy]
+
+    # add a snapshot of the KPIs (sent by the worker)
+    # to the live plots
+    def add_kpi_snapshot(self, snapshot):
+        t = snapshot["time"]
+        self.ids.plot_throughput.add_sample(t, {"throughput":snapshot["throughput"]})
+        self.ids.plot_cycle_time.add_sample(t, {"cycle_time":snapshot["average_cycle_time"]})
+        self.ids.plot_utilization.add_sample(t, snapshot["utilization"])
+        self.ids.plot_belt_occupancy.add_sample(t, snapshot["belt_occupancy"])
+        for plot in self.get_kpi_plots():
+            plot.redraw()
+
+    def cancel_simulation(self):
+        if(self.worker!=None):
+            self.worker.cancel()
+            self.ids.button_cancel_simulation.disabled = True
+
+    # called periodically by the Kivy clock while a simulation is running.
+    # (returns False when the run has ended, to stop being called)
+    def check_simulation_progress(self, dt):
+        for message in self.worker.get_messages():
+            if(message[0]=="progress"):
+                self.ids.activity_log.text = "Simulated time: %d of %d seconds, PCBs completed: %d"%(message[1], self.simulation_time, message[2])
+            elif(message[0]=="snapshot"):
+                self.add_kpi_snapshot(message[1])
+            elif(message[0]=="done"):
+                #display aggregate results 
+                self.ids.activity_log.text = self.log_text
+                self.ids.simulation_results.text="\nSimulation Results:\n"+ message[1]
+                self.simulator.save_results(self.run_key, message[1])
+            elif(message[0]=="cancelled"):
+                self.ids.activity_log.text = "Simulation cancelled at T = %d seconds"%(message[1])
+                self.ids.simulation_results.text="\nSimulation Results:\n"
+            elif(message[0]=="error"):
+                self.ids.activity_log.text = "Simulation failed."
+                self.ids.simulation_results.text="\nSimulation Results:\n"+ message[1]
+        if(self.worker.is_running()):
+            return True
+        self.ids.button_run_simulation.disabled = False
+        self.ids.button_cancel_simulation.disabled = True
+        return False
 
 
 class SMT_dashboardApp(App):
     param_simulation_time_default = 300
+    # directory in which results are saved across sessions
+    # (None = results are saved in memory only)
+    results_cache_dir = None
     def build(self):
         return SMT_dashboard()
 
+    def on_stop(self):
+        # stop any simulation that is still running
+        if(self.root.worker!=None):
+            self.root.worker.cancel()
+        if(self.root.sweep!=None):
+            self.root.sweep.cancel()
+
 
 if __name__ == '__main__':
     SMT_dashboardApp().run()
@@ -12,6 +12,8 @@ import sys
 import datetime
 from io import StringIO
 import copy
+import json
+import hashlib
 from collections import OrderedDict
 
 # Model components:
@@ -28,6 +30,7 @@ from ReflowOven import *
 from LineDownloader import *
 from Sink import *
 from HumanOperator import *
+from ResultsCache import ResultsCache
 
 
 import os
@@ -37,18 +40,73 @@ import sys
 class SMT_simulation():
     
     # init function 
-    def __init__(self):
+    def __init__(self, cache_size=32, cache_dir=None):
         #
         #initialize the model parameters
         #to their default values.
         self.model_parameters = self.get_default_model_parameters()
 
+        # cache of results of previous runs
+        self.results_cache = ResultsCache(max_entries=cache_size, cache_dir=cache_dir)
+
+
+    # Get the values of the model parameters
+    # as a plain dictionary of the form {machine_id:{parameter:value}}.
+    # (This can be pickled and sent to a worker process.)
+    def get_parameter_values(self):
+        parameter_values = OrderedDict()
+        for machine in self.model_parameters.items():
+            parameter_values[machine[0]] = OrderedDict()
+            for param in machine[1]["parameters"].items():
+                parameter_values[machine[0]][param[0]] = param[1]["value"]
+        return parameter_values
+
+    # Set the values of the model parameters
+    # from a dictionary of the form {machine_id:{parameter:value}}
+    def set_parameter_values(self, parameter_values):
+        for machine_id in parameter_values:
+            for param in parameter_values[machine_id]:
+                self.model_parameters[machine_id]["parameters"][param]["value"] = parameter_values[machine_id][param]
+
+
+    # A key that uniquely identifies a run with the current
+    # parameter values and the given simulation time.
+    # The values are converted to their declared format and the
+    # parameters are sorted by name, so that equal configurations
+    # always produce the same key.
+    def get_cache_key(self, simulation_time):
+        parameters = {}
+        for machine in self.model_parameters.items():
+            parameters[machine[0]] = {}
+            for param in machine[1]["parameters"].items():
+                if(param[1]["format"]=="int"):
+                    parameters[machine[0]][param[0]] = int(param[1]["value"])
+                else:
+                    parameters[machine[0]][param[0]] = float(param[1]["value"])
+        s = json.dumps({"simulation_time":int(simulation_time), "parameters":parameters}, sort_keys=True, separators=(",",":"))
+        return hashlib.sha1(s.encode()).hexdigest()
+
+    # results of a previous run with the current parameter values
+    # and the given simulation time (or None)
+    def get_cached_results(self, simulation_time):
+        return self.results_cache.get(self.get_cache_key(simulation_time))
+
+    def save_results(self, key, results_text):
+        self.results_cache.put(key, results_text)
+
 
     # Function to run the simulation for
     # a specified amount of time.
     # The values of the model parameters are passed
     # as a dictionary.
-    def run_simulation(self,simulation_time, generate_activity_log):
+    #
+    # If a progress_callback is specified, the simulation is run
+    # in steps of <progress_step> seconds, and after each step
+    # the function progress_callback(simulated_time, num_PCBs_completed, get_snapshot)
+    # is called. get_snapshot() returns the current values of the KPIs
+    # (see get_kpi_snapshot). If the callback returns False, the simulation is
+    # cancelled and None is returned.
+    def run_simulation(self,simulation_time, generate_activity_log, progress_callback=None, progress_step=1000):
         
         #check arguments:
         assert(simulation_time >= 1)
@@ -236,10 +294,28 @@ class SMT_simulation():
             nothing = open(os.devnull, 'w')
             sys.stdout = nothing
 
+        # function that returns a snapshot of the KPIs
+        # at the current time instant
+        def get_snapshot():
+            return self.get_kpi_snapshot(env, sink_1, [baking_oven_1, baking_oven_2]+machines, belts)
+
         # run the simulation
-        env.run(until=T)
+        cancelled = False
+        if(progress_callback==None):
+            env.run(until=T)
+        else:
+            assert(progress_step>=1)
+            while(env.now < T):
+                env.run(until=min(env.now+progress_step, T))
+                if(progress_callback(env.now, sink_1.num_pcbs_completed, get_snapshot)==False):
+                    cancelled = True
+                    break
         sys.stdout = sys.__stdout__
 
+        if(cancelled):
+            print("Simulation cancelled at T=",env.now)
+            return None
+
         if(generate_activity_log==True):
             print("Activity log generated in file: activity_log.txt")
         
@@ -252,6 +328,7 @@ class SMT_simulation():
         print("================================")
         print ("Total time elapsed = ",env.now," seconds")
         print ("Total number of stacks processed =",sink_1.num_stacks_completed)
+        print ("Total number of PCBs processed =",sink_1.num_pcbs_completed)
         print ("Average cycle-time per stack = ",sink_1.average_cycle_time, "seconds")
         print ("Average throughput = ",sink_1.num_stacks_completed/float(env.now)*60," stacks per minute")
 
@@ -285,6 +362,27 @@ class SMT_simulation():
 
 
 
+    # Key performance indicators at the current time instant,
+    # as a dictionary of the form:
+    #   {"time":..., "num_PCBs_completed":..., "throughput":(stacks per minute),
+    #    "average_cycle_time":(seconds per stack),
+    #    "utilization":{machine_name:fraction of time not idle},
+    #    "belt_occupancy":{belt_name:number of PCBs on the belt}}
+    def get_kpi_snapshot(self, env, sink, machines, belts):
+        snapshot = OrderedDict()
+        snapshot["time"] = env.now
+        snapshot["num_PCBs_completed"] = sink.num_pcbs_completed
+        snapshot["throughput"] = sink.num_stacks_completed/max(float(env.now),1.0)*60
+        snapshot["average_cycle_time"] = sink.average_cycle_time
+        snapshot["utilization"] = OrderedDict()
+        for m in machines:
+            snapshot["utilization"][m.name] = 1.0 - m.get_utilization()[m.states.index("idle")]
+        snapshot["belt_occupancy"] = OrderedDict()
+        for b in belts:
+            snapshot["belt_occupancy"][b.name] = b.get_occupancy()
+        return snapshot
+
+
     def get_default_model_parameters(self):
         
         # Create a dictionary contaning information about 
@@ -341,5 +439,5 @@ class SMT_simulation():
 if __name__ == '__main__':
     S = SMT_simulation()
     simulation_time = 100
-    results = S.run_simulation(simulation_time)
+    results = S.run_simulation(simulation_time, generate_activity_log=False)
     print(results.getvalue())
@@ -0,0 +1,119 @@
+# SimulationWorker.py
+#
+# Runs the SMT simulation in a background worker process,
+# so that the GUI front-end remains responsive during long runs.
+#
+# The worker reports its progress (simulated time and number of PCBs
+# completed so far) over a queue. Progress messages are throttled
+# so that at most one message is sent every <progress_interval> seconds
+# of wall-clock time, irrespective of the length of the run.
+# A run can be cancelled at any time using cancel(). The worker
+# checks for cancellation after each step of the simulation.
+#
+# The worker also publishes snapshots of the KPIs (throughput,
+# cycle time, machine utilization and belt occupancy) at a fixed
+# wall-clock rate of one every <snapshot_interval> seconds,
+# for live plotting (see SMT_simulation.get_kpi_snapshot).
+#
+# Messages sent over the queue are tuples of the form:
+#   ("progress", simulated_time, num_PCBs_completed)
+#   ("snapshot", snapshot)
+#   ("done", results_text)
+#   ("cancelled", simulated_time)
+#   ("error", error_text)
+#
+# Usage:
+#   worker = SimulationWorker(parameter_values, simulation_time, generate_activity_log)
+#   worker.start()
+#   ...
+#   for message in worker.get_messages():  # (non-blocking)
+#       ...
+#   worker.cancel()
+#
+# Author: Neha Karanjkar
+
+import multiprocessing
+import queue
+import time
+import traceback
+
+import SMT_simulation
+
+
+# Function executed in the worker process.
+def run_worker(message_queue, cancel_event, parameter_values, simulation_time, generate_activity_log, progress_interval, progress_step, snapshot_interval):
+
+    # wall-clock time at which the last progress message
+    # and the last snapshot were sent
+    state = {"simulated_time":0.0, "last_progress":0.0, "last_snapshot":0.0}
+
+    # called by the simulator after each step
+    def report_progress(simulated_time, num_pcbs_completed, get_snapshot):
+        state["simulated_time"] = simulated_time
+        if(cancel_event.is_set()):
+            return False
+        now = time.time()
+        if(now - state["last_progress"] >= progress_interval):
+            state["last_progress"] = now
+            message_queue.put(("progress", simulated_time, num_pcbs_completed))
+        if(snapshot_interval!=None and now - state["last_snapshot"] >= snapshot_interval):
+            state["last_snapshot"] = now
+            message_queue.put(("snapshot", get_snapshot()))
+        return True
+
+    try:
+        simulator = SMT_simulation.SMT_simulation()
+        simulator.set_parameter_values(parameter_values)
+        results_string = simulator.run_simulation(simulation_time, generate_activity_log, progress_callback=report_progress, progress_step=progress_step)
+        if(results_string==None):
+            message_queue.put(("cancelled", state["simulated_time"]))
+        else:
+            message_queue.put(("done", results_string.getvalue()))
+    except Exception:
+        message_queue.put(("error", traceback.format_exc()))
+
+
+class SimulationWorker():
+
+    def __init__(self, parameter_values, simulation_time, generate_activity_log, progress_interval=0.2, progress_step=1000, snapshot_interval=0.5):
+        assert(simulation_time>=1)
+        assert(progress_interval>0)
+
+        # A "spawn" context is used, so that the worker process does not
+        # inherit the state of the GUI (windows, graphics context etc).
+        context = multiprocessing.get_context("spawn")
+        self.message_queue = context.Queue()
+        self.cancel_event = context.Event()
+        self.process = context.Process(target=run_worker, args=(self.message_queue, self.cancel_event, parameter_values, simulation_time, generate_activity_log, progress_interval, progress_step, snapshot_interval))
+        self.process.daemon = True
+        self.finished = False
+
+    def start(self):
+        self.process.start()
+
+    # request the worker to stop.
+    # (a "cancelled" message is sent by the worker when it stops)
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_running(self):
+        return self.process.is_alive() and not self.finished
+
+    # return a list of all messages received so far (does not block).
+    def get_messages(self):
+        messages = []
+        while True:
+            try:
+                message = self.message_queue.get_nowait()
+            except queue.Empty:
+                break
+            messages.append(message)
+            if(message[0]!="progress" and message[0]!="snapshot"):
+                self.finished = True
+        # the worker exited without sending a final message
+        if(not self.finished and not self.process.is_alive() and self.message_queue.empty()):
+            self.finished = True
+            messages.append(("error", "Worker process exited with code "+str(self.process.exitcode)))
+        if(self.finished):
+            self.process.join()
+        return messages
@@ -26,6 +26,7 @@ class Sink():
         #count of the number of stacks completed and avg
         #time that each stack spent in the system
         self.num_stacks_completed=0.0
+        self.num_pcbs_completed=0
         self.average_cycle_time=0.0
 
 
@@ -44,6 +45,7 @@ class Sink():
             stack_cycle_time = self.env.now - pcb.creation_timestamp
             self.average_cycle_time = self.average_cycle_time * self.num_stacks_completed + stack_cycle_time
             self.num_stacks_completed+=1
+            self.num_pcbs_completed+=len(pcb_stack)
             self.average_cycle_time = self.average_cycle_time/self.num_stacks_completed
 
             
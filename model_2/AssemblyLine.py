@@ -12,6 +12,7 @@ import random
 import simpy
 import os
 import sys 
+import copy
 import datetime
 
 # Import definitions of machines and other classes
@@ -20,14 +21,26 @@ from PCB import *
 from Buffer import *
 from ConveyorBelt import *
 from HumanOperator import *
+from OperatorPool import *
+from TravelTimes import *
+from MachineFailures import *
 from Source import *
 from LineLoader import *
 from ScreenPrinter import *
 from PickAndPlace import *
 from PCBBufferingModule import *
 from PCBDoubleBufferingModule import *
+from PCBMultiBufferingModule import *
 from ReflowOven import *
 from Sink import *
+import Snapshot
+import Profiler
+import Traceability
+import StateHistory
+import Timeline
+import Bottleneck
+import FlowStats
+import EnergyCost
 
 
 
@@ -52,17 +65,164 @@ print_activity_log = False
 # Buffering-related parameters
 buffering_enabled = True  #w hether buffering is enabled
 double_buffering_enabled = False # use single buffering or double?
+num_buffering_banks = 0 # if non-zero, use a multi-stage buffering module with these many banks (overrides double_buffering_enabled)
 buffer_capacity_per_stage = 32 # max number of items that can be buffered per stage.
 reflow_oven_turn_on_margin_k = 0 # turn on the reflow oven as soon as (capacity - k) items have accumulated
 buffering_mode = "LIFO"  # Can be either "LIFO" or "FIFO"
 
-
-
-# Function to run simulation:
-def RunSimulation():
-
-    # Create an Environment:
-    env=simpy.Environment()
+# Machine processing times and reel replacement intervals.
+# Each of these can be a fixed integer, or a distribution spec
+# such as ("lognormal", mean, std_dev) or ("gamma", mean, std_dev). See RandomVariates.py.
+printing_delay = 18
+pick_and_place_1_processing_delay = 85
+pick_and_place_2_processing_delay = 50
+reel_replacement_interval = 50
+random_seed = 0 # seed for the machines' streams of random variates
+
+# Human operator-related parameters
+use_operator_pool = False # if True, tasks are dispatched by an OperatorPool to a crew of operators.
+num_human_operators = 1 # number of operators in the pool (used only if use_operator_pool is True)
+
+# Machine failures.
+# If enabled, the machines fail randomly (with exponentially distributed times
+# between failures, in seconds) and are repaired by the human operator(s).
+# Repair times are also exponentially distributed.
+machine_failures_enabled = False
+machine_MTBF = {
+    "screen_printer"                : 10*3600,
+    "pick_and_place_1"              : 10*3600,
+    "pick_and_place_2"              : 10*3600,
+    "reflow_oven"                   : 20*3600,
+    "belt_SP_to_PP1"                : 40*3600,
+    "belt_buffering_module_to_RFO"  : 40*3600,
+}
+machine_MTTR = 1800
+
+# Operator travel between machines.
+# If enabled, operators walk between stations before performing a task.
+# Travel times are precomputed from the positions of the stations (in metres).
+operator_travel_enabled = False
+operator_walking_speed = 1.0 # metres per second
+station_positions = {
+    "screen_printer"    : (0.0, 0.0),
+    "pick_and_place_1"  : (8.0, 0.0),
+    "pick_and_place_2"  : (14.0, 0.0),
+    "reflow_oven"       : (24.0, 0.0),
+    "belt_SP_to_PP1"    : (4.0, 0.0),
+    "belt_buffering_module_to_RFO" : (20.0, 0.0),
+}
+
+# Energy cost.
+# The energy consumed by the machines is priced using a time-of-use tariff
+# with a demand charge on the peak 15-minute demand (see EnergyCost.py).
+# The cost per PCB is reported next to the energy per PCB in the results.
+# (The prices are in arbitrary units of money)
+energy_tariff = {
+    "bands"          : [(0, 6, 5.0), (6, 10, 8.0), (10, 18, 6.5), (18, 22, 8.0), (22, 24, 5.0)], # (start hour, end hour, price per kWh)
+    "demand_charge"  : 350.0,       # per kW of peak demand, per billing period
+    "demand_window"  : 15*60,       # seconds
+    "billing_period" : 30*24*3600,  # seconds
+    "start_hour"     : 0,           # hour of the day at T=0
+}
+
+# Checkpoints.
+# If checkpoint_interval_in_hours is non-zero, a snapshot of the line
+# (see Snapshot.py) is saved into checkpoint_file at these intervals
+# of simulated time. A long run that was stopped can then be resumed using
+# RunSimulation(snapshot=Snapshot.LoadSnapshot(checkpoint_file))
+checkpoint_interval_in_hours = 0
+checkpoint_file = "checkpoint.json"
+
+# Profiling.
+# If enabled, the events processed and the wall-clock time spent
+# in processing them are attributed to the components of the line,
+# and a profile is printed after the results (see Profiler.py).
+# The profile is also saved as collapsed stacks (for flamegraph tools) in profile_file.
+# To keep the overhead low, one in every profile_sample_interval events
+# (on average) is measured, and the profile is estimated from these samples.
+profile_simulation = False
+profile_file = "profile.collapsed"
+profile_sample_interval = 10
+
+# Traceability.
+# If enabled, each station records the times at which each PCB
+# enters and leaves it (see Traceability.py). The time spent by PCBs
+# at each station is printed after the results, and the
+# timestamps are saved (as NumPy columns) in trace_file.
+trace_PCBs = False
+trace_file = "traces.npz"
+
+# State histories.
+# If enabled, the changes of state of all machines and operators are
+# recorded, and can be queried using line.history (see StateHistory.py).
+# The histories are also saved (as NumPy arrays) in state_history_file,
+# and drawn as a timeline (Gantt chart) of the entire run in timeline_file.
+record_state_histories = False
+state_history_file = "state_history.npz"
+timeline_file = "timeline.svg"
+
+# Bottleneck detection.
+# If enabled, the momentary bottleneck of the line is tracked during the run
+# (using the active-period method, see Bottleneck.py), and the fraction of
+# time for which each machine was the bottleneck is printed after the results.
+detect_bottlenecks = False
+
+
+# Names of the simulation parameters that describe the line
+# (saved in snapshots, see GetParameters and SetParameters)
+PARAMETERS = ["batch_size", "stack_size", "max_simulation_time_in_hours",
+    "buffering_enabled", "double_buffering_enabled", "num_buffering_banks", "buffer_capacity_per_stage",
+    "reflow_oven_turn_on_margin_k", "buffering_mode",
+    "printing_delay", "pick_and_place_1_processing_delay", "pick_and_place_2_processing_delay",
+    "reel_replacement_interval", "random_seed", "use_operator_pool", "num_human_operators",
+    "machine_failures_enabled", "machine_MTBF", "machine_MTTR",
+    "operator_travel_enabled", "operator_walking_speed", "station_positions", "energy_tariff"]
+
+# current values of the simulation parameters, as a dictionary
+def GetParameters():
+    return dict([(name, copy.deepcopy(globals()[name])) for name in PARAMETERS])
+
+# set the simulation parameters from a dictionary
+# (distribution specs such as ["lognormal", 85, 10] read from
+# a JSON file are converted back to tuples)
+def SetParameters(parameters):
+    for name, value in parameters.items():
+        assert(name in PARAMETERS),("unknown parameter "+str(name))
+        if(isinstance(value,list) and len(value)>=1 and isinstance(value[0],str)):
+            value = tuple(value)
+        globals()[name] = copy.deepcopy(value)
+
+
+
+# Names of the columns of the results returned by GetResults (and RunSimulation).
+# The utilization (%) of the reflow oven is given for each of RFO_STATES,
+# with 0 for "down" if machine failures are disabled.
+# (New columns are appended at the end, so that the columns of
+# existing result files and scripts keep their positions)
+RFO_STATES = ["off", "setup", "temperature_maintain_unoccupied", "temperature_maintain_occupied", "down"]
+RESULT_NAMES = ["k", "N", "avg_throughput", "avg_cycle_time_hrs", "max_cycle_time_hrs", "avg_energy_per_PCB",
+    "RFO_OFF", "RFO_setup", "RFO_ON_empty", "RFO_ON_occupied", "RFO_down", "avg_cost_per_PCB"]
+
+
+# A container for the components of an instance of the
+# assembly line (created by BuildAssemblyLine).
+# Components are available as attributes (line.screen_printer, line.sink_1, ...)
+# and by name, in the dictionary line.components.
+class Line():
+
+    def __init__(self, env):
+        self.env = env
+        self.components = {}
+
+    def add_components(self, components):
+        for c in components:
+            self.components[c.name] = c
+            setattr(self, c.name, c)
+
+
+# Function to instantiate the components of the assembly line
+# in a SimPy environment, using the simulation parameters above.
+def BuildAssemblyLine(env):
 
     # Checks on simulation parameters:
     assert(batch_size % stack_size ==0)
@@ -97,6 +257,27 @@ def RunSimulation():
     # Human operators can be interrupted by machine
     # for performing tasks such as refilling machine consummables.
     human_operator_1 = HumanOperator (env=env, name="human_operator_1")
+    humans = [human_operator_1]
+
+    # Optionally, operators take time to walk between machines.
+    if(operator_travel_enabled):
+        travel_times = TravelTimes(station_positions=station_positions, walking_speed=operator_walking_speed)
+    else:
+        travel_times = None
+
+    # Optionally, a crew of operators can be managed by an OperatorPool.
+    # Machines then submit their requests to the pool, which dispatches 
+    # them to any idle operator.
+    if(use_operator_pool):
+        operator_pool = OperatorPool (env=env, name="operator_pool")
+        operator_pool.add_operator(human_operator_1)
+        for i in range(2, num_human_operators+1):
+            human_operator = HumanOperator (env=env, name="human_operator_"+str(i))
+            operator_pool.add_operator(human_operator)
+            humans.append(human_operator)
+    for h in humans:
+        h.travel_times = travel_times
+        h.location = "screen_printer"
 
     #======================================
     # Machines in the assembly Line:
@@ -147,9 +328,10 @@ def RunSimulation():
     screen_printer.adhesive_capacity=500
     screen_printer.adhesive_initial_amount=500
 
-    screen_printer.printing_delay=18
+    screen_printer.printing_delay=printing_delay
     screen_printer.cleaning_delay=28
     screen_printer.num_pcbs_per_cleaning=2
+    screen_printer.random_seed = random_seed
 
     #  power ratings (in watts) for each state
     # states: ["idle","waiting_for_refill","printing","cleaning","waiting_to_output"]
@@ -165,11 +347,13 @@ def RunSimulation():
     #  and a human operator is interrupted to perform the replacement.
     pick_and_place_1 = PickAndPlace (env=env, name="pick_and_place_1", inp=belt_SP_to_PP1, outp=buff[2] )
     pick_and_place_2 = PickAndPlace (env=env, name="pick_and_place_2", inp=buff[2], outp=buff[3])
-    pick_and_place_1.processing_delay=85
-    pick_and_place_2.processing_delay=50
+    pick_and_place_1.processing_delay=pick_and_place_1_processing_delay
+    pick_and_place_2.processing_delay=pick_and_place_2_processing_delay
     # num of PCBs processed after which reel replacement is required
-    pick_and_place_1.reel_replacement_interval = 50
-    pick_and_place_2.reel_replacement_interval = 50
+    pick_and_place_1.reel_replacement_interval = reel_replacement_interval
+    pick_and_place_2.reel_replacement_interval = reel_replacement_interval
+    pick_and_place_1.random_seed = random_seed
+    pick_and_place_2.random_seed = random_seed
     #  power ratings (in watts) for each state
     # states: ["idle","waiting_for_reel_replacement","processing","waiting_to_output"]
     pick_and_place_1.set_power_ratings([100.0, 100.0, 500.0, 100.0])
@@ -180,7 +364,17 @@ def RunSimulation():
     # PCB Buffering module:
     #======================================
 
-    if(double_buffering_enabled):
+    if(num_buffering_banks>0):
+        # Multi-stage buffering with num_buffering_banks banks
+        # filled and drained in rotation.
+        buffering_module = PCBMultiBufferingModule (env=env, name="buffering_module", inp=buff[3], outp=belt_buffering_module_to_RFO, num_banks=num_buffering_banks )
+        buffering_module.capacity_per_stage=buffer_capacity_per_stage
+        buffering_module.k = reflow_oven_turn_on_margin_k
+        buffering_module.buffering_mode = buffering_mode
+        #  set power ratings (in watts) for each state
+        #  states: ["bypass","filling", "emptying"]
+        buffering_module.set_power_ratings([250,250, 250])
+    elif(double_buffering_enabled):
         # Double buffering
         buffering_module = PCBDoubleBufferingModule (env=env, name="buffering_module", inp=buff[3], outp=belt_buffering_module_to_RFO )
         buffering_module.capacity_per_stage=buffer_capacity_per_stage
@@ -245,17 +439,115 @@ def RunSimulation():
     # A human operator remains idle until interrupted
     # by a machine and then performs the assigned task.
 
-    # operator 1: 
-    screen_printer.set_refill_operator(human_operator_1)
-    human_operator_1.assign_task(task_name="solder_refill",machine_name="screen_printer", task_ptr=solder_refill_task, machine_ptr=screen_printer, delay=60)
-    human_operator_1.assign_task(task_name="adhesive_refill",machine_name="screen_printer", task_ptr=adhesive_refill_task, machine_ptr=screen_printer, delay=60)
+    # operator 1 (or the operator pool): 
+    operator = operator_pool if use_operator_pool else human_operator_1
+    screen_printer.set_refill_operator(operator)
+    operator.assign_task(task_name="solder_refill",machine_name="screen_printer", task_ptr=solder_refill_task, machine_ptr=screen_printer, delay=60)
+    operator.assign_task(task_name="adhesive_refill",machine_name="screen_printer", task_ptr=adhesive_refill_task, machine_ptr=screen_printer, delay=60)
 
-    pick_and_place_1.set_reel_replacement_operator(human_operator_1)
-    pick_and_place_2.set_reel_replacement_operator(human_operator_1)
-    human_operator_1.assign_task(task_name="reel_replacement",machine_name="pick_and_place_1", task_ptr=reel_replacement_task, machine_ptr=pick_and_place_1, delay=60)
-    human_operator_1.assign_task(task_name="reel_replacement",machine_name="pick_and_place_2", task_ptr=reel_replacement_task, machine_ptr=pick_and_place_2, delay=60)
+    pick_and_place_1.set_reel_replacement_operator(operator)
+    pick_and_place_2.set_reel_replacement_operator(operator)
+    operator.assign_task(task_name="reel_replacement",machine_name="pick_and_place_1", task_ptr=reel_replacement_task, machine_ptr=pick_and_place_1, delay=60)
+    operator.assign_task(task_name="reel_replacement",machine_name="pick_and_place_2", task_ptr=reel_replacement_task, machine_ptr=pick_and_place_2, delay=60)
 
+    #======================================
+    # Machine failures:
+    #======================================
+    # The operator(s) also repair the machines when they fail.
+    # power ratings (in watts) in the "down" state:
+    if(machine_failures_enabled):
+        for machine, down_power in [(screen_printer, 100.0), (pick_and_place_1, 100.0), (pick_and_place_2, 100.0),
+                (reflow_oven, 320.0), (belt_SP_to_PP1, 0.0), (belt_buffering_module_to_RFO, 0.0)]:
+            machine.random_seed = random_seed
+            machine.enable_failures(time_between_failures=("exponential", machine_MTBF[machine.name]), power_rating=down_power)
+            machine.set_repair_operator(operator)
+            operator.assign_task(task_name="repair", machine_name=machine.name, task_ptr=repair_task, machine_ptr=machine, delay=("exponential", machine_MTTR))
 
+    #======================================
+    # Collect the components:
+    #======================================
+    line = Line(env)
+    line.add_components(buff + [belt_SP_to_PP1, belt_buffering_module_to_RFO] + humans)
+    line.add_components([source_1, line_loader, screen_printer, pick_and_place_1, pick_and_place_2, buffering_module, reflow_oven, sink_1])
+    if(use_operator_pool):
+        line.add_components([operator_pool])
+    line.humans = humans
+    line.operator = operator
+
+    # The connection elements between the machines, in the order of the line,
+    # and the number of PCBs in the line (for the Little's law check, see FlowStats.py)
+    line.connections = [buff[0], buff[1], belt_SP_to_PP1, buff[2], buff[3], buffering_module, belt_buffering_module_to_RFO, buff[4]]
+    line.wip = FlowStats.FlowStats(env)
+    source_1.wip = line.wip
+    sink_1.wip = line.wip
+
+    # Energy meter: the power of the machines over time, priced using energy_tariff
+    energy_meter = EnergyCost.EnergyMeter(env, energy_tariff)
+    for machine in [screen_printer, pick_and_place_1, pick_and_place_2, buffering_module, reflow_oven]:
+        energy_meter.add_machine(machine)
+    line.add_components([energy_meter])
+
+    # Traceability: the stations, in the order of the line
+    line.trace = None
+    if(trace_PCBs):
+        line.trace = Traceability.TraceStore(num_PCBs=batch_size)
+        for station in [line_loader, screen_printer, belt_SP_to_PP1, pick_and_place_1, pick_and_place_2,
+                buffering_module, belt_buffering_module_to_RFO, reflow_oven, sink_1]:
+            station.trace = line.trace.add_station(station.name)
+
+    # State histories of all machines and operators
+    line.history = None
+    if(record_state_histories):
+        line.history = StateHistory.LineHistory(env)
+        for c in line.components.values():
+            if(isinstance(c, BaseOperator)):
+                line.history.add_component(c)
+
+    # Bottleneck detection: the machines of the line
+    line.bottleneck_detector = None
+    if(detect_bottlenecks):
+        line.bottleneck_detector = Bottleneck.BottleneckDetector(env)
+        for machine in [line_loader, screen_printer, belt_SP_to_PP1, pick_and_place_1, pick_and_place_2,
+                belt_buffering_module_to_RFO, reflow_oven]:
+            line.bottleneck_detector.add_machine(machine)
+    line.parameters = GetParameters()
+    return line
+
+
+# Function to build an assembly line from a snapshot (see Snapshot.py).
+# The line is built using the simulation parameters saved in the snapshot,
+# except those given in <parameters> (to try out variants of the line
+# from the same state). Note that this sets the simulation parameters above.
+# Fails if a changed buffer_capacity_per_stage would leave PCBs in the
+# buffering module that can never be output (the batch would not finish).
+def RestoreAssemblyLine(snapshot, parameters=None):
+    SetParameters(snapshot["parameters"])
+    if(parameters!=None):
+        SetParameters(parameters)
+    state = snapshot["components"]["buffering_module"]
+    if(buffering_enabled and "banks" in state):
+        num_to_input = batch_size - state["flow_stats"]["num_put"]
+        assert(can_output_all(state, buffer_capacity_per_stage, num_to_input)),("buffer_capacity_per_stage="+str(buffer_capacity_per_stage)+" would strand PCBs in the buffering module ("+str(num_to_input)+" PCBs are still to be buffered)")
+    env = CreateEnvironment(initial_time=snapshot["time"])
+    line = BuildAssemblyLine(env)
+    return Snapshot.RestoreSnapshot(snapshot, line)
+
+
+# Function to run simulation.
+# If a snapshot is given (see Snapshot.py), the simulation
+# continues from the state saved in the snapshot.
+def RunSimulation(snapshot=None):
+
+    if(snapshot==None):
+        # Create an Environment:
+        env=CreateEnvironment()
+
+        # Instantiate the assembly line
+        line = BuildAssemblyLine(env)
+    else:
+        line = RestoreAssemblyLine(snapshot)
+        env = line.env
+    sink_1 = line.sink_1
 
     # Run simulation, 
     T =3600*max_simulation_time_in_hours
@@ -280,17 +572,94 @@ def RunSimulation():
     current_time_str = current_time.strftime("%Y-%m-%d %H:%M")
     print("Activity Log generated on ",current_time_str)
 
-    env.run(until=simpy.events.AnyOf(env,[sink_1.stop_condition, env.timeout(T)]))
+    end = GetEndEvent(line)
+    if(checkpoint_interval_in_hours>0):
+        RunWithCheckpoints(line, end)
+    else:
+        env.run(until=end)
 
 
     # Print simulation results:
     sys.stdout = original_stdout
 
     if(print_activity_log): print("Activity log generated in file: activity_log.txt")
+    result = GetResults(line)
+    if(profile_simulation):
+        Profiler.PrintProfile(env)
+        Profiler.SaveCollapsedStacks(env, profile_file)
+        print("Profile saved in file:",profile_file)
+    if(trace_PCBs):
+        Traceability.PrintSojournTimes(line.trace)
+        line.trace.save(trace_file)
+        print("PCB traces saved in file:",trace_file)
+    if(record_state_histories):
+        line.history.save(state_history_file)
+        print("State histories saved in file:",state_history_file)
+        Timeline.Timeline(line.history).save_svg(timeline_file)
+        print("Timeline saved in file:",timeline_file)
+    if(detect_bottlenecks):
+        Bottleneck.PrintBottlenecks(line.bottleneck_detector)
+    return result
+
+
+# Function to create a SimPy Environment for the line
+# (with the profiler, if profile_simulation is enabled)
+def CreateEnvironment(initial_time=0):
+    if(profile_simulation):
+        return Profiler.ProfiledEnvironment(initial_time, profile_sample_interval)
+    return simpy.Environment(initial_time)
+
+
+# The event at which a run of the line ends: when <batch_size> PCBs have
+# been processed or max_simulation_time_in_hours has elapsed.
+def GetEndEvent(line):
+    env = line.env
+    T = 3600*max_simulation_time_in_hours
+    return simpy.events.AnyOf(env,[line.sink_1.stop_condition, env.timeout(max(T-env.now, 0))])
+
+
+# Run the simulation until the event <end>, saving a snapshot
+# of the line into checkpoint_file at regular intervals.
+def RunWithCheckpoints(line, end):
+    env = line.env
+    while(not RunUntil(env, end, env.now + 3600*checkpoint_interval_in_hours)):
+        Snapshot.SaveSnapshot(Snapshot.TakeSnapshot(line), checkpoint_file)
+
+
+# Run the simulation until time <t>, or until the event <end> occurs
+# (as env.run(until=end) would), whichever is earlier.
+# Returns True if <end> has occurred. When the simulation is paused at
+# time t, a snapshot of the line can be taken (see Snapshot.py).
+def RunUntil(env, end, t):
+    if(end.processed):
+        return True
+    finished = []
+    def stop(event):
+        finished.append(event)
+        simpy.core.StopSimulation.callback(event)
+    end.callbacks.append(stop)
+    env.run(until=t)
+    if(len(finished)==0):
+        end.callbacks.remove(stop)
+    return len(finished)!=0
+
+
+# Function to print the stats of an assembly line 
+# (at the current simulation time) and return the results as a list:
+# [k, N, avg_throughput, avg_cycle_time_hrs, max_cycle_time_hrs, avg_energy_per_PCB, <RFO utilization>..., avg_cost_per_PCB]
+# (see RESULT_NAMES)
+def GetResults(line):
+
+    env = line.env
+    source_1, line_loader, screen_printer = line.source_1, line.line_loader, line.screen_printer
+    belt_SP_to_PP1, belt_buffering_module_to_RFO = line.belt_SP_to_PP1, line.belt_buffering_module_to_RFO
+    pick_and_place_1, pick_and_place_2 = line.pick_and_place_1, line.pick_and_place_2
+    buffering_module, reflow_oven, sink_1 = line.buffering_module, line.reflow_oven, line.sink_1
+    humans = line.humans
+
     # Compute stats:
     machines = [line_loader, screen_printer, belt_SP_to_PP1, pick_and_place_1, pick_and_place_2, buffering_module, belt_buffering_module_to_RFO, reflow_oven]
     machines_e = [screen_printer, pick_and_place_1, pick_and_place_2, buffering_module, reflow_oven]
-    humans = [human_operator_1]
     total_energy=0.0
     for i in machines_e:
         total_energy+=sum(i.get_energy_consumption())
@@ -300,8 +669,11 @@ def RunSimulation():
     avg_throughput = sink_1.num_items_finished/float(env.now)*3600  #PCBs per hour
     avg_cycle_time_hrs = sink_1.average_cycle_time/3600.0 #hours
     max_cycle_time_hrs = sink_1.max_cycle_time/3600.0 #hours
-    avg_energy_per_PCB = total_energy/(float(sink_1.num_items_finished)*1e3) # kilo Joules per PCB
-    RFO_utilization = reflow_oven.get_utilization()
+    avg_energy_per_PCB = total_energy/(max(float(sink_1.num_items_finished),1.0)*1e3) # kilo Joules per PCB
+    utilization = reflow_oven.get_utilization()
+    RFO_utilization = [utilization[reflow_oven.states.index(s)] if s in reflow_oven.states else 0.0 for s in RFO_STATES]
+    energy_cost = line.energy_meter.get_cost(sink_1.num_items_finished)
+    avg_cost_per_PCB = energy_cost["cost_per_PCB"]
 
     # Print usage statistics:
     # 
@@ -322,6 +694,8 @@ def RunSimulation():
         i.print_utilization()
     for i in humans:
         i.print_utilization()
+
+    PrintFlowStats(GetFlowStats(line))
     
     print("\n================================")
     print("Energy Consumption: ")
@@ -331,9 +705,33 @@ def RunSimulation():
     print("Total energy consumed = ",total_energy/1e3, "Kilo Joules")
     if(sink_1.num_items_finished==0): sink_1.num_items_finished =1
     print ("Average energy consumed per-PCB = %0.2f" %(avg_energy_per_PCB)," Kilo Joules per PCB.")
+    EnergyCost.PrintEnergyCost(energy_cost)
 
     result = [reflow_oven_turn_on_margin_k, buffer_capacity_per_stage, avg_throughput, avg_cycle_time_hrs, max_cycle_time_hrs, avg_energy_per_PCB]
     result.extend(RFO_utilization)
+    result.append(avg_cost_per_PCB)
 
     return result
 
+
+# Occupancy, blocking and starvation statistics of the connection elements
+# between the machines (see FlowStats.py), and the Little's law check for the line.
+# Returns {"elements": {name: stats}, "line": <as returned by FlowStats.GetLittleCheck>}
+def GetFlowStats(line):
+    elements = dict([(c.name, c.flow_stats.get_stats()) for c in line.connections])
+    return {"elements":elements, "line":FlowStats.GetLittleCheck(line.wip, line.sink_1)}
+
+def PrintFlowStats(flow_stats):
+    print("\n================================")
+    print("Buffers and belts (occupancy, blocking and starvation):")
+    print("================================")
+    print("%-30s %9s %5s %10s %8s %10s %8s %10s"%("element", "avg items", "max", "blocked", "times", "starved", "times", "avg time"))
+    for name, s in flow_stats["elements"].items():
+        average_time = "%10.1f"%s["average_time"] if s["average_time"]!=None else "%10s"%"-"
+        print("%-30s %9.2f %5d %9.2f%% %8d %9.2f%% %8d %s"%(name, s["average_occupancy"], s["max_occupancy"],
+              s["blocked_fraction"]*100, s["num_blocked"], s["starved_fraction"]*100, s["num_starved"], average_time))
+    w = flow_stats["line"]
+    print("Average WIP = %0.2f PCBs (max %d, %d at the end)"%(w["average_WIP"], w["max_WIP"], w["WIP_at_end"]))
+    print("Little's law: throughput x average cycle-time = %0.2f PCBs/hour x %0.2f seconds = %0.2f PCBs (difference %0.2f%%)"%(
+          w["throughput"], w["average_cycle_time"], w["little_WIP"], w["relative_error"]*100))
+
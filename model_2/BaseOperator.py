@@ -16,6 +16,9 @@
 
 import random
 import simpy
+import RandomVariates
+import MachineFailures
+import math
 
 class BaseOperator(object):
     
@@ -25,6 +28,28 @@ class BaseOperator(object):
 
         #start_time
         self.start_time=0
+
+        # seed for this machine's own streams of random variates
+        self.random_seed=0
+
+        # failure modelling (see enable_failures()):
+        # the flag failure_due is set when a failure has occured
+        # and the machine should go "down" at the next opportunity.
+        self.failure_due = False
+        self.failure_schedule = None
+        self.repair_operator = None
+        self.num_breakdowns = 0
+        self.state_before_breakdown = None
+        self.step_after_breakdown = None
+
+        # traceability (see Traceability.py): if set, the station
+        # writes the times at which PCBs enter and leave it.
+        self.trace = None
+
+        # objects that are notified of changes of state, through
+        # record(time, new_state), just before the state changes
+        # (see StateHistory.py and Bottleneck.py)
+        self.state_listeners = []
         
         #default states:
         self.states = ["none"]
@@ -59,6 +84,59 @@ class BaseOperator(object):
             assert(p>0)
         self.power_ratings = power_ratings
 
+    # add a state (such as "down") to the set of states
+    # defined for this machine, along with its power rating.
+    def add_state(self, state, power_rating=0.0):
+        assert(state not in self.states)
+        self.states = self.states + [state]
+        self.time_spent_in_state = self.time_spent_in_state + [0.0]
+        self.power_ratings = list(self.power_ratings) + [power_rating]
+
+    # enable failures for this machine. 
+    # time_between_failures is a fixed integer or a distribution spec
+    # (see RandomVariates.py), and power_rating is the power 
+    # consumed in the "down" state.
+    def enable_failures(self, time_between_failures, power_rating=0.0):
+        self.add_state("down", power_rating)
+        self.repair_done = simpy.Store(self.env,capacity=1)
+        self.failure_schedule = MachineFailures.FailureSchedule(self.env, self, time_between_failures)
+
+    def set_repair_operator(self, operator):
+        self.repair_operator = operator
+
+    # go "down" and wait until a repair has been performed
+    # by the repair operator. To be called as a step (see Steps.py)
+    # at integer time instants when self.failure_due is set.
+    # After the repair, the behavior continues with <next_step>.
+    def breakdown(self, next_step):
+        assert(self.repair_operator!=None),("please assign a repair_operator to "+self.name)
+        self.state_before_breakdown = self.current_state
+        self.step_after_breakdown = next_step
+        self.change_state("down")
+        self.num_breakdowns += 1
+        print("T=",self.env.now+0.0,self.name,"broke down! Notifying repair operator.")
+        self.repair_operator.request_task(self.name, "repair")
+        
+        # wait until the repair is performed
+        return self.repaired, self.repair_done.get()
+
+    def repaired(self, value):
+        print("T=",self.env.now+0.0,self.name,"repair done.")
+        self.failure_due = False
+        
+        # wait until an integer time instant
+        return self.recovered, self.env.timeout(math.ceil(self.env.now)-self.env.now)
+
+    def recovered(self, value):
+        self.change_state(self.state_before_breakdown)
+        return self.step_after_breakdown, None
+
+    # create a stream of integer values for a parameter of this machine.
+    # The parameter can be a fixed integer or a distribution spec
+    # (see RandomVariates.py).
+    def get_variate_stream(self, spec, parameter_name):
+        return RandomVariates.get_variate_stream(spec, self.random_seed, self.name+"."+parameter_name)
+
     # function to record the time spent in the current state 
     # since the last timestamp
     def update_time_spent_in_current_state(self):
@@ -69,6 +147,9 @@ class BaseOperator(object):
     def change_state(self, new_state):
         prev_state = self.current_state 
         self.update_time_spent_in_current_state()
+        if(new_state!=prev_state):
+            for listener in self.state_listeners:
+                listener.record(self.env.now, new_state)
         self.current_state = new_state
         self.state_change_timestamp=self.env.now
         if(new_state!=prev_state):
@@ -119,4 +200,33 @@ class BaseOperator(object):
             print("{0:.2f}".format(e_percent)+"%",end=' ')
         print (") Total energy = ","{0:.2f}".format(total_e/1e3)," Kilo Joules.",end=' ')
         print("")
-   
+
+
+    # state of the machine/operator as plain data (see Snapshot.py).
+    # Derived classes add their own state variables.
+    def get_state(self):
+        state = {}
+        state["current_state"] = self.current_state
+        state["time_spent_in_state"] = list(self.time_spent_in_state)
+        state["state_change_timestamp"] = self.state_change_timestamp
+        state["failure_due"] = self.failure_due
+        state["num_breakdowns"] = self.num_breakdowns
+        state["state_before_breakdown"] = self.state_before_breakdown
+        state["step_after_breakdown"] = self.step_after_breakdown.__name__ if self.step_after_breakdown!=None else None
+        if(self.failure_schedule!=None):
+            state["failure_schedule"] = self.failure_schedule.get_state()
+            state["repair_done"] = list(self.repair_done.items)
+        return state
+
+    def set_state(self, state):
+        assert(len(state["time_spent_in_state"])==len(self.states)),("snapshot does not match the states of "+self.name)
+        self.current_state = state["current_state"]
+        self.time_spent_in_state = list(state["time_spent_in_state"])
+        self.state_change_timestamp = state["state_change_timestamp"]
+        self.failure_due = state["failure_due"]
+        self.num_breakdowns = state["num_breakdowns"]
+        self.state_before_breakdown = state["state_before_breakdown"]
+        self.step_after_breakdown = getattr(self, state["step_after_breakdown"]) if state["step_after_breakdown"]!=None else None
+        if(self.failure_schedule!=None and "failure_schedule" in state):
+            self.failure_schedule.set_state(state["failure_schedule"])
+            self.repair_done.items = list(state["repair_done"])
@@ -0,0 +1,140 @@
+# Bottleneck.py
+#
+# Online detection of the bottleneck of the line
+# using the active-period method.
+#
+# Each machine is either active (processing, cleaning, in setup, down,
+# or waiting for a refill/repair) or inactive (starved, i.e. waiting
+# for a PCB, or blocked, i.e. waiting to output a PCB). At any time, the
+# momentary bottleneck is the active machine whose current active period
+# is the longest (the one that became active the earliest): the other
+# machines were starved or blocked more recently, and waited for it.
+#
+# When the active period of the bottleneck ends, the bottleneck moves to the
+# next machine. The overlap of the active periods of the old and the new
+# bottleneck is a shifting bottleneck for both: during the overlap,
+# either of them could have limited the throughput. The rest of the
+# time during which a machine was the bottleneck is a sole bottleneck.
+# At the end of the run, the fraction of time for which each machine
+# was the sole or shifting bottleneck is reported.
+#
+# The detector is notified of the changes of state of the machines
+# (by BaseOperator.change_state()). The active machines are kept in the
+# order in which they became active, so that the cost of each change
+# of state does not depend on the number of machines or on the run length.
+#
+# Usage:
+#   set detect_bottlenecks = True in AssemblyLine.py, or
+#   detector = BottleneckDetector(env)
+#   detector.add_machine(machine)    (for each machine)
+#   ...run the simulation...
+#   detector.get_bottleneck()        (the momentary bottleneck)
+#   PrintBottlenecks(detector)
+#
+# Author: Neha Karanjkar
+
+import sys
+from collections import OrderedDict
+
+
+# States in which a machine is starved or blocked.
+# All other states are active.
+INACTIVE_STATES = ["idle", "empty", "stalled", "off", "bypass", "waiting_to_output", "temperature_maintain_unoccupied"]
+
+
+# Active periods and bottleneck times of a single machine
+class MachineActivity():
+
+    def __init__(self, detector, machine):
+        self.detector = detector
+        self.machine = machine
+        self.active_since = None        # start of the current active period (None if inactive)
+        self.bottleneck_since = None    # the time at which it became the momentary bottleneck
+        self.sole_time = 0.0            # time for which it was the sole bottleneck
+        self.shifting_time = 0.0        # time for which it was a shifting bottleneck
+
+    # notified by the machine, just before it changes state
+    def record(self, t, new_state):
+        self.detector.activity_changed(self, t, new_state not in self.detector.inactive_states)
+
+
+class BottleneckDetector():
+
+    def __init__(self, env, inactive_states=INACTIVE_STATES):
+        self.env = env
+        self.inactive_states = inactive_states
+        self.machines = OrderedDict()
+
+        # active machines, in the order in which they became active
+        self.active = OrderedDict()
+        self.bottleneck = None
+
+        # time up to which the bottleneck times have been accounted for
+        self.start_time = env.now
+        self.last_time = env.now
+        self.no_bottleneck_time = 0.0
+
+    def add_machine(self, machine):
+        activity = MachineActivity(self, machine)
+        machine.state_listeners.append(activity)
+        self.machines[machine.name] = activity
+        self.activity_changed(activity, self.env.now, machine.current_state not in self.inactive_states)
+
+    def activity_changed(self, activity, t, active):
+        if(active==(activity.active_since!=None)):
+            return
+        self.update(t)
+        if(active):
+            activity.active_since = t
+            self.active[activity] = None
+        else:
+            activity.active_since = None
+            del self.active[activity]
+
+        # the momentary bottleneck changes only when
+        # the active period of the bottleneck ends
+        bottleneck = next(iter(self.active)) if len(self.active)!=0 else None
+        if(bottleneck is not self.bottleneck):
+            if(self.bottleneck!=None and bottleneck!=None):
+                # the overlap of the active periods of the old and new bottleneck
+                # (so far counted as a sole bottleneck for the old one)
+                overlap = t - max(bottleneck.active_since, self.bottleneck.bottleneck_since)
+                self.bottleneck.sole_time -= overlap
+                self.bottleneck.shifting_time += overlap
+                bottleneck.shifting_time += overlap
+            self.bottleneck = bottleneck
+            if(bottleneck!=None):
+                bottleneck.bottleneck_since = t
+
+    # account for the time since the last update (until time t)
+    def update(self, t):
+        if(self.bottleneck!=None):
+            self.bottleneck.sole_time += t - self.last_time
+        else:
+            self.no_bottleneck_time += t - self.last_time
+        self.last_time = t
+
+    # name of the momentary bottleneck (None if no machine is active)
+    def get_bottleneck(self):
+        return self.bottleneck.machine.name if self.bottleneck!=None else None
+
+    # Fractions of time (until now) for which each machine was
+    # the sole or shifting bottleneck. Returns {name: (sole, shifting)}
+    def get_shares(self):
+        self.update(self.env.now)
+        total_time = max(self.last_time - self.start_time, 1e-12)
+        return OrderedDict([(name, (a.sole_time/total_time, a.shifting_time/total_time)) for name, a in self.machines.items()])
+
+
+# Print the bottleneck shares of all machines, largest first
+def PrintBottlenecks(detector, file=None):
+    file = file if file!=None else sys.stdout
+    shares = detector.get_shares()
+    print("\n================================", file=file)
+    print("Bottlenecks (active-period method):", file=file)
+    print("================================", file=file)
+    print("%-30s %10s %10s %10s"%("machine", "sole", "shifting", "total"), file=file)
+    for name, (sole, shifting) in sorted(shares.items(), key=lambda x: -(x[1][0]+x[1][1])):
+        print("%-30s %9.2f%% %9.2f%% %9.2f%%"%(name, sole*100, shifting*100, (sole+shifting)*100), file=file)
+    total_time = max(detector.last_time - detector.start_time, 1e-12)
+    print("%-30s %9.2f%%"%("(no machine active)", detector.no_bottleneck_time/total_time*100), file=file)
@@ -0,0 +1,120 @@
+# Branch.py
+#
+# What-if studies that branch a running simulation.
+#
+# Questions such as "what if buffering_mode is switched from LIFO to FIFO
+# at t=20 hours?" share the first part of the run (the prefix) with the
+# baseline. Instead of running N complete simulations, the simulation is run
+# once up to the branching time, and the process is then forked (using
+# os.fork(), see Forecast.run_forks) into one child per variant. The children
+# share the memory of the parent copy-on-write.
+#
+# Each child applies the parameter changes of its variant from the branching
+# time onwards (the line is rebuilt with the changed parameters from a snapshot
+# of its state, see Snapshot.py), and runs the simulation to completion.
+# The results are sent back to the parent over pipes as each child finishes.
+#
+# A variant is a dictionary of simulation parameters (see AssemblyLine.py).
+# An empty dictionary continues the baseline. The line must have the same
+# components in all variants (for example, the number of operators or of
+# buffering banks cannot be changed). Parameters that only determine
+# random variates (such as machine_MTBF) take effect from the next draw.
+# A variant fails if its buffer_capacity_per_stage would leave PCBs in the
+# buffering module that can never be output (see AssemblyLine.RestoreAssemblyLine),
+# and a branch fails if its batch is not finished within max_simulation_time_in_hours.
+#
+# Usage:
+#   variants = [{}, {"buffering_mode":"FIFO"}, {"buffer_capacity_per_stage":64}]
+#   branches = RunBranches(branch_time=20*3600, variants=variants)
+#   PrintBranches(branches)
+#
+# Note: os.fork() is available only on Unix-like systems.
+#
+# Author: Neha Karanjkar
+
+import os
+import sys
+import time
+import contextlib
+from io import StringIO
+
+import AssemblyLine as AL
+import Snapshot
+from Forecast import run_forks
+
+
+# Build the line (using the current simulation parameters in AssemblyLine.py),
+# run it until <branch_time>, and then run each of the <variants> to
+# completion in a forked child (at most <num_parallel> at a time).
+# If on_result is given, on_result(branch) is called as soon as a variant finishes.
+# Returns a list with a dictionary for each variant:
+#   {"variant":..., "end_time":..., "PCBs_finished":...,
+#    "result": <as returned by AssemblyLine.GetResults>, "report": <printed stats>,
+#    "flow_stats": <as returned by AssemblyLine.GetFlowStats>}
+# A branch that failed (an invalid variant, or a batch that was not finished
+# within max_simulation_time_in_hours) has "result":None and an "error".
+def RunBranches(branch_time, variants, num_parallel=None, on_result=None):
+    assert(branch_time>0 and len(variants)>=1)
+    if(num_parallel==None):
+        num_parallel = os.cpu_count() or 1
+    wall_start = time.time()
+
+    # run the shared prefix (the activity log is not printed)
+    env = AL.CreateEnvironment()
+    with open(os.devnull, "w") as f, contextlib.redirect_stdout(f):
+        line = AL.BuildAssemblyLine(env)
+        end = AL.GetEndEvent(line)
+        AL.RunUntil(env, end, branch_time)
+    snapshot = Snapshot.TakeSnapshot(line)
+    prefix_wall_time = time.time()-wall_start
+
+    # function executed in each fork
+    def run_branch(i):
+        branch, branch_end = line, end
+        with open(os.devnull, "w") as f, contextlib.redirect_stdout(f):
+            if(len(variants[i])!=0):
+                try:
+                    branch = AL.RestoreAssemblyLine(snapshot, variants[i])
+                except AssertionError as e:
+                    return {"variant":variants[i], "result":None, "report":"", "error":str(e)}
+                branch_end = AL.GetEndEvent(branch)
+            branch.env.run(until=branch_end)
+        PCBs_finished = branch.sink_1.num_items_finished
+        flow_stats = AL.GetFlowStats(branch)
+        report = StringIO()
+        with contextlib.redirect_stdout(report):
+            result = AL.GetResults(branch)
+        branch_result = {"variant":variants[i], "end_time":branch.env.now, "PCBs_finished":PCBs_finished,
+                "result":result, "report":report.getvalue(), "flow_stats":flow_stats}
+        if(not branch.sink_1.stop_condition.triggered):
+            branch_result["result"] = None
+            branch_result["error"] = "the batch was not finished within max_simulation_time_in_hours"
+        return branch_result
+
+    def result_received(i, branch):
+        if(branch!=None):
+            branch["wall_time"] = time.time()-wall_start
+            if(on_result!=None):
+                on_result(branch)
+
+    branches = run_forks(run_branch, len(variants), num_parallel, on_result=result_received)
+    for i in range(len(branches)):
+        if(branches[i]==None):
+            branches[i] = {"variant":variants[i], "result":None, "report":"", "error":"branch failed"}
+        branches[i]["branch_time"] = env.now
+        branches[i]["prefix_wall_time"] = prefix_wall_time
+    return branches
+
+
+def PrintBranches(branches, file=None):
+    file = file if file!=None else sys.stdout
+    print("\n================================", file=file)
+    print("Branches at T= %0.2f hours (prefix simulated in %0.2f seconds):"%(branches[0]["branch_time"]/3600.0, branches[0]["prefix_wall_time"]), file=file)
+    print("================================", file=file)
+    for b in branches:
+        variant = ", ".join([k+"="+str(v) for k, v in b["variant"].items()]) or "baseline"
+        r = b["result"]
+        if(r==None):
+            print(variant,": FAILED (",b["error"],")", file=file)
+            continue
+        print(variant,": %d PCBs finished at T= %0.2f hours, throughput = %0.2f PCBs/hour, avg cycle-time = %0.2f hours, energy per PCB = %0.2f kJ, cost per PCB = %0.2f"%(b["PCBs_finished"], b["end_time"]/3600.0, r[2], r[3], r[5], r[AL.RESULT_NAMES.index("avg_cost_per_PCB")]), file=file)
@@ -10,6 +10,8 @@
 #   Date: 27 Oct 2017
 
 import random,simpy
+from PCB import item_to_data, item_from_data
+from FlowStats import FlowStats, FlowStore
 
 
 
@@ -24,8 +26,11 @@ class Buffer():
         
         assert(isinstance(capacity,int) and (capacity>=1))
         
+        # occupancy, blocking and starvation statistics (see FlowStats.py)
+        self.flow_stats=FlowStats(env)
+
         #instantiate a SimPy buffer
-        self.buf=simpy.Store(env,capacity=capacity)
+        self.buf=FlowStore(env,capacity=capacity,flow_stats=self.flow_stats)
 
     def __str__(self):
         return self.name
@@ -40,24 +45,26 @@ class Buffer():
     
 
     #Non-blocking methods to get state of the buffer
+    #(a machine that waits because of a False reports it
+    # to flow_stats, as a blocked/starved period, see FlowStats.py)
     def can_put(self):
-        if(len(self.buf.items) < self.capacity):
-            return True
-        else:
-            return False
+        return (len(self.buf.items) < self.capacity)
     
     def can_get(self):
-        if(len(self.buf.items)!=0):
-            return True
-        else:
-            return False
+        return (len(self.buf.items)!=0)
     
     # A non-blocking methods that 
     # returns a reference to the job
     # that would have been returned by get()
     def get_copy(self):
-        assert(self.can_get())
+        assert(len(self.buf.items)!=0)
         x = self.buf.items[-1]
         return x
 
+    # contents of the buffer as plain data (see Snapshot.py)
+    def get_state(self):
+        return {"items":[item_to_data(i) for i in self.buf.items], "flow_stats":self.flow_stats.get_state()}
 
+    def set_state(self, state):
+        self.buf.items = [item_from_data(d) for d in state["items"]]
+        self.flow_stats.set_state(state["flow_stats"])
@@ -17,6 +17,9 @@
 
 import random,simpy
 from BaseOperator import BaseOperator
+from PCB import item_to_data, item_from_data
+from FlowStats import FlowStats, FlowStore
+from Steps import run_steps
 
 
 class ConveyorBelt(BaseOperator):
@@ -36,10 +39,14 @@ class ConveyorBelt(BaseOperator):
         assert(isinstance(self.delay_per_stage,int))
         assert(isinstance(self.start_time, int))
 
+        # occupancy, blocking and starvation statistics (see FlowStats.py)
+        self.flow_stats=FlowStats(env)
+
         # create input and output buffers
         # corresponding to the first and last stages
-        self.input_buf=simpy.Store(env,capacity=1)
-        self.output_buf=simpy.Store(env,capacity=1)
+        # (PCBs enter the belt at the input buffer, and leave it at the output buffer)
+        self.input_buf=FlowStore(env,capacity=1,flow_stats=self.flow_stats,count_gets=False)
+        self.output_buf=FlowStore(env,capacity=1,flow_stats=self.flow_stats,count_puts=False)
 
         # a list to model stages
         self.stages=[None for i in range(num_stages)]
@@ -48,7 +55,7 @@ class ConveyorBelt(BaseOperator):
         self.define_states(["empty", "moving", "stalled"],start_state="empty")
 
         # start behavior
-        self.process=env.process(self.behavior())
+        self.process=env.process(run_steps(self, self.behavior))
 
 
     def __str__(self):
@@ -63,23 +70,18 @@ class ConveyorBelt(BaseOperator):
         return self.input_buf.put(job)
     
     #Non-blocking methods to get state of the belt
+    #(see Buffer.py)
     def can_put(self):
-        if(len(self.input_buf.items)==0):
-            return True
-        else:
-            return False
+        return (len(self.input_buf.items)==0)
     
     def can_get(self):
-        if(len(self.output_buf.items)!=0):
-            return True
-        else:
-            return False
+        return (len(self.output_buf.items)!=0)
     
     # A non-blocking methods that 
     # returns a reference to the job
     # that would have been returned by get()
     def get_copy(self):
-        assert(self.can_get())
+        assert(len(self.output_buf.items)!=0)
         x = self.output_buf.items[0]
         return x
 
@@ -105,52 +107,99 @@ class ConveyorBelt(BaseOperator):
         return True
 
             
-    def behavior(self):
+    def behavior(self, value):
         
         self.change_state("empty")
 
         #wait until the start_time
-        yield (self.env.timeout(self.start_time))
+        return self.start, self.env.timeout(self.start_time)
+
+    # Steps of the behavior (see Steps.py):
+
+    # at the start of each time-slot: wait while the conveyor
+    # belt is empty or stalled (a polling step, see Steps.py)
+    def start(self, value):
+        while(True):
+            # go down if a failure has occured
+            if(self.failure_due):
+                return self.breakdown(next_step=self.move)
+            if(self.can_move()):
+                return self.pick_up()
+            yield self.env.timeout(self.delay_per_stage)
+
+    # (after a repair, the belt continues from here
+    # without checking for a failure)
+    def move(self, value):
+        if(self.can_move()):
+            return self.pick_up()
+        return self.start, self.env.timeout(self.delay_per_stage)
+
+    def can_move(self):
+        # if the conveyor belt is empty, do nothing.
+        if (self.empty()):
+            self.change_state("empty")
+            return False
+
+        # else, check if the conveyor belt is stalled
+        elif (len(self.output_buf.items)!=0):
+            self.change_state("stalled")
+            print("T=",self.env.now+0.0, self.name, "Stalled", self.show_occupancy())
+            return False
+        return True
+
+    # the conveyor belt can be moved.
+    def pick_up(self):
+        self.change_state("moving")
         
-        while True:
-            
-            # if the conveyor belt is empty, do nothing.
-            if (self.empty()):
-                self.change_state("empty")
-                yield (self.env.timeout(self.delay_per_stage))
+        #pick up the object from input_buf if present
+        if(len(self.input_buf.items)==0):
+            return self.shift_right, None
+        return self.shift_right, self.input_buf.get()
 
-            # else, check if the conveyor belt is stalled
-            elif (len(self.output_buf.items)!=0):
-                self.change_state("stalled")
-                print("T=",self.env.now+0.0, self.name, "Stalled", self.show_occupancy())
-                yield (self.env.timeout(self.delay_per_stage))
-            
-            # else check if the conveyor belt can be moved.
-            else:
-                self.change_state("moving")
-                
-                #pick up the object from input_buf if present
-                if(len(self.input_buf.items)==0):
-                    obj=None
-                else:
-                    obj=yield self.input_buf.get()
-                self.stages[0]=obj
-            
-                #shift right
-                self.stages = [None] + self.stages[0:-1]
-
-                # delay
-                yield (self.env.timeout(self.delay_per_stage-1))
-                # wait until the middle of the time-slot
-                yield (self.env.timeout(0.5))
-
-                #put the last object in output_buf
-                obj=self.stages[-1]
-                if(obj!=None):
-                    yield self.output_buf.put(self.stages[-1])
-                print("T=",self.env.now+0.0, self.name, "Shift-right", self.show_occupancy())
-                # wait until an integer time instant
-                yield (self.env.timeout(0.5))
+    def shift_right(self, value):
+        self.stages[0]=value
+        if(self.trace!=None and self.stages[0]!=None): self.trace.enter(self.stages[0], self.env.now)
+    
+        #shift right
+        self.stages = [None] + self.stages[0:-1]
+
+        # delay
+        return self.half_slot, self.env.timeout(self.delay_per_stage-1)
+
+    # wait until the middle of the time-slot
+    def half_slot(self, value):
+        return self.output, self.env.timeout(0.5)
+
+    #put the last object in output_buf
+    def output(self, value):
+        obj=self.stages[-1]
+        if(obj!=None):
+            return self.shifted, self.output_buf.put(self.stages[-1])
+        return self.shifted, None
+
+    def shifted(self, value):
+        print("T=",self.env.now+0.0, self.name, "Shift-right", self.show_occupancy())
+        # (the object in the last stage, if any, has been put in output_buf)
+        if(self.trace!=None and self.stages[-1]!=None): self.trace.leave(self.stages[-1], self.env.now)
+        # wait until an integer time instant
+        return self.start, self.env.timeout(0.5)
+
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        state = BaseOperator.get_state(self)
+        state["stages"] = [item_to_data(i) for i in self.stages]
+        state["input_buf"] = [item_to_data(i) for i in self.input_buf.items]
+        state["output_buf"] = [item_to_data(i) for i in self.output_buf.items]
+        state["flow_stats"] = self.flow_stats.get_state()
+        return state
+
+    def set_state(self, state):
+        BaseOperator.set_state(self, state)
+        assert(len(state["stages"])==self.num_stages)
+        self.stages = [item_from_data(d) for d in state["stages"]]
+        self.input_buf.items = [item_from_data(d) for d in state["input_buf"]]
+        self.output_buf.items = [item_from_data(d) for d in state["output_buf"]]
+        self.flow_stats.set_state(state["flow_stats"])
 
 #testbench function for the ConveyorBelt:
 def test_ConveyorBelt():
@@ -0,0 +1,413 @@
+# DigitalTwin.py
+#
+# Ingestion mode for the assembly line model.
+#
+# In this mode, the model (see AssemblyLine.py) runs alongside the real line
+# and is kept in sync with it using a stream of events reported by the machines.
+# The events correct the state of the model:
+#
+#   {"t":120, "type":"state", "machine":"screen_printer", "state":"printing"}
+#       the state recorded for a machine (used for utilization and energy)
+#   {"t":121, "type":"level", "machine":"screen_printer", "reserve":"solder", "level":350}
+#       the level of a consumable (the "solder" or "adhesive" reserve)
+#   {"t":125, "type":"reel", "machine":"pick_and_place_1", "count":12}
+#       number of PCBs processed since the last reel replacement
+#   {"t":130, "type":"pcb", "buffer":"buff_2", "action":"enter"}
+#       a PCB entered ("enter") or left ("leave") a buffer
+#
+# Events are written one per line, as JSON objects. t is the time (in seconds)
+# at which the event occured, relative to the start of the run.
+#
+# Event sources:
+#   ReplaySource : reads events from a file (a recording of the real line).
+#   TailSource   : follows a file that is being appended to (like "tail -f").
+#   SocketSource : accepts TCP connections and reads events from them.
+#
+# The model is advanced in ticks of <tick> seconds. At each tick boundary,
+# all the events that have arrived with a time <= the current time are applied
+# together as a single batch. Within a batch, only the last correction of each kind
+# for a machine is applied, and PCB movements into/out of a buffer are summed.
+# Thus the cost of a tick depends on the number of distinct corrections
+# and not on the rate of events. Live sources are read in a background thread,
+# so reading and parsing of events does not hold up the model.
+#
+# In realtime mode, the model is paced to the wall clock (optionally sped up by
+# a factor <speedup>). If the model falls behind the wall clock, it runs
+# without sleeping until it has caught up.
+#
+# Usage:
+#   $ python3 DigitalTwin.py --replay events.jsonl
+#   $ python3 DigitalTwin.py --tail events.jsonl --realtime
+#   $ python3 DigitalTwin.py --port 9000 --realtime
+#   $ python3 DigitalTwin.py --port 9000 --realtime --forecast-horizon 8   (see Forecast.py)
+#
+# Author: Neha Karanjkar
+
+import os
+import json
+import contextlib
+import time
+import socket
+import argparse
+import threading
+from collections import deque
+
+import simpy
+import AssemblyLine as AL
+from PCB import PCB, PCBStack
+
+
+#===============================================
+# Event sources
+#===============================================
+
+def parse_event(line):
+    line = line.strip()
+    if(len(line)==0 or line.startswith("#")):
+        return None
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    if(not isinstance(event,dict) or "t" not in event or "type" not in event):
+        return None
+    return event
+
+
+# Events read from a file, in the order of their time-stamps.
+class ReplaySource():
+
+    def __init__(self, file_name):
+        self.file = open(file_name)
+        self.next_event = None
+        self.exhausted = False
+        self.num_invalid_lines = 0
+        self.read_next_event()
+
+    def read_next_event(self):
+        self.next_event = None
+        for line in self.file:
+            event = parse_event(line)
+            if(event!=None):
+                self.next_event = event
+                return
+            if(line.strip()!=""):
+                self.num_invalid_lines += 1
+        self.exhausted = True
+        self.file.close()
+
+    # return all events with time <= t
+    def get_events(self, t):
+        events = []
+        while(self.next_event!=None and self.next_event["t"] <= t):
+            events.append(self.next_event)
+            self.read_next_event()
+        return events
+
+    def is_exhausted(self):
+        return self.exhausted and self.next_event==None
+
+    def close(self):
+        if(not self.file.closed):
+            self.file.close()
+
+
+# Base class for sources that receive events while the model is running.
+# Events are read and parsed in a background thread and
+# collected in a queue, in the order in which they arrive.
+class LiveSource():
+
+    def __init__(self):
+        self.queue = deque()
+        self.num_invalid_lines = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.read_events)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def add_line(self, line):
+        event = parse_event(line)
+        if(event!=None):
+            self.queue.append(event)
+        elif(line.strip()!=""):
+            self.num_invalid_lines += 1
+
+    # return all events with time <= t
+    # (events that arrive late are applied at the next tick)
+    def get_events(self, t):
+        events = []
+        while(len(self.queue)!=0 and self.queue[0]["t"] <= t):
+            events.append(self.queue.popleft())
+        return events
+
+    def is_exhausted(self):
+        return False
+
+    def close(self):
+        self.running = False
+
+
+# Follow a file that is being appended to.
+class TailSource(LiveSource):
+
+    def __init__(self, file_name, from_start=True, poll_interval=0.05):
+        LiveSource.__init__(self)
+        self.file_name = file_name
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+        self.start()
+
+    def read_events(self):
+        while(self.running and not os.path.exists(self.file_name)):
+            time.sleep(self.poll_interval)
+        with open(self.file_name) as f:
+            if(not self.from_start):
+                f.seek(0, os.SEEK_END)
+            partial = ""
+            while self.running:
+                data = f.read()
+                if(data==""):
+                    time.sleep(self.poll_interval)
+                    continue
+                lines = (partial+data).split("\n")
+                partial = lines.pop()
+                for line in lines:
+                    self.add_line(line)
+
+
+# Accept TCP connections (one or more machines or a gateway)
+# and read events from them.
+class SocketSource(LiveSource):
+
+    def __init__(self, host="127.0.0.1", port=9000):
+        LiveSource.__init__(self)
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(8)
+        self.port = self.server.getsockname()[1]
+        self.start()
+
+    def read_events(self):
+        while self.running:
+            try:
+                conn, address = self.server.accept()
+            except OSError:
+                break
+            reader = threading.Thread(target=self.read_connection, args=(conn,))
+            reader.daemon = True
+            reader.start()
+
+    def read_connection(self, conn):
+        with conn, conn.makefile("r") as f:
+            for line in f:
+                self.add_line(line)
+                if(not self.running):
+                    break
+
+    def close(self):
+        self.running = False
+        self.server.close()
+
+
+#===============================================
+# Synchronizer
+#===============================================
+
+class TwinSynchronizer():
+
+    def __init__(self, line):
+        self.line = line
+        self.env = line.env
+
+        #stats
+        self.num_events = 0
+        self.num_batches = 0
+        self.num_corrections = 0
+        self.num_invalid_events = 0
+        self.max_batch_size = 0
+
+    def warn(self, event, message):
+        self.num_invalid_events += 1
+        print("T=",self.env.now+0.0,"digital twin: ignored event",event,":",message)
+
+    # apply a batch of events (at a tick boundary)
+    def apply_batch(self, events):
+        self.num_events += len(events)
+        self.num_batches += 1
+        self.max_batch_size = max(self.max_batch_size, len(events))
+
+        # coalesce the events:
+        # the last correction of each kind wins, and
+        # PCB movements are summed per buffer.
+        corrections = {}
+        pcb_movements = {}
+        for event in events:
+            kind = event["type"]
+            if(kind=="pcb"):
+                delta = 1 if event.get("action")=="enter" else -1
+                name = event.get("buffer")
+                pcb_movements[name] = pcb_movements.get(name,0) + delta
+            elif(kind=="state" or kind=="reel"):
+                corrections[(kind, event.get("machine"))] = event
+            elif(kind=="level"):
+                corrections[(kind, event.get("machine"), event.get("reserve"))] = event
+            else:
+                self.warn(event, "unknown event type")
+
+        for event in corrections.values():
+            self.apply_correction(event)
+        for name, delta in pcb_movements.items():
+            if(delta!=0):
+                self.apply_pcb_movement(name, delta)
+
+    def apply_correction(self, event):
+        machine = self.line.components.get(event.get("machine"))
+        if(machine==None):
+            return self.warn(event, "unknown machine")
+        kind = event["type"]
+
+        if(kind=="state"):
+            state = event.get("state")
+            if(not hasattr(machine,"states") or state not in machine.states):
+                return self.warn(event, "unknown state")
+            if(machine.current_state!=state):
+                machine.change_state(state)
+
+        elif(kind=="level"):
+            reserve = getattr(machine, str(event.get("reserve"))+"_reserve", None)
+            if(not isinstance(reserve, simpy.Container)):
+                return self.warn(event, "unknown reserve")
+            level = min(max(float(event.get("level",0)),0.0), reserve.capacity)
+            if(level > reserve.level):
+                reserve.put(level-reserve.level)
+            elif(level < reserve.level):
+                reserve.get(reserve.level-level)
+
+        elif(kind=="reel"):
+            if(not hasattr(machine,"num_pcbs_processed_since_last_reel_replacement")):
+                return self.warn(event, "machine has no reels")
+            machine.num_pcbs_processed_since_last_reel_replacement = int(event.get("count",0))
+
+        self.num_corrections += 1
+
+    # add or remove PCBs from a buffer
+    # (and from the count of PCBs in the line, see FlowStats.py)
+    def apply_pcb_movement(self, name, delta):
+        buffer = self.line.components.get(name)
+        if(not isinstance(buffer, AL.Buffer)):
+            return self.warn({"type":"pcb","buffer":name}, "unknown buffer")
+        # the buffer at the output of the source holds stacks of PCBs
+        holds_stacks = (buffer is self.line.source_1.outp)
+        while(delta>0 and len(buffer.buf.items)<buffer.capacity):
+            if(holds_stacks):
+                buffer.put(PCBStack(type_ID=self.line.source_1.PCB_type, first_serial_ID=-1, num_PCBs=1, creation_timestamp=self.env.now))
+            else:
+                buffer.put(PCB(type_ID=self.line.source_1.PCB_type, serial_ID=-1, creation_timestamp=self.env.now))
+            self.line.wip.put()
+            delta -= 1
+            self.num_corrections += 1
+        while(delta<0 and len(buffer.buf.items)>0):
+            item = buffer.get().value
+            self.line.wip.got(len(item) if holds_stacks else 1)
+            delta += 1
+            self.num_corrections += 1
+
+
+#===============================================
+# Running the twin
+#===============================================
+
+# Run the model in sync with a source of events.
+#   tick     : interval (in seconds of model time) between successive batches
+#   realtime : pace the model to the wall clock (sped up by a factor <speedup>)
+#   until    : stop at this time (default: when the batch is finished or, for
+#              a replay, when all events have been applied)
+#   on_tick  : optional function on_tick(line) called after each batch
+#              (for example, to run forecasts)
+# Returns the line and the synchronizer.
+def RunTwin(source, tick=1, realtime=False, speedup=1.0, until=None, on_tick=None):
+    assert(tick>0 and speedup>0)
+
+    env = AL.CreateEnvironment()
+    line = AL.BuildAssemblyLine(env)
+    twin = TwinSynchronizer(line)
+    twin.max_lag = 0.0
+
+    log_file = "activity_log.txt" if AL.print_activity_log else os.devnull
+    wall_start = time.time()
+    try:
+        with open(log_file,"w") as f, contextlib.redirect_stdout(f):
+            while(not line.sink_1.stop_condition.triggered):
+                if(until!=None and env.now>=until):
+                    break
+                if(until==None and source.is_exhausted()):
+                    break
+
+                env.run(until=env.now+tick)
+
+                # apply all events that have arrived until now
+                events = source.get_events(env.now)
+                if(len(events)!=0):
+                    twin.apply_batch(events)
+
+                if(on_tick!=None):
+                    on_tick(line)
+
+                # pace the model to the wall clock
+                if(realtime):
+                    lag = (time.time()-wall_start)*speedup - env.now
+                    twin.max_lag = max(twin.max_lag, lag)
+                    if(lag<0):
+                        time.sleep(-lag/speedup)
+    finally:
+        source.close()
+
+    twin.wall_time = time.time()-wall_start
+    return line, twin
+
+
+def PrintTwinStats(twin):
+    print("\n================================")
+    print("Digital twin:")
+    print("================================")
+    print("Events applied =",twin.num_events,"in",twin.num_batches,"batches (max batch size =",twin.max_batch_size,")")
+    print("Corrections made =",twin.num_corrections,", invalid events =",twin.num_invalid_events)
+    print("Wall-clock time = %0.2f seconds ( %0.0f events per second )"%(twin.wall_time, twin.num_events/max(twin.wall_time,1e-9)))
+    print("Max lag behind the wall clock = %0.2f seconds"%(twin.max_lag))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the assembly line model in sync with a stream of machine events")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--replay", help="file with recorded events")
+    group.add_argument("--tail", help="file to follow for new events")
+    group.add_argument("--port", type=int, help="TCP port to receive events on")
+    parser.add_argument("--tick", type=float, default=1, help="seconds of model time between batches")
+    parser.add_argument("--realtime", action="store_true", help="pace the model to the wall clock")
+    parser.add_argument("--speedup", type=float, default=1.0)
+    parser.add_argument("--until", type=float, default=None, help="stop at this time (seconds)")
+    parser.add_argument("--forecast-horizon", type=float, default=None, help="if specified, periodically forecast the next <hours> (see Forecast.py)")
+    parser.add_argument("--forecast-interval", type=float, default=60, help="wall-clock seconds between forecasts")
+    parser.add_argument("--forecast-forks", type=int, default=16, help="number of stochastic forks per forecast")
+    args = parser.parse_args()
+
+    if(args.replay):
+        source = ReplaySource(args.replay)
+    elif(args.tail):
+        source = TailSource(args.tail)
+    else:
+        source = SocketSource(port=args.port)
+
+    on_tick = None
+    if(args.forecast_horizon!=None):
+        import Forecast
+        on_tick = Forecast.PeriodicForecast(horizon=args.forecast_horizon*3600, interval=args.forecast_interval, num_forks=args.forecast_forks)
+
+    line, twin = RunTwin(source, tick=args.tick, realtime=args.realtime, speedup=args.speedup, until=args.until, on_tick=on_tick)
+    if(on_tick!=None):
+        on_tick.finish()
+    AL.GetResults(line)
+    PrintTwinStats(twin)
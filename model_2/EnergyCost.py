@@ -0,0 +1,182 @@
+# EnergyCost.py
+#
+# The cost of the energy consumed by the line, under a time-of-use
+# tariff with a demand charge:
+#   bands          : the price of energy (per kWh) in each band of hours of the day,
+#                    as a list of (start hour, end hour, price), covering all 24 hours
+#   demand_charge  : the price per kW of the peak demand, i.e. the highest average
+#                    power of the line over any of the fixed demand windows
+#                    (of <demand_window> seconds, starting at T=0)
+#   billing_period : the demand charge is billed once per billing period (in seconds),
+#                    and is pro-rated over the duration of the run
+#   start_hour     : the hour of the day at which the simulation starts (T=0)
+#
+# The energy meter of the line sums the power of the machines (given by the power
+# rating of the state that each machine is in) and integrates it over time. It is
+# notified of the changes of state of the machines (by BaseOperator.change_state()),
+# and the power of the line is constant between two changes. At each change, the
+# energy since the last change is added to the hour of the day and the demand
+# window in which it was consumed (splitting it at the hour and window boundaries),
+# so that nothing is stored per change. For example, the cost of the energy
+# consumed by the reflow oven in "setup" (33 kW) depends on the hour at which the
+# setup happens, and on whether it coincides with other loads in the same window.
+#
+# The meter is a component of the line (named "energy_meter"), so that it
+# is saved in snapshots along with the machines (see Snapshot.py).
+#
+# Usage:
+#   set energy_tariff in AssemblyLine.py, or
+#   meter = EnergyMeter(env, tariff)
+#   meter.add_machine(machine)      (for each machine)
+#   ...run the simulation...
+#   meter.get_cost(num_PCBs)
+#
+# Author: Neha Karanjkar
+
+import sys
+
+
+# the price (per kWh) in each of the 24 hours of the day
+def get_hourly_prices(bands):
+    prices = [None for h in range(24)]
+    for start_hour, end_hour, price in bands:
+        assert(isinstance(start_hour,int) and isinstance(end_hour,int) and 0<=start_hour<end_hour<=24),("invalid band of hours "+str((start_hour,end_hour)))
+        for h in range(start_hour, end_hour):
+            assert(prices[h]==None),("hour "+str(h)+" is in more than one band")
+            prices[h] = price
+    assert(None not in prices),("the bands of the tariff should cover all 24 hours")
+    return prices
+
+
+# notified by a machine, just before it changes state
+class MachinePower():
+
+    def __init__(self, meter, machine):
+        self.meter = meter
+        self.machine = machine
+
+    def record(self, t, new_state):
+        self.meter.power_changed(self.machine, t, self.machine.power_ratings[self.machine.states.index(new_state)])
+
+
+class EnergyMeter():
+
+    def __init__(self, env, tariff, name="energy_meter"):
+        self.env = env
+        self.name = name
+        self.tariff = tariff
+        self.prices = get_hourly_prices(tariff["bands"])
+        self.demand_window = tariff["demand_window"]
+        self.start_hour = tariff["start_hour"]
+        assert(self.demand_window>0 and tariff["billing_period"]>0)
+
+        # power (in watts) of each machine, and of the line
+        self.machine_power = {}
+        self.power = 0.0
+
+        # time up to which the energy has been accounted for
+        self.start_time = env.now
+        self.last_time = env.now
+
+        # energy (in joules) consumed in each hour of the day
+        self.energy_per_hour = [0.0 for h in range(24)]
+
+        # energy consumed in the current demand window,
+        # and the highest average power over the windows that have ended
+        self.window_energy = 0.0
+        self.peak_demand = 0.0
+        self.peak_time = None
+
+    def add_machine(self, machine):
+        self.update(self.env.now)
+        machine.state_listeners.append(MachinePower(self, machine))
+        self.machine_power[machine.name] = machine.power_ratings[machine.states.index(machine.current_state)]
+        self.power = sum(self.machine_power.values())
+
+    def power_changed(self, machine, t, power):
+        self.update(t)
+        self.machine_power[machine.name] = power
+        self.power = sum(self.machine_power.values())
+
+    # account for the energy consumed since the last update (until time t),
+    # splitting it at the boundaries of hours and demand windows.
+    def update(self, t):
+        while(self.last_time<t):
+            hour = int(self.last_time//3600)
+            window = int(self.last_time//self.demand_window)
+            end = min(t, (hour+1)*3600.0, (window+1)*float(self.demand_window))
+            energy = self.power*(end-self.last_time)
+            self.energy_per_hour[(hour+self.start_hour)%24] += energy
+            self.window_energy += energy
+            if(end==(window+1)*float(self.demand_window)):
+                self.end_window(window)
+            self.last_time = end
+
+    def end_window(self, window):
+        demand = self.window_energy/self.demand_window
+        if(demand>self.peak_demand):
+            self.peak_demand = demand
+            self.peak_time = window*self.demand_window
+        self.window_energy = 0.0
+
+    # The energy and its cost up to now, for <num_PCBs> PCBs, as a dictionary:
+    #   energy (kWh), energy_cost, peak_demand (kW), peak_time (start of the peak window),
+    #   demand_cost (pro-rated), total_cost, cost_per_PCB,
+    #   and the energy (kWh) and cost in each band of hours of the tariff.
+    def get_cost(self, num_PCBs):
+        self.update(self.env.now)
+        # the current window counts as if it had ended
+        peak_demand, peak_time = self.peak_demand, self.peak_time
+        current_demand = self.window_energy/self.demand_window
+        if(current_demand>peak_demand):
+            peak_demand, peak_time = current_demand, int(self.last_time//self.demand_window)*self.demand_window
+
+        energy_kWh = [e/3.6e6 for e in self.energy_per_hour]
+        energy_cost = sum([e*p for e, p in zip(energy_kWh, self.prices)])
+        elapsed = self.last_time - self.start_time
+        demand_cost = self.tariff["demand_charge"]*(peak_demand/1e3)*(elapsed/self.tariff["billing_period"])
+        bands = []
+        for start_hour, end_hour, price in self.tariff["bands"]:
+            energy = sum(energy_kWh[start_hour:end_hour])
+            bands.append({"hours":(start_hour, end_hour), "price":price, "energy":energy, "cost":energy*price})
+        return {
+            "energy"       : sum(energy_kWh),
+            "energy_cost"  : energy_cost,
+            "peak_demand"  : peak_demand/1e3,
+            "peak_time"    : peak_time,
+            "demand_cost"  : demand_cost,
+            "total_cost"   : energy_cost+demand_cost,
+            "cost_per_PCB" : (energy_cost+demand_cost)/max(num_PCBs, 1),
+            "bands"        : bands,
+        }
+
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        return {"machine_power":dict(self.machine_power), "start_time":self.start_time, "last_time":self.last_time,
+                "energy_per_hour":list(self.energy_per_hour), "window_energy":self.window_energy,
+                "peak_demand":self.peak_demand, "peak_time":self.peak_time}
+
+    def set_state(self, state):
+        assert(set(state["machine_power"])==set(self.machine_power)),("snapshot does not match the machines of "+self.name)
+        self.machine_power = dict(state["machine_power"])
+        self.power = sum(self.machine_power.values())
+        self.start_time = state["start_time"]
+        self.last_time = state["last_time"]
+        self.energy_per_hour = list(state["energy_per_hour"])
+        self.window_energy = state["window_energy"]
+        self.peak_demand = state["peak_demand"]
+        self.peak_time = state["peak_time"]
+
+
+# Print the energy cost, with the energy and cost in each band of hours
+def PrintEnergyCost(cost, file=None):
+    file = file if file!=None else sys.stdout
+    print("\n================================", file=file)
+    print("Energy Cost: ", file=file)
+    print("================================", file=file)
+    for b in cost["bands"]:
+        print("hours %2d-%2d : %10.2f kWh x %0.2f = %10.2f"%(b["hours"][0], b["hours"][1], b["energy"], b["price"], b["cost"]), file=file)
+    print("Total energy = %0.2f kWh, energy cost = %0.2f"%(cost["energy"], cost["energy_cost"]), file=file)
+    peak_time = "-" if cost["peak_time"]==None else "T= %0.2f hours"%(cost["peak_time"]/3600.0)
+    print("Peak demand = %0.2f kW (window starting at %s), demand cost = %0.2f"%(cost["peak_demand"], peak_time, cost["demand_cost"]), file=file)
+    print("Total cost = %0.2f, cost per PCB = %0.4f"%(cost["total_cost"], cost["cost_per_PCB"]), file=file)
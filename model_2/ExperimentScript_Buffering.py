@@ -37,7 +37,7 @@ AL.buffering_mode = "FIFO" #can be either "LIFO" or "FIFO"
 results=[]
 buffer_sizes= [4,8,16,32,64,128,256,512,1024]
 
-results.insert(0,["k","N", "avg_throughput", "avg_cycle_time_hrs", "max_cycle_time_hrs", "avg_energy_per_PCB", "RFO_OFF", "RFO_setup", "RFO_ON_empty", "RFO_ON_occupied"])
+results.insert(0,AL.RESULT_NAMES)
 for i in buffer_sizes:
     AL.buffer_capacity_per_stage = i
     result = AL.RunSimulation()
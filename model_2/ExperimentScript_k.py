@@ -40,7 +40,7 @@ AL.buffering_mode = "FIFO" #can be either "LIFO" or "FIFO"
 results=[]
 k_values= np.arange(0,51,2)
 
-results.insert(0,["k", "N", "avg_throughput", "avg_cycle_time_hrs", "max_cycle_time_hrs", "avg_energy_per_PCB", "RFO_OFF", "RFO_setup", "RFO_ON_empty", "RFO_ON_occupied"])
+results.insert(0,AL.RESULT_NAMES)
 for k in k_values:
     AL.reflow_oven_turn_on_margin_k = int(k)
     result = AL.RunSimulation()
@@ -0,0 +1,187 @@
+# FlowStats.py
+#
+# Time-weighted statistics of the connection elements of the line
+# (the buffers, conveyor belts and buffering modules between the machines):
+#   occupancy : the number of items held by the element, averaged over time,
+#               and its maximum
+#   blocked   : the number of times (and the total time for which) the upstream
+#               side could not put an item into the element because it was full
+#   starved   : the number of times (and the total time for which) the downstream
+#               side wanted an item but found the element empty
+#
+# The machines of the line poll their inputs and outputs at each time-slot
+# (using can_get() and can_put(), which only check the element). A machine that
+# has to wait for a time-slot because its output is full reports it using
+# put_refused(): a blocked period starts at the first such report (or when a
+# put() has to wait) and ends when the item is put into the element. Similarly,
+# a starved period starts at the first get_refused() (or when a get() has to wait)
+# and ends when an item is got.
+# All counters are updated in O(1) time per put/get, and the time-weighted
+# averages are computed from running integrals, so nothing is stored per item.
+#
+# The same statistics are kept for the entire line (see AssemblyLine.py): the
+# number of PCBs in the line (work in progress, WIP) goes up when the source
+# creates a stack of PCBs, and down when the sink consumes a PCB. By Little's
+# law, the average WIP equals the throughput times the average cycle time of
+# the PCBs measured by the sink. The two differ only by the PCBs that are still
+# in the line at the end of the run, which makes this a consistency check of
+# the cycle times and of the statistics themselves (see GetLittleCheck).
+#
+# Author: Neha Karanjkar
+
+import simpy
+
+
+class FlowStats():
+
+    # fields saved in snapshots (see Snapshot.py)
+    FIELDS = ["start_time", "occupancy", "max_occupancy", "occupancy_area", "last_time",
+              "num_put", "num_got", "num_blocked", "blocked_time", "blocked_since",
+              "num_starved", "starved_time", "starved_since"]
+
+    def __init__(self, env):
+        self.env = env
+        self.start_time = env.now
+
+        # current and max number of items, and the integral of
+        # the number of items over time (up to last_time)
+        self.occupancy = 0
+        self.max_occupancy = 0
+        self.occupancy_area = 0.0
+        self.last_time = env.now
+
+        self.num_put = 0
+        self.num_got = 0
+
+        # blocked and starved periods (the start of the
+        # current period, or None if not blocked/starved)
+        self.num_blocked = 0
+        self.blocked_time = 0.0
+        self.blocked_since = None
+        self.num_starved = 0
+        self.starved_time = 0.0
+        self.starved_since = None
+
+    def change_occupancy(self, delta):
+        now = self.env.now
+        self.occupancy_area += self.occupancy*(now-self.last_time)
+        self.last_time = now
+        self.occupancy += delta
+        if(self.occupancy>self.max_occupancy):
+            self.max_occupancy = self.occupancy
+
+    # items were put into the element
+    def put(self, num_items=1):
+        self.change_occupancy(num_items)
+        self.num_put += num_items
+        if(self.blocked_since!=None):
+            self.blocked_time += self.env.now - self.blocked_since
+            self.blocked_since = None
+
+    # items were got from the element
+    def got(self, num_items=1):
+        self.change_occupancy(-num_items)
+        self.num_got += num_items
+        if(self.starved_since!=None):
+            self.starved_time += self.env.now - self.starved_since
+            self.starved_since = None
+
+    # the upstream side could not put an item
+    def put_refused(self):
+        if(self.blocked_since==None):
+            self.blocked_since = self.env.now
+            self.num_blocked += 1
+
+    # the downstream side could not get an item
+    def get_refused(self):
+        if(self.starved_since==None):
+            self.starved_since = self.env.now
+            self.num_starved += 1
+
+    # The statistics up to now, as a dictionary:
+    #   average_occupancy, max_occupancy, occupancy (current),
+    #   items_put, items_got, throughput (items got per hour),
+    #   average_time (seconds spent by an item in the element, by Little's law),
+    #   num_blocked, blocked_time, blocked_fraction,
+    #   num_starved, starved_time, starved_fraction
+    def get_stats(self):
+        now = self.env.now
+        elapsed = now - self.start_time
+        area = self.occupancy_area + self.occupancy*(now-self.last_time)
+        blocked_time = self.blocked_time + (now-self.blocked_since if self.blocked_since!=None else 0.0)
+        starved_time = self.starved_time + (now-self.starved_since if self.starved_since!=None else 0.0)
+        average_occupancy = area/elapsed if elapsed>0 else float(self.occupancy)
+        return {
+            "average_occupancy" : average_occupancy,
+            "max_occupancy"     : self.max_occupancy,
+            "occupancy"         : self.occupancy,
+            "items_put"         : self.num_put,
+            "items_got"         : self.num_got,
+            "throughput"        : self.num_got/elapsed*3600 if elapsed>0 else 0.0,
+            "average_time"      : area/self.num_got if self.num_got>0 else None,
+            "num_blocked"       : self.num_blocked,
+            "blocked_time"      : blocked_time,
+            "blocked_fraction"  : blocked_time/elapsed if elapsed>0 else 0.0,
+            "num_starved"       : self.num_starved,
+            "starved_time"      : starved_time,
+            "starved_fraction"  : starved_time/elapsed if elapsed>0 else 0.0,
+        }
+
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        return dict([(name, getattr(self, name)) for name in self.FIELDS])
+
+    def set_state(self, state):
+        for name in self.FIELDS:
+            setattr(self, name, state[name])
+
+
+# A SimPy store that reports the items put into it (and/or got from it)
+# to a FlowStats, including the requests that had to wait.
+# (As the counting is done when SimPy actually moves an item,
+# it does not matter how the request was made)
+class FlowStore(simpy.Store):
+
+    def __init__(self, env, capacity, flow_stats, count_puts=True, count_gets=True):
+        simpy.Store.__init__(self, env, capacity=capacity)
+        self.flow_stats = flow_stats
+        self.count_puts = count_puts
+        self.count_gets = count_gets
+
+    def _do_put(self, event):
+        result = simpy.Store._do_put(self, event)
+        if(self.count_puts):
+            if(event.triggered):
+                self.flow_stats.put()
+            else:
+                self.flow_stats.put_refused()
+        return result
+
+    def _do_get(self, event):
+        result = simpy.Store._do_get(self, event)
+        if(self.count_gets):
+            if(event.triggered):
+                self.flow_stats.got()
+            else:
+                self.flow_stats.get_refused()
+        return result
+
+
+# Little's law check for the whole line: the average WIP, and the
+# throughput times the average cycle time of the PCBs (as measured by the sink).
+# Returns a dictionary with both, and the relative difference.
+def GetLittleCheck(wip_stats, sink):
+    stats = wip_stats.get_stats()
+    elapsed = wip_stats.env.now - wip_stats.start_time
+    throughput = sink.num_items_finished/elapsed if elapsed>0 else 0.0   # PCBs per second
+    little_WIP = throughput*sink.average_cycle_time
+    average_WIP = stats["average_occupancy"]
+    return {
+        "average_WIP"        : average_WIP,
+        "max_WIP"            : stats["max_occupancy"],
+        "WIP_at_end"         : stats["occupancy"],
+        "throughput"         : throughput*3600,
+        "average_cycle_time" : sink.average_cycle_time,
+        "little_WIP"         : little_WIP,
+        "relative_error"     : (average_WIP-little_WIP)/average_WIP if average_WIP>0 else 0.0,
+    }
@@ -0,0 +1,267 @@
+# Forecast.py
+#
+# Look-ahead forecasting from the current state of a running
+# assembly line model (for example, the digital twin. See DigitalTwin.py).
+#
+# The state of the model (machine states, PCBs on the belts and in the
+# buffers, the temperature of the reflow oven, queued operator tasks etc.)
+# is captured by forking the process using os.fork(). Each child process
+# gets a copy-on-write copy of the entire model, draws its own random variates
+# (processing times, failures, repair times...) and runs the model forward
+# by up to <horizon> seconds, faster than real time. The results of each
+# fork are sent back to the parent over a pipe. At most <num_parallel> forks
+# run at a time. The model in the parent process is not modified.
+#
+# The forecast contains the distributions (over the forks) of:
+#   completion_time : time at which the current batch of PCBs will be finished
+#                     (only for the forks in which it finishes within the horizon)
+#   energy_to_finish: energy (kilo Joules) consumed until the batch is finished
+#                     (or until the end of the horizon)
+#   PCBs_finished   : number of PCBs finished within the horizon
+#
+# If the model is deterministic, all forks give the same result.
+# Variability can be added to any machine parameter for the forecast alone,
+# using distribution specs (see RandomVariates.py). For example:
+#   variability = {"pick_and_place_1.processing_delay":("lognormal",85,10)}
+#
+# Usage:
+#   forecast = RunForecast(line, horizon=8*3600, num_forks=16)
+#   PrintForecast(forecast)
+#
+# Note: os.fork() is available only on Unix-like systems.
+#
+# Author: Neha Karanjkar
+
+import os
+import sys
+import time
+import math
+import pickle
+import select
+
+import simpy
+import RandomVariates
+
+
+#===============================================
+# Helper functions
+#===============================================
+
+# machines that consume energy (as in AssemblyLine.GetResults)
+def get_energy_machines(line):
+    return [line.screen_printer, line.pick_and_place_1, line.pick_and_place_2, line.buffering_module, line.reflow_oven]
+
+# total energy (in joules) consumed by the machines so far.
+# (unlike get_utilization, this does not modify the stats of the machines)
+def get_total_energy(line):
+    e = 0.0
+    for m in get_energy_machines(line):
+        e += sum(m.get_energy_consumption())
+        e += m.power_ratings[m.states.index(m.current_state)] * (m.env.now - m.state_change_timestamp)
+    return e
+
+# value at quantile q (0<=q<=1) of a sorted list
+def quantile(values, q):
+    i = min(int(math.floor(q*(len(values)-1)+0.5)), len(values)-1)
+    return values[i]
+
+def get_distribution(values):
+    if(len(values)==0):
+        return None
+    values = sorted(values)
+    return {"mean":sum(values)/float(len(values)), "min":values[0], "p10":quantile(values,0.1),
+            "p50":quantile(values,0.5), "p90":quantile(values,0.9), "max":values[-1]}
+
+
+# make all the streams of random variates in the model
+# draw an independent sequence of values for a fork.
+def reseed_streams(line, fork_id):
+    for c in line.components.values():
+        for value in list(vars(c).values()):
+            if(isinstance(value, (RandomVariates.VariateStream, RandomVariates.ConstantStream))):
+                value.reseed(fork_id)
+            elif(isinstance(value, dict)):
+                for v in value.values():
+                    if(isinstance(v, (RandomVariates.VariateStream, RandomVariates.ConstantStream))):
+                        v.reseed(fork_id)
+        if(getattr(c, "failure_schedule", None)!=None):
+            c.failure_schedule.reseed(fork_id)
+
+# replace the stream of values of machine parameters
+# by streams drawn from the given distribution specs.
+def apply_variability(line, variability, fork_id):
+    for key, spec in variability.items():
+        machine_name, parameter = key.split(".")
+        machine = line.components[machine_name]
+        stream = machine.get_variate_stream(spec, parameter)
+        stream.reseed(fork_id)
+        assert(hasattr(machine, parameter+"_stream")),("no stream for parameter "+key)
+        setattr(machine, parameter+"_stream", stream)
+
+
+#===============================================
+# Forking
+#===============================================
+
+# Fork the current process, and call run_fork(fork_id) in the child.
+# The value returned by run_fork is sent back to the parent over a pipe.
+# Returns the pid of the child and the read end of the pipe.
+def start_fork(run_fork, fork_id):
+    sys.stdout.flush()
+    r, w = os.pipe()
+    pid = os.fork()
+    if(pid==0):
+        # child:
+        os.close(r)
+        status = 0
+        try:
+            data = pickle.dumps(run_fork(fork_id))
+            with os.fdopen(w, "wb") as f:
+                f.write(data)
+        except BaseException:
+            status = 1
+        finally:
+            os._exit(status)
+    os.close(w)
+    return pid, r
+
+# Read the value sent by a fork (None if the fork failed), and
+# wait for it to exit. Blocks until the fork has sent its value.
+def get_fork_result(pid, r):
+    with os.fdopen(r, "rb") as f:
+        data = f.read()
+    os.waitpid(pid, 0)
+    if(len(data)!=0):
+        return pickle.loads(data)
+    return None
+
+# Fork the current process <num_forks> times (at most <num_parallel> at a time).
+# In the i'th child, run_fork(i) is called and its return value is
+# sent back to the parent. Returns the list of values returned by the forks
+# (None for a fork that failed). If on_result is given, on_result(i, value)
+# is called in the parent as soon as the i'th fork has finished.
+def run_forks(run_fork, num_forks, num_parallel, on_result=None):
+    results = [None for i in range(num_forks)]
+    running = {} # pid --> (fork index, read end of the pipe)
+    next_fork = 0
+    while(next_fork < num_forks or len(running)!=0):
+
+        # start forks
+        while(next_fork < num_forks and len(running) < num_parallel):
+            pid, r = start_fork(run_fork, next_fork)
+            running[pid] = (next_fork, r)
+            next_fork += 1
+
+        # collect the result of a fork that has finished
+        # (or has started sending its result)
+        ready, _, _ = select.select([r for i, r in running.values()], [], [])
+        pid = [p for p in running if running[p][1]==ready[0]][0]
+        i, r = running.pop(pid)
+        results[i] = get_fork_result(pid, r)
+        if(on_result!=None):
+            on_result(i, results[i])
+    return results
+
+
+#===============================================
+# Forecast
+#===============================================
+
+def RunForecast(line, horizon, num_forks=16, num_parallel=None, variability=None):
+    assert(horizon>0 and num_forks>=1)
+    if(num_parallel==None):
+        num_parallel = os.cpu_count() or 1
+    env = line.env
+    start_time = env.now
+    start_energy = get_total_energy(line)
+    start_finished = line.sink_1.num_items_finished
+
+    # function executed in each fork
+    def run_fork(fork_id):
+        sys.stdout = open(os.devnull, "w")
+        reseed_streams(line, fork_id+1)
+        if(variability!=None):
+            apply_variability(line, variability, fork_id+1)
+        sink = line.sink_1
+        if(not sink.stop_condition.triggered):
+            env.run(until=simpy.events.AnyOf(env,[sink.stop_condition, env.timeout(horizon)]))
+        finished = sink.stop_condition.triggered
+        return {"completion_time": env.now if finished else None,
+                "energy": (get_total_energy(line)-start_energy)/1e3,
+                "PCBs_finished": sink.num_items_finished - start_finished}
+
+    wall_start = time.time()
+    results = [r for r in run_forks(run_fork, num_forks, num_parallel) if r!=None]
+
+    forecast = {}
+    forecast["time"] = start_time
+    forecast["horizon"] = horizon
+    forecast["num_forks"] = len(results)
+    forecast["fraction_finished"] = len([r for r in results if r["completion_time"]!=None])/float(max(len(results),1))
+    forecast["completion_time"] = get_distribution([r["completion_time"] for r in results if r["completion_time"]!=None])
+    forecast["energy_to_finish"] = get_distribution([r["energy"] for r in results])
+    forecast["PCBs_finished"] = get_distribution([r["PCBs_finished"] for r in results])
+    forecast["wall_time"] = time.time()-wall_start
+    return forecast
+
+
+def PrintForecast(forecast, file=None):
+    file = file if file!=None else sys.stdout
+    print("\n================================", file=file)
+    print("Forecast at T= %0.2f hours, for the next %0.2f hours (%d forks, computed in %0.2f seconds):"%(forecast["time"]/3600.0, forecast["horizon"]/3600.0, forecast["num_forks"], forecast["wall_time"]), file=file)
+    print("================================", file=file)
+    d = forecast["completion_time"]
+    print("Batch finished within the horizon in %0.0f%% of the forks"%(forecast["fraction_finished"]*100), file=file)
+    if(d!=None):
+        print("Completion time (hours): p10 = %0.2f, p50 = %0.2f, p90 = %0.2f"%(d["p10"]/3600.0, d["p50"]/3600.0, d["p90"]/3600.0), file=file)
+    d = forecast["energy_to_finish"]
+    print("Energy to finish (Kilo Joules): p10 = %0.2f, p50 = %0.2f, p90 = %0.2f"%(d["p10"], d["p50"], d["p90"]), file=file)
+    d = forecast["PCBs_finished"]
+    print("PCBs finished: p10 = %d, p50 = %d, p90 = %d"%(d["p10"], d["p50"], d["p90"]), file=file)
+
+
+# Runs a forecast every <interval> seconds of wall-clock time.
+# To be passed as the on_tick function of DigitalTwin.RunTwin.
+#
+# The twin is not blocked while a forecast is computed: the forecast is
+# run in a forked child (which forks the children of RunForecast from its own
+# copy of the model), and the call returns at once. On the following calls,
+# the result is collected (without waiting) once the child has finished,
+# and printed. A new forecast is started only after the previous one has been
+# collected. finish() waits for the forecast that is still running, if any.
+class PeriodicForecast():
+
+    def __init__(self, horizon, interval=60, num_forks=16, num_parallel=None, variability=None, file=None):
+        self.horizon = horizon
+        self.interval = interval
+        self.num_forks = num_forks
+        self.num_parallel = num_parallel
+        self.variability = variability
+        self.file = file
+        self.last_forecast_time = None
+        self.forecast = None
+        self.running = None # (pid, read end of the pipe) of the forecast being computed
+
+    def __call__(self, line):
+        if(self.running!=None):
+            ready, _, _ = select.select([self.running[1]], [], [], 0)
+            if(len(ready)==0):
+                return
+            self.collect()
+        now = time.time()
+        if(self.last_forecast_time!=None and now-self.last_forecast_time < self.interval):
+            return
+        self.last_forecast_time = now
+        run_forecast = lambda fork_id: RunForecast(line, self.horizon, self.num_forks, self.num_parallel, self.variability)
+        self.running = start_fork(run_forecast, 0)
+
+    def collect(self):
+        forecast = get_fork_result(*self.running)
+        self.running = None
+        if(forecast!=None):
+            self.forecast = forecast
+            PrintForecast(self.forecast, file=self.file if self.file!=None else sys.__stdout__)
+
+    def finish(self):
+        if(self.running!=None):
+            self.collect()
@@ -5,7 +5,13 @@
 # the machine on which it is to be performed. 
 #
 # The operator performs the appropriate task
-# whenever interrupted.
+# whenever interrupted. If the line has a TravelTimes matrix,
+# the operator first walks from its current location to
+# the machine (in the "travelling" state).
+#
+# Machines request a task by calling request_task().
+# An operator can also be a member of an OperatorPool,
+# in which case tasks are dispatched to it by the pool.
 #
 # Author: Neha Karanjkar
 # Date:   20 Nov 2017
@@ -13,8 +19,10 @@
 
 import random,math
 import simpy
+from collections import deque
 
 from BaseOperator import BaseOperator
+from Steps import run_steps
 
 # Information about an assigned task
 # is stored as a tuple:
@@ -27,98 +35,205 @@ class HumanOperator(BaseOperator):
     def __init__(self, env, name):
         BaseOperator.__init__(self,env,name)
         
-        # list of tasks assigned 
-        # to this operator
-        self.assigned_tasks_list=[]
+        # tasks assigned to this operator,
+        # indexed by (machine_name, task_name)
+        self.assigned_tasks={}
+
+        # the OperatorPool this operator is a member of (if any)
+        self.pool = None
+
+        # current location (name of the machine at which the
+        # operator is present) and a pointer to the TravelTimes
+        # matrix of the line. If travel_times is None,
+        # moving between machines takes no time.
+        self.location = None
+        self.travel_times = None
+
+        # streams of values for tasks with random delays
+        self.task_delay_streams = {}
         
         # start behavior
-        self.behavior=env.process(self.behavior())
-        self.define_states(states=["idle","busy"], start_state="idle")
+        self.process=env.process(run_steps(self, self.behavior))
+        self.define_states(states=["idle","travelling","busy"], start_state="idle")
         
         #queued-up tasks to be performed.
-        self.pending_tasks_queue = []
+        self.pending_tasks_queue = deque()
 
     # function to assign a new task
     # to this operator
     def assign_task(self, task_name, machine_name, task_ptr, machine_ptr, delay):
         
-        self.assigned_tasks_list.append(Task(task_name, machine_name, task_ptr, machine_ptr, delay))
+        self.assigned_tasks[(machine_name, task_name)] = Task(task_name, machine_name, task_ptr, machine_ptr, delay)
         #checks:
-        assert(isinstance(delay, int))
+        assert(isinstance(delay, int) or isinstance(delay, tuple))
+
+    # function called by a machine to
+    # request a task from this operator.
+    def request_task(self, machine_name, task_name):
+        self.process.interrupt(machine_name+":"+task_name)
   
 
-    def behavior(self):
+    # delay of a task. The delay can be a fixed integer, or 
+    # a distribution spec (see RandomVariates.py), in which case 
+    # a value is drawn from this operator's stream for the task.
+    def get_task_delay(self, task):
+        if(isinstance(task.delay, int)):
+            return task.delay
+        key = (task.machine_name, task.task_name)
+        if(key not in self.task_delay_streams):
+            self.task_delay_streams[key] = self.get_variate_stream(task.delay, task.machine_name+"."+task.task_name)
+        return self.task_delay_streams[key].next()
+
+    # time required to walk from the
+    # current location to a given machine.
+    def get_travel_time(self, machine_name):
+        if(self.travel_times==None):
+            return 0
+        return self.travel_times.get_travel_time(self.location, machine_name)
+
+    # task that was assigned to this operator, or registered
+    # with its pool, for a given machine
+    def get_task(self, machine_name, task_name):
+        task = self.assigned_tasks.get((machine_name, task_name))
+        if(task==None and self.pool!=None):
+            task = self.pool.tasks[(machine_name, task_name)][1]
+        return task
+
+    def behavior(self, value):
         
         self.task_is_ongoing = False
         self.current_task=None
         self.current_task_delay = 0
+        self.current_travel_delay = 0
         self.current_task_start_time = 0
 
+        return self.next_task, None
+
+    # Steps of the behavior (see Steps.py):
+
+    def next_task(self, value):
+        # if a task was ongoing before we were interrupted,
+        # resume and finish the task.
+        if(self.task_is_ongoing):
+            print("T=",self.env.now+0.0,self.name,"resuming task",self.current_task.task_name)
+            return self.perform_current_task()
+        return self.pick_task()
+
+    def pick_task(self):
+        # if there are no pending tasks, 
+        # ask the pool (if any) for the next task.
+        if(len(self.pending_tasks_queue)==0 and self.pool!=None):
+            task = self.pool.get_next_task(self)
+            if(task!=None):
+                self.pending_tasks_queue.append(task)
+
+        # if there are any pending tasks, 
+        # perform the first task in the list.
+        if(len(self.pending_tasks_queue)>=1):
+            self.current_task = self.pending_tasks_queue.popleft()
+            
+            # start the task
+            self.current_task_delay = self.get_task_delay(self.current_task)
+            self.current_travel_delay = self.get_travel_time(self.current_task.machine_name)
+            self.task_is_ongoing = True
+            print("T=",self.env.now+0.0,self.name,"starting task",self.current_task.task_name)
+            return self.perform_current_task()
+        
+        # else, there are no ongoing or pending tasks.
+        # do some low priority idle work until interrupted.
+        self.change_state("idle")
+        return self.next_task, self.env.timeout(100)
+
+    # walk to the machine (if required) and perform the current task.
+    # If interrupted, the remaining travel and task delays are noted down
+    # (see interrupted()), and the task is resumed later.
+    def perform_current_task(self):
+        if(self.current_travel_delay>0):
+            self.change_state("travelling")
+            self.current_task_start_time = self.env.now
+            return self.arrived, self.env.timeout(self.current_travel_delay)
+        return self.start_work()
+
+    def arrived(self, value):
+        self.current_travel_delay = 0
+        return self.start_work()
+
+    def start_work(self):
+        self.location = self.current_task.machine_name
+
+        if(self.current_state!="busy"):
+            self.change_state("busy")
+        self.current_task_start_time = self.env.now
+        return self.finish_task, self.env.timeout(self.current_task_delay)
+
+    def finish_task(self, value):
+        # execute the functionality corresponding to this task
+        self.current_task.task_ptr(machine=self.current_task.machine_ptr)
+        self.task_is_ongoing = False
+        print("T=",self.env.now+0.0,self.name,"finished task",self.current_task.task_name)
+        self.change_state("idle")
+        return self.next_task, None
+
+    # called when the operator is interrupted while waiting
+    def interrupted(self, cause):
         
-        while True:
-
-            try:
-                
-                # if a task was ongoing before we were interrupted,
-                # resume and finish the task.
-                if(self.task_is_ongoing):
-                    print("T=",self.env.now+0.0,self.name,"resuming task",self.current_task.task_name)
-                    self.current_task_start_time = self.env.now
-                    yield self.env.timeout(self.current_task_delay)
-                    # execute the functionality corresponding to this task
-                    self.current_task.task_ptr(machine=self.current_task.machine_ptr)
-                    self.task_is_ongoing = False
-                    print("T=",self.env.now+0.0,self.name,"finished task",self.current_task.task_name)
-                    self.change_state("idle")
-                
-                # if there are any pending tasks, 
-                # perform the first task in the list.
-                if(len(self.pending_tasks_queue)>=1):
-                    self.current_task = self.pending_tasks_queue.pop(0)
-                    
-                    # start the task
-                    self.current_task_delay = self.current_task.delay
-                    self.current_task_start_time = self.env.now
-                    self.task_is_ongoing = True
-                    self.change_state("busy")
-                    print("T=",self.env.now+0.0,self.name,"starting task",self.current_task.task_name)
-                    yield self.env.timeout(self.current_task_delay)
-                    
-                    # finished the task without any interruption
-                    # execute the functionality corresponding to this task
-                    self.current_task.task_ptr(machine=self.current_task.machine_ptr)
-                    self.task_is_ongoing = False
-                    print("T=",self.env.now+0.0,self.name,"finished task",self.current_task.task_name)
-                    self.change_state("idle")
-                
-                # else, there are no ongoing or pending tasks.
-                # do some low priority idle work until interrupted.
-                else:
-                    self.change_state("idle")
-                    yield self.env.timeout(100)
-                
+        if(isinstance(cause, Task)):
+            # the task was dispatched to us by the pool.
+            task = cause
+            print("T=", self.env.now+0.0, self.name, "was dispatched by",self.pool.name,"for",task.task_name,"on",task.machine_name)
+        else:
+            # the human operator was interrupted by a machine.
+            # check the cause and the source of the interruption
+            machine_name, cause = cause.split(":")
+            print("T=", self.env.now+0.0, self.name, "was interrupted by",machine_name,"for",cause)
             
-            except simpy.Interrupt as i:
-                
-                # the human operator was interrupted by a machine.
-                # check the cause and the source of the interruption
-                machine_name, cause = i.cause.split(":")
-                print("T=", self.env.now+0.0, self.name, "was interrupted by",machine_name,"for",cause)
-                
-                # check if this task was indeed assigned to me.
-                task = [t for t in self.assigned_tasks_list if ( t.task_name==cause and t.machine_name==machine_name )]
-                if len(task)==0:
-                    print("ERROR!! no such task assigned to operator",self.name)
-                assert(len(task)==1)
-                task=task[0]
-
-                # add the requested task to the pending_tasks_queue
-                # to be performed later.
-                self.pending_tasks_queue.append(task)
+            # check if this task was indeed assigned to me.
+            task = self.assigned_tasks.get((machine_name, cause))
+            if task==None:
+                print("ERROR!! no such task assigned to operator",self.name)
+            assert(task!=None)
+
+        # add the requested task to the pending_tasks_queue
+        # to be performed later.
+        self.pending_tasks_queue.append(task)
+
+        # if there was a task ongoing when this interrupt happened,
+        # note down the remaining time for this task.
+        if(self.task_is_ongoing):
+            if(self.current_state=="travelling"):
+                self.current_travel_delay = self.current_travel_delay - (self.env.now - self.current_task_start_time)
+            else:
+                self.current_task_delay = self.current_task_delay - (self.env.now - self.current_task_start_time) 
+        return self.next_task, None
 
-                # if there was a task ongoing when this interrupt happened,
-                # note down the remaining time for this task.
-                if(self.task_is_ongoing):
-                    self.current_task_delay = self.current_task_delay - (self.env.now - self.current_task_start_time) 
-                
+    # state as plain data (see Snapshot.py).
+    # Tasks are saved as (machine_name, task_name).
+    def get_state(self):
+        state = BaseOperator.get_state(self)
+        state["task_is_ongoing"] = self.task_is_ongoing
+        state["current_task"] = [self.current_task.machine_name, self.current_task.task_name] if self.current_task!=None else None
+        state["current_task_delay"] = self.current_task_delay
+        state["current_travel_delay"] = self.current_travel_delay
+        state["current_task_start_time"] = self.current_task_start_time
+        state["pending_tasks"] = [[t.machine_name, t.task_name] for t in self.pending_tasks_queue]
+        state["location"] = self.location
+        state["task_delay_streams"] = [[key[0], key[1], stream.get_state()] for key, stream in self.task_delay_streams.items()]
+        return state
 
+    def set_state(self, state):
+        BaseOperator.set_state(self, state)
+        self.task_is_ongoing = state["task_is_ongoing"]
+        self.current_task = self.get_task(*state["current_task"]) if state["current_task"]!=None else None
+        self.current_task_delay = state["current_task_delay"]
+        self.current_travel_delay = state["current_travel_delay"]
+        self.current_task_start_time = state["current_task_start_time"]
+        self.pending_tasks_queue = deque([self.get_task(*t) for t in state["pending_tasks"]])
+        self.location = state["location"]
+        self.task_delay_streams = {}
+        for machine_name, task_name, stream_state in state["task_delay_streams"]:
+            task = self.get_task(machine_name, task_name)
+            if(isinstance(task.delay, int)):
+                continue
+            stream = self.get_variate_stream(task.delay, machine_name+"."+task_name)
+            stream.set_state(stream_state)
+            self.task_delay_streams[(machine_name, task_name)] = stream
@@ -0,0 +1,137 @@
+# Incremental.py
+#
+# Incremental re-simulation of variants of a baseline run.
+#
+# Many variants of the line differ from a baseline run only from some time t
+# onwards (for example, a reel_replacement_interval that changes after a
+# supplier switch at t=30 hours). The first part of such a variant is
+# identical to the baseline, and need not be simulated again.
+#
+# During the baseline run, snapshots of the line (see Snapshot.py) are kept
+# in memory at regular intervals of simulated time. At most <max_checkpoints>
+# snapshots are kept; when there are more, the oldest ones are discarded.
+# A variant whose change starts at time t is resumed from the last checkpoint
+# at or before t: the baseline is simulated from the checkpoint up to t, and
+# the variant is then continued from the state at t with its own parameters.
+# As the snapshots contain the cumulative statistics of all components
+# (time spent in each state, energy, PCBs finished, cycle times...),
+# the results of a variant cover the entire run from time 0.
+#
+# Usage:
+#   baseline = BaselineRun(checkpoint_interval=3600, max_checkpoints=64)
+#   baseline.run()
+#   variant = baseline.run_variant(change_time=30*3600, parameters={"reel_replacement_interval":40})
+#   print(variant["result"], "resumed from T=", variant["resumed_from"])
+#
+# Author: Neha Karanjkar
+
+import os
+import json
+import contextlib
+from collections import deque
+from io import StringIO
+
+import AssemblyLine as AL
+import Snapshot
+
+
+class BaselineRun():
+
+    def __init__(self, checkpoint_interval=3600, max_checkpoints=64):
+        assert(checkpoint_interval>0 and max_checkpoints>=1)
+        self.checkpoint_interval = checkpoint_interval
+        self.max_checkpoints = max_checkpoints
+
+        # snapshots (as JSON strings), oldest first
+        self.checkpoints = deque(maxlen=max_checkpoints)
+        self.checkpoint_times = deque(maxlen=max_checkpoints)
+
+        self.parameters = None
+        self.end_time = None
+        self.result = None
+
+    # Run the baseline (with the current simulation
+    # parameters in AssemblyLine.py), saving checkpoints.
+    def run(self):
+        self.parameters = AL.GetParameters()
+        self.checkpoints.clear()
+        self.checkpoint_times.clear()
+        env = AL.CreateEnvironment()
+        with open(os.devnull, "w") as f, contextlib.redirect_stdout(f):
+            line = AL.BuildAssemblyLine(env)
+            end = AL.GetEndEvent(line)
+            while(not AL.RunUntil(env, end, env.now + self.checkpoint_interval)):
+                self.checkpoints.append(json.dumps(Snapshot.TakeSnapshot(line)))
+                self.checkpoint_times.append(env.now)
+        self.end_time = env.now
+        self.result = get_results(line)
+        return self.result
+
+    # the last checkpoint at or before time t (or None)
+    def get_checkpoint(self, t):
+        for i in reversed(range(len(self.checkpoints))):
+            if(self.checkpoint_times[i]<=t):
+                return json.loads(self.checkpoints[i])
+        return None
+
+    # Run a variant of the baseline, whose <parameters> (a dictionary of
+    # simulation parameters) change at time <change_time>. Fails if the
+    # variant is not valid at that time (see AssemblyLine.RestoreAssemblyLine).
+    def run_variant(self, change_time, parameters):
+        assert(self.result!=None),("the baseline has not been run")
+
+        # the baseline finished before the change
+        if(change_time>=self.end_time):
+            result = dict(self.result)
+            result.update({"variant":parameters, "change_time":change_time, "resumed_from":None})
+            return result
+
+        saved_parameters = AL.GetParameters()
+        try:
+            with open(os.devnull, "w") as f, contextlib.redirect_stdout(f):
+                if(change_time<=0):
+                    # the variant differs from the start
+                    resumed_from = 0
+                    AL.SetParameters(self.parameters)
+                    AL.SetParameters(parameters)
+                    line = AL.BuildAssemblyLine(AL.CreateEnvironment())
+                else:
+                    # simulate the baseline from the last checkpoint up to change_time,
+                    # and continue with the parameters of the variant.
+                    checkpoint = self.get_checkpoint(change_time)
+                    if(checkpoint==None):
+                        resumed_from = 0
+                        AL.SetParameters(self.parameters)
+                        line = AL.BuildAssemblyLine(AL.CreateEnvironment())
+                        AL.RunUntil(line.env, AL.GetEndEvent(line), change_time)
+                        checkpoint = Snapshot.TakeSnapshot(line)
+                    elif(checkpoint["time"]<change_time):
+                        resumed_from = checkpoint["time"]
+                        line = AL.RestoreAssemblyLine(checkpoint)
+                        AL.RunUntil(line.env, AL.GetEndEvent(line), change_time)
+                        checkpoint = Snapshot.TakeSnapshot(line)
+                    else:
+                        resumed_from = checkpoint["time"]
+                    line = AL.RestoreAssemblyLine(checkpoint, parameters)
+                line.env.run(until=AL.GetEndEvent(line))
+            # (while the parameters of the variant are set)
+            result = get_results(line)
+        finally:
+            AL.SetParameters(saved_parameters)
+        result.update({"variant":parameters, "change_time":change_time, "resumed_from":resumed_from})
+        return result
+
+
+# results of a run that has ended. A run whose batch was not finished
+# within max_simulation_time_in_hours has "result":None and an "error".
+def get_results(line):
+    PCBs_finished = line.sink_1.num_items_finished
+    flow_stats = AL.GetFlowStats(line)
+    report = StringIO()
+    with contextlib.redirect_stdout(report):
+        result = AL.GetResults(line)
+    results = {"end_time":line.env.now, "PCBs_finished":PCBs_finished, "result":result, "report":report.getvalue(), "flow_stats":flow_stats}
+    if(not line.sink_1.stop_condition.triggered):
+        results["result"] = None
+        results["error"] = "the batch was not finished within max_simulation_time_in_hours"
+    return results
@@ -11,6 +11,8 @@
 
 import random,simpy,math
 from BaseOperator import BaseOperator
+from PCB import item_to_data, item_from_data
+from Steps import run_steps
 
 class LineLoader(BaseOperator):
     
@@ -19,58 +21,95 @@ class LineLoader(BaseOperator):
         self.inp=inp
         self.outp=outp
         self.delay=1
+
+        # stack being unloaded, and the PCB being loaded
+        self.pcb_stack=None
+        self.pcb=None
         
         #states
         self.define_states(states=["idle","loading"],start_state="idle")
-        self.process=env.process(self.behavior())
+        self.process=env.process(run_steps(self, self.behavior))
 
     
-    def behavior(self):
+    def behavior(self, value):
         assert( isinstance(self.delay,int))
         assert( isinstance(self.start_time,int))
         assert(self.delay>=1)
         
         #wait until the start time 
-        yield (self.env.timeout(self.start_time))
+        return self.wait_for_stack, self.env.timeout(self.start_time)
+
+    # Steps of the behavior (see Steps.py):
 
-        while True:
-            #wait until there's a stack of PCBs at the input
-            pcb_stack=None
-            while(not pcb_stack):
-                if self.inp.can_get():
-                    pcb_stack = self.inp.get_copy()
-                    break
-                else:
-                    yield (self.env.timeout(1))
+    #wait until there's a stack of PCBs at the input
+    # (a polling step, see Steps.py)
+    def wait_for_stack(self, value):
+        if not self.inp.can_get():
+            self.inp.flow_stats.get_refused()
+            while not self.inp.can_get():
+                yield self.env.timeout(1)
+        self.pcb_stack = self.inp.get_copy()
             
-            #got a stack.
-            print("T=",self.env.now+0.0,self.name,"started unloading stack")
+        #got a stack.
+        print("T=",self.env.now+0.0,self.name,"started unloading stack")
+        return self.next_pcb, None
 
-            while (len(pcb_stack)!=0):
+    def next_pcb(self, value):
+        if (len(self.pcb_stack)==0):
+            # Now remove the empty tray from the inp
+            # so that the next job can arrive.
+            return self.wait_for_stack, self.inp.get()
                 
-                #pick up a PCB from the stack in First-In-First-Out order:
-                pcb = pcb_stack.pop(0)
+        #pick up a PCB from the stack in First-In-First-Out order:
+        self.pcb = self.pcb_stack.take()
+        if(self.trace!=None): self.trace.enter(self.pcb, self.env.now)
+        return self.wait_for_output, None
 
-                # wait until there's place at the output
-                while not self.outp.can_put():
-                    yield (self.env.timeout(1))
+    # wait until there's place at the output
+    # (a polling step, see Steps.py)
+    def wait_for_output(self, value):
+        if not self.outp.can_put():
+            self.outp.flow_stats.put_refused()
+            while not self.outp.can_put():
+                yield self.env.timeout(1)
                 
-                #change state
-                self.change_state("loading")
+        #change state
+        self.change_state("loading")
 
-                # wait for an integer amount of delay
-                yield (self.env.timeout(self.delay-1.0))
-                yield (self.env.timeout(0.5))
+        # wait for an integer amount of delay
+        return self.half_slot, self.env.timeout(self.delay-1.0)
 
-                #place the PCB at the output
-                yield self.outp.put(pcb)
-                print("T=",self.env.now+0.0,self.name,"placed",pcb,"on",self.outp)
-                yield (self.env.timeout(0.5))
-                
-                #change state
-                self.change_state("idle")
-            
-            # Now remove the empty tray from the inp
-            # so that the next job can arrive.
-            s = yield self.inp.get()
+    def half_slot(self, value):
+        return self.place_pcb, self.env.timeout(0.5)
+
+    #place the PCB at the output
+    def place_pcb(self, value):
+        return self.placed_pcb, self.outp.put(self.pcb)
+
+    def placed_pcb(self, value):
+        print("T=",self.env.now+0.0,self.name,"placed",self.pcb,"on",self.outp)
+        if(self.trace!=None): self.trace.leave(self.pcb, self.env.now)
+        return self.loaded, self.env.timeout(0.5)
+
+    def loaded(self, value):
+        #change state
+        self.change_state("idle")
+        return self.next_pcb, None
+
+    # state as plain data (see Snapshot.py).
+    # The stack being unloaded is normally the one at the input
+    # (the same object), which is noted down as "stack_at_input".
+    def get_state(self):
+        state = BaseOperator.get_state(self)
+        state["pcb"] = item_to_data(self.pcb)
+        state["pcb_stack"] = item_to_data(self.pcb_stack)
+        state["stack_at_input"] = (self.pcb_stack!=None and len(self.inp.buf.items)!=0 and self.pcb_stack is self.inp.get_copy())
+        return state
 
+    def set_state(self, state):
+        BaseOperator.set_state(self, state)
+        self.pcb = item_from_data(state["pcb"])
+        if(state["stack_at_input"]):
+            self.pcb_stack = self.inp.get_copy()
+        else:
+            self.pcb_stack = item_from_data(state["pcb_stack"])
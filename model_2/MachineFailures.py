@@ -0,0 +1,110 @@
+# MachineFailures.py
+#
+# Failure/repair modelling for machines.
+#
+# The failure instants of a machine are pre-sampled as a sorted schedule
+# (using the machine's own stream of random variates for the time between failures).
+# Only the next failure in the schedule is placed in the SimPy event calendar,
+# as a one-shot event. When it fires, the machine's "failure_due" flag is set and
+# the following failure is scheduled. The machine checks this flag at points
+# where it is between jobs (at integer time instants), goes into the "down" state,
+# and requests a "repair" task from its repair operator. Thus, no additional
+# polling process is required, and no cost is incurred when no failure is due.
+#
+# Failures are sampled in calendar time. A failure that falls due while
+# the machine is already down (or waiting to go down) is merged with the pending one.
+#
+# Usage:
+#   machine.enable_failures(time_between_failures=("exponential", MTBF), power_rating=100.0)
+#   machine.set_repair_operator(operator)
+#   operator.assign_task(task_name="repair", machine_name=machine.name, task_ptr=repair_task, machine_ptr=machine, delay=("exponential", MTTR))
+#
+# Author: Neha Karanjkar
+
+
+class FailureSchedule():
+
+    def __init__(self, env, machine, time_between_failures, block_size=64):
+        self.env=env
+        self.machine=machine
+        self.block_size=block_size
+
+        # stream of times between failures
+        self.stream = machine.get_variate_stream(time_between_failures, "time_between_failures")
+
+        # sorted schedule of failure instants,
+        # and the index of the next failure.
+        self.failure_times = []
+        self.index = 0
+        self.num_failures = 0
+
+        self.schedule_next_failure()
+
+    # extend the schedule by a block of failure instants
+    def refill(self):
+        t = self.failure_times[-1] if self.failure_times else self.env.now
+        self.failure_times = []
+        self.index = 0
+        for i in range(self.block_size):
+            t += self.stream.next()
+            self.failure_times.append(t)
+
+    # place the next failure into the event calendar as a one-shot event
+    def schedule_next_failure(self):
+        if(self.index>=len(self.failure_times)):
+            self.refill()
+        t = self.failure_times[self.index]
+        self.index += 1
+        self.resume(self.env.timeout(t - self.env.now))
+
+    # wait for a failure event
+    # (also used when the schedule is restored from a snapshot)
+    def resume(self, event):
+        self.event = event
+        self.event.callbacks.append(self.on_failure)
+
+    # draw new failure instants after the one that
+    # is already scheduled, from an independent sequence of variates
+    # (used to create different stochastic forks of a running model).
+    def reseed(self, fork_id):
+        self.stream.reseed(fork_id)
+        self.failure_times = self.failure_times[:self.index]
+
+    # state of the schedule as plain data (see Snapshot.py).
+    # The next failure occurs at failure_times[index-1].
+    def get_state(self):
+        return {"stream":self.stream.get_state(), "failure_times":list(self.failure_times), "index":self.index, "num_failures":self.num_failures}
+
+    # restore the state saved by get_state(). The failure that was scheduled
+    # when the machine was created is cancelled, and the next failure is
+    # to be scheduled using resume().
+    def set_state(self, state):
+        self.event.callbacks.remove(self.on_failure)
+        self.stream.set_state(state["stream"])
+        self.failure_times = list(state["failure_times"])
+        self.index = state["index"]
+        self.num_failures = state["num_failures"]
+        if(state["stream"]["spec"]!=self.stream.get_state()["spec"]):
+            # the time between failures has been changed (in a variant of
+            # the line). Only the failure that is already scheduled is kept.
+            self.failure_times = self.failure_times[:self.index]
+
+    def get_next_failure_time(self):
+        return self.failure_times[self.index-1]
+
+    def on_failure(self, event):
+        self.num_failures += 1
+        if(not self.machine.failure_due):
+            print("T=",self.env.now+0.0,self.machine.name,"failure is due.")
+        self.machine.failure_due = True
+        self.schedule_next_failure()
+
+
+# Repair task
+# to be assigned to a human operator.
+# This function is executed by the operator
+# when the repair has been completed.
+# A flag "repair_done" is set to 1
+# to indicate that the machine can resume its operation.
+def repair_task(machine):
+    machine.repair_done.put(1)
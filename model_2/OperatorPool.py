@@ -0,0 +1,210 @@
+# OperatorPool.py
+#
+# A pool of human operators shared by several machines.
+# Machines submit typed task requests to the pool (using request_task(),
+# just as they would to a single HumanOperator) and the pool dispatches
+# each request to any idle operator that is qualified for the task.
+#
+# Pending requests are kept in one heap per task type, ordered by
+# (priority, arrival order). A smaller value of priority means a more
+# urgent task. Registered tasks are looked up using a dictionary
+# indexed by (machine_name, task_name), and the idle operators are kept
+# in one (insertion-ordered) dictionary per task type, so the cost of
+# dispatching a request does not grow linearly with the number of
+# pending requests or operators.
+#
+# If the operators have a TravelTimes matrix, a request is dispatched to
+# the nearest idle qualified operator. For this, the idle operators are also
+# kept in one heap per registered task (machine, task type), ordered by the
+# travel time from the operator's location to the machine (which does not
+# change while the operator is idle), and then by the time since which the
+# operator has been idle. An operator is pushed into these heaps when it
+# becomes idle. When it becomes busy, its entries are not removed from the
+# heaps, but are skipped (and dropped) when they reach the top of a heap.
+#
+# Usage:
+#   pool = OperatorPool(env, "operator_pool")
+#   pool.add_operator(human_operator_1, skills=["solder_refill","adhesive_refill"])
+#   pool.add_operator(human_operator_2)  # qualified for all tasks
+#   pool.assign_task(task_name=..., machine_name=..., task_ptr=..., machine_ptr=..., delay=..., priority=0)
+#   machine.set_refill_operator(pool)
+#
+# Author: Neha Karanjkar
+
+
+import heapq
+import itertools
+
+from HumanOperator import Task
+
+
+class OperatorPool():
+
+    def __init__(self, env, name):
+        self.env=env
+        self.name=name
+
+        # operators in the pool, and the set of task types
+        # (task names) each one is qualified for (None = all tasks).
+        self.operators=[]
+        self.skills={}
+
+        # registered tasks: (machine_name, task_name) -> (priority, Task)
+        self.tasks={}
+
+        # pending requests: task_name -> heap of (priority, arrival number, Task)
+        self.pending_requests={}
+        self.arrival_counter = itertools.count()
+
+        # idle operators: task_name -> {operator: None}
+        # (dictionaries are used as insertion-ordered sets, so that
+        # the operator that has been idle the longest is dispatched first.)
+        self.idle_operators={}
+
+        # the number of each idle operator, in the order in which they became idle,
+        # and the idle operators nearest to each machine:
+        # (machine_name, task_name) -> heap of (travel time, idle number, operator)
+        self.idle_numbers={}
+        self.idle_counter = itertools.count()
+        self.nearest_idle={}
+
+        # stats
+        self.num_requests = 0
+
+    def __str__(self):
+        return self.name
+
+    # add an operator to the pool.
+    # skills: list of task names the operator is qualified for (None = all tasks)
+    def add_operator(self, operator, skills=None):
+        assert(operator.pool==None)
+        operator.pool = self
+        self.operators.append(operator)
+        self.skills[operator] = None if skills==None else list(skills)
+
+    # register a task that machines can request from this pool.
+    def assign_task(self, task_name, machine_name, task_ptr, machine_ptr, delay, priority=0):
+        assert(isinstance(delay, int) or isinstance(delay, tuple))
+        self.tasks[(machine_name, task_name)] = (priority, Task(task_name, machine_name, task_ptr, machine_ptr, delay))
+        self.pending_requests.setdefault(task_name, [])
+        idle = self.idle_operators.setdefault(task_name, {})
+        for operator in sorted(self.idle_numbers, key=lambda o: self.idle_numbers[o]):
+            if(task_name in self.get_skills(operator)):
+                idle[operator] = None
+        self.nearest_idle[(machine_name, task_name)] = []
+        for operator in self.idle_operators[task_name]:
+            self.push_idle(operator, machine_name, task_name)
+
+    # task types that an operator is qualified for
+    def get_skills(self, operator):
+        s = self.skills[operator]
+        return self.pending_requests.keys() if s==None else s
+
+    # function called by a machine to request a task.
+    def request_task(self, machine_name, task_name, priority=None):
+        entry = self.tasks.get((machine_name, task_name))
+        if entry==None:
+            print("ERROR!! no such task assigned to pool",self.name)
+        assert(entry!=None)
+        if priority==None:
+            priority = entry[0]
+        task = entry[1]
+        self.num_requests += 1
+        print("T=", self.env.now+0.0, self.name, "received a request from",machine_name,"for",task_name)
+
+        heapq.heappush(self.pending_requests[task_name], (priority, next(self.arrival_counter), task))
+
+        # if a qualified operator is idle, dispatch the request right away
+        # to the one nearest to the machine. (Among operators at the same
+        # distance, the one that has been idle the longest is chosen.)
+        heap = self.nearest_idle[(machine_name, task_name)]
+        while(len(heap)!=0 and self.idle_numbers.get(heap[0][2])!=heap[0][1]):
+            heapq.heappop(heap)
+        if(len(heap)!=0):
+            self.dispatch(heap[0][2], task_name)
+
+    # pop the most urgent request of a given type and hand it over
+    # to an idle operator (who is waiting until interrupted).
+    def dispatch(self, operator, task_name):
+        task = heapq.heappop(self.pending_requests[task_name])[2]
+        self.mark_busy(operator)
+        operator.process.interrupt(task)
+
+    # function called by an operator when it has
+    # no pending tasks. Returns the most urgent request
+    # the operator is qualified for, or None.
+    def get_next_task(self, operator):
+        best = None
+        for task_name in self.get_skills(operator):
+            heap = self.pending_requests.get(task_name)
+            if heap and (best==None or heap[0] < best[0]):
+                best = (heap[0], task_name)
+        if best==None:
+            self.mark_idle(operator)
+            return None
+        self.mark_busy(operator)
+        return heapq.heappop(self.pending_requests[best[1]])[2]
+
+    def mark_idle(self, operator):
+        if(operator in self.idle_numbers):
+            return
+        self.idle_numbers[operator] = next(self.idle_counter)
+        for task_name in self.get_skills(operator):
+            self.idle_operators.setdefault(task_name, {})[operator] = None
+        for (machine_name, task_name) in self.nearest_idle:
+            if(operator in self.idle_operators[task_name]):
+                self.push_idle(operator, machine_name, task_name)
+
+    def mark_busy(self, operator):
+        self.idle_numbers.pop(operator, None)
+        for task_name in self.get_skills(operator):
+            self.idle_operators.setdefault(task_name, {}).pop(operator, None)
+
+    # add an idle operator to the heap of the nearest idle operators of a machine.
+    # (If the heap holds too many entries of operators that are no longer idle,
+    # it is rebuilt from those that are)
+    def push_idle(self, operator, machine_name, task_name):
+        heap = self.nearest_idle[(machine_name, task_name)]
+        heapq.heappush(heap, (operator.get_travel_time(machine_name), self.idle_numbers[operator], operator))
+        if(len(heap) > 2*len(self.operators)+8):
+            heap[:] = [entry for entry in heap if self.idle_numbers.get(entry[2])==entry[1]]
+            heapq.heapify(heap)
+
+    # number of requests that are yet to be dispatched
+    def get_num_pending_requests(self):
+        return sum([len(h) for h in self.pending_requests.values()])
+
+    # state of the pool as plain data (see Snapshot.py).
+    # Tasks are saved as (machine_name, task_name), operators by their names.
+    def get_state(self):
+        pending = {}
+        for task_name, heap in self.pending_requests.items():
+            pending[task_name] = [[priority, arrival, task.machine_name, task.task_name] for (priority, arrival, task) in heap]
+        idle = {}
+        for task_name, operators in self.idle_operators.items():
+            idle[task_name] = [o.name for o in operators]
+        idle_order = [o.name for o in sorted(self.idle_numbers, key=lambda o: self.idle_numbers[o])]
+        return {"pending_requests":pending, "idle_operators":idle, "idle_order":idle_order, "num_requests":self.num_requests}
+
+    def set_state(self, state):
+        operators = dict([(o.name, o) for o in self.operators])
+        self.pending_requests = {}
+        for task_name, heap in state["pending_requests"].items():
+            self.pending_requests[task_name] = [(priority, arrival, self.tasks[(machine_name, name)][1]) for (priority, arrival, machine_name, name) in heap]
+        self.idle_operators = {}
+        for task_name, names in state["idle_operators"].items():
+            self.idle_operators[task_name] = dict([(operators[n], None) for n in names])
+        self.idle_numbers = dict([(operators[n], i) for i, n in enumerate(state["idle_order"])])
+        self.idle_counter = itertools.count(len(self.idle_numbers))
+        for (machine_name, task_name) in self.nearest_idle:
+            self.nearest_idle[(machine_name, task_name)] = []
+            for operator in self.idle_operators.get(task_name, {}):
+                self.push_idle(operator, machine_name, task_name)
+        self.num_requests = state["num_requests"]
+        # (one arrival number is drawn for each request)
+        self.arrival_counter = itertools.count(self.num_requests)
+
+    # print time spent in each state by each operator
+    def print_utilization(self):
+        for operator in self.operators:
+            operator.print_utilization()
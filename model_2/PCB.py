@@ -19,3 +19,56 @@ class PCB:
         return"PCB <type_ID="+str(self.type_ID)+", serial_ID="+str(self.serial_ID)+">"
 
 
+# A stack of PCBs of the same type, with consecutive serial IDs,
+# all created at the same time. The PCB objects are created only when
+# they are taken from the stack (in First-In-First-Out order),
+# so that the memory used by a stack and the time to take
+# a PCB from it do not depend on the stack size.
+class PCBStack:
+
+    def __init__(self, type_ID, first_serial_ID, num_PCBs, creation_timestamp=0.0):
+        self.type_ID=type_ID
+        self.first_serial_ID=first_serial_ID
+        self.num_PCBs=num_PCBs
+        self.creation_timestamp=creation_timestamp
+        self.num_PCBs_taken=0   # PCBs taken from the stack so far
+
+    # number of PCBs left in the stack
+    def __len__(self):
+        return self.num_PCBs-self.num_PCBs_taken
+
+    # take the next PCB from the stack
+    def take(self):
+        assert(self.num_PCBs_taken<self.num_PCBs)
+        pcb = PCB(type_ID=self.type_ID, serial_ID=self.first_serial_ID+self.num_PCBs_taken, creation_timestamp=self.creation_timestamp)
+        self.num_PCBs_taken+=1
+        return pcb
+
+    def __str__(self):
+        return"PCB stack <type_ID="+str(self.type_ID)+", serial_IDs="+str(self.first_serial_ID)+".."+str(self.first_serial_ID+self.num_PCBs-1)+", remaining="+str(len(self))+">"
+
+
+
+
+# Functions to convert the items held by the components of the line
+# (PCBs, stacks of PCBs, or flags) to plain data and back. (see Snapshot.py)
+def item_to_data(item):
+    if(isinstance(item, PCB)):
+        return {"type_ID":item.type_ID, "serial_ID":item.serial_ID, "creation_timestamp":item.creation_timestamp}
+    if(isinstance(item, PCBStack)):
+        return {"type_ID":item.type_ID, "first_serial_ID":item.first_serial_ID, "num_PCBs":item.num_PCBs,
+                "num_PCBs_taken":item.num_PCBs_taken, "creation_timestamp":item.creation_timestamp}
+    if(isinstance(item, list)):
+        return [item_to_data(i) for i in item]
+    return item
+
+def item_from_data(data):
+    if(isinstance(data, dict) and "first_serial_ID" in data):
+        stack = PCBStack(type_ID=data["type_ID"], first_serial_ID=data["first_serial_ID"], num_PCBs=data["num_PCBs"], creation_timestamp=data["creation_timestamp"])
+        stack.num_PCBs_taken = data["num_PCBs_taken"]
+        return stack
+    if(isinstance(data, dict)):
+        return PCB(type_ID=data["type_ID"], serial_ID=data["serial_ID"], creation_timestamp=data["creation_timestamp"])
+    if(isinstance(data, list)):
+        return [item_from_data(d) for d in data]
+    return data
@@ -0,0 +1,331 @@
+# PCBMultiBufferingModule.py
+#
+#   A multi-stage buffer for buffering the partially processed PCBs
+#   between the pick and place and the reflow operations.
+#   This is a generalization of the single and double buffering modules:
+#   the module contains <num_banks> identical banks, each of which can
+#   hold <capacity_per_stage> PCBs. The banks fill and drain in rotation.
+#
+#   The machine has two modes: "BYPASS" and "BUFFERING_ENABLED".
+#   By default, the machine is in bypass mode. Buffering can be enabled
+#   by calling the enable_buffering() function.
+#
+#   "BYPASS" mode:----------------------
+#       In this mode, no buffering takes place. Items input
+#       by the module are immediately sent to the output.
+#
+#   "BUFFERING_ENABLED" mode:-------------------
+#       Applicable only after enable_buffering() is called.
+#       PCBs are input into the current "fill" bank at integer time instants.
+#       When the fill bank is full, it is sealed and input moves on to the next
+#       bank in rotation (if that bank is free). Sealed banks are drained one at a time,
+#       in the order in which they were filled, at the middle of time-slots.
+#       Starting to drain a sealed bank (the hand-over) takes place only when
+#       the previous bank has been drained completely, and a bank that was
+#       drained becomes available for input again at the next hand-over.
+#       This makes num_banks=1 behave exactly like PCBBufferingModule
+#       and num_banks=2 exactly like PCBDoubleBufferingModule.
+#
+#   Reflow oven control:
+#       The reflow oven is turned ON as soon as (capacity_per_stage - k) PCBs
+#       have accumulated in the fill bank, and turned OFF whenever a
+#       bank has been drained completely. The turn-on margin k can be specified
+#       either as a single integer for all banks or as a list with one value per bank.
+#
+#   Parameters:
+#       num_banks
+#       capacity_per_stage (number of PCBs that can be held in each bank)
+#       Total buffering = num_banks * capacity_per_stage
+#       k (reflow oven turn-on margin, an int or a list of num_banks ints)
+#       buffering_mode ("LIFO" or "FIFO": order in which a bank is drained)
+#
+#   Author: Neha Karanjkar
+
+
+import random,simpy,math
+from collections import deque
+from PCB import *
+from BaseOperator import BaseOperator
+from ReflowOven import *
+from FlowStats import FlowStats
+from Steps import run_steps
+
+# States of each bank:
+BANK_FREE = 0       # empty, or being filled
+BANK_FULL = 1       # sealed, waiting to be drained
+BANK_DRAINING = 2   # being drained
+
+# Whether a module restored from <state> (as saved by get_state, in the
+# BUFFERING_ENABLED mode) with banks of <capacity_per_stage> PCBs can output
+# all its PCBs, if <num_to_input> more PCBs are input. A bank is drained only
+# once it is full, so the PCBs in the fill bank and the remaining PCBs must
+# fill a whole number of banks. (This can fail when capacity_per_stage is
+# changed in the middle of a batch, see AssemblyLine.RestoreAssemblyLine)
+def can_output_all(state, capacity_per_stage, num_to_input):
+    num_filled = 0
+    if(state["bank_states"][state["fill_index"]]==BANK_FREE):
+        num_filled = len(state["banks"][state["fill_index"]])
+    return num_filled < capacity_per_stage and (num_filled+num_to_input) % capacity_per_stage == 0
+
+
+class PCBMultiBufferingModule(BaseOperator):
+
+    def __init__(self, env, name, inp, outp, num_banks=2):
+        BaseOperator.__init__(self,env,name)
+        self.inp=inp
+        self.outp=outp
+
+        # parameters
+        self.num_banks=num_banks
+        self.capacity_per_stage=1
+        self.k = 0 # turn on the RFO as soon as capacity-k items have accumulated in a bank.
+        self.buffering_mode = "LIFO" # can be "LIFO" or "FIFO"
+
+        # Each bank is represented by a deque of PCBs
+        # and a state (BANK_FREE, BANK_FULL or BANK_DRAINING).
+        self.banks = None
+        self.bank_states = None
+        self.fill_index = 0   # bank into which PCBs are input
+        self.drain_index = 0  # bank that is being drained (or will be drained next)
+        self.pcb = None       # PCB being output
+
+        # occupancy, blocking and starvation statistics (see FlowStats.py).
+        # The module is blocked while no bank can accept a PCB,
+        # and starved while it has no PCB to output.
+        self.flow_stats = FlowStats(env)
+
+        # states
+        self.define_states(states=["bypass","filling","emptying"], start_state="bypass")
+        self.process=env.process(run_steps(self, self.behavior))
+
+        # pointer to Reflow Oven for controlling it
+        self.reflow_pointer = None
+
+        # operational mode can be "BYPASS" or "BUFFERING_ENABLED"
+        self.operational_mode = "BYPASS"
+
+    def enable_buffering(self):
+        self.operational_mode="BUFFERING_ENABLED"
+        self.start_state="filling"
+
+    def set_reflow_oven_control(self, RFO):
+        self.reflow_pointer = RFO
+        assert(isinstance(RFO, ReflowOven))
+        self.reflow_pointer.set_external_control()
+
+    # total number of PCBs held in the module
+    def get_num_buffered(self):
+        return sum([len(b) for b in self.banks]) if self.banks else 0
+
+    # state to be shown in the utilization report: the module
+    # is "emptying" when no bank can accept an input.
+    def get_buffering_state(self):
+        if(self.bank_states[self.fill_index]==BANK_FREE):
+            return "filling"
+        return "emptying"
+
+    def update_buffering_state(self):
+        new_state = self.get_buffering_state()
+        if(self.current_state != new_state):
+            self.change_state(new_state)
+
+    # Seal the fill bank, and move input on to
+    # the next bank in rotation if it is free.
+    def seal_fill_bank(self):
+        self.bank_states[self.fill_index] = BANK_FULL
+        print("T=",self.env.now+0.0,self.name,"bank",self.fill_index,"is full.")
+        self.advance_fill_index()
+
+    def advance_fill_index(self):
+        next_index = (self.fill_index+1) % self.num_banks
+        if(self.bank_states[next_index]==BANK_FREE and len(self.banks[next_index])==0):
+            self.fill_index = next_index
+
+    # Start draining the next sealed bank, if the
+    # previous bank has been drained completely.
+    def hand_over(self):
+        if(self.bank_states[self.drain_index]==BANK_FULL):
+            self.bank_states[self.drain_index] = BANK_DRAINING
+            print("T=",self.env.now+0.0,self.name,"started draining bank",self.drain_index)
+            if(self.bank_states[self.fill_index]!=BANK_FREE):
+                self.advance_fill_index()
+
+    def behavior(self, value):
+
+        #checks:
+        assert(isinstance(self.num_banks,int) and self.num_banks>=1)
+        assert(isinstance(self.capacity_per_stage,int) and self.capacity_per_stage>1)
+        if(isinstance(self.k,int)):
+            self.k = [self.k for i in range(self.num_banks)]
+        assert(len(self.k)==self.num_banks)
+        for k in self.k:
+            assert(isinstance(k,int) and k>=0 and k<=(self.capacity_per_stage-1))
+        assert(self.buffering_mode=="FIFO" or self.buffering_mode=="LIFO")
+
+        #==============================
+        #Behaviour in the BYPASS mode:
+        #==============================
+        if(self.operational_mode == "BYPASS"):
+            self.change_state("bypass")
+            return self.bypass_wait_for_pcb, None
+
+        #========================================
+        #Behaviour in the BUFFERING_ENABLED mode:
+        #=========================================
+        else:
+            self.banks = [deque() for i in range(self.num_banks)]
+            self.bank_states = [BANK_FREE for i in range(self.num_banks)]
+            self.fill_index = 0
+            self.drain_index = 0
+            return self.start_buffering, None
+
+    # Steps of the behavior in the BYPASS mode (see Steps.py):
+
+    # wait at integer time instants until
+    # there's a PCB at the input (a polling step, see Steps.py)
+    def bypass_wait_for_pcb(self, value):
+        if not self.inp.can_get():
+            self.inp.flow_stats.get_refused()
+            self.flow_stats.get_refused()
+            while not self.inp.can_get():
+                yield self.env.timeout(1)
+        return self.bypass_got_pcb, self.inp.get()
+
+    def bypass_got_pcb(self, value):
+        self.pcb = value
+        print("T=",self.env.now+0.0,self.name,"input a PCB",self.pcb)
+        if(self.trace!=None): self.trace.enter(self.pcb, self.env.now)
+        self.flow_stats.put()
+
+        # perform output at the middle of a time-slot
+        return self.bypass_output_pcb, self.env.timeout(0.5)
+
+    # wait until there's place at the output
+    # (a polling step, see Steps.py)
+    def bypass_output_pcb(self, value):
+        if not self.outp.can_put():
+            self.outp.flow_stats.put_refused()
+            while not self.outp.can_put():
+                yield self.env.timeout(1)
+        return self.bypass_placed_pcb, self.outp.put(self.pcb)
+
+    def bypass_placed_pcb(self, value):
+        # output a single PCB.
+        print("T=",self.env.now+0.0,self.name,"output ",self.pcb,"to",self.outp)
+        if(self.trace!=None): self.trace.leave(self.pcb, self.env.now)
+        self.flow_stats.got()
+
+        # wait till an integer time instant
+        return self.bypass_wait_for_pcb, self.env.timeout(0.5)
+
+    # Steps of the behavior in the BUFFERING_ENABLED mode:
+
+    def start_buffering(self, value):
+        self.change_state(self.get_buffering_state())
+
+        #Initially, the reflow oven is turned off.
+        if(self.reflow_pointer!=None): self.reflow_pointer.turn_OFF()
+        return self.input_pcb, None
+
+    #================================================
+    # Input
+    #================================================
+    # Input can happen only at integer time-instants.(1,2,3...)
+    def input_pcb(self, value):
+        if (self.bank_states[self.fill_index]!=BANK_FREE):
+            self.flow_stats.put_refused()
+        elif (self.inp.can_get()):
+            return self.got_pcb, self.inp.get()
+        else:
+            self.inp.flow_stats.get_refused()
+        return self.wait_for_output_slot()
+
+    def got_pcb(self, pcb):
+        fill_bank = self.banks[self.fill_index]
+        fill_bank.append(pcb)
+        print("T=",self.env.now+0.0,self.name,"input a PCB",pcb,"into bank",self.fill_index)
+        if(self.trace!=None): self.trace.enter(pcb, self.env.now)
+        self.flow_stats.put()
+
+        # Check if the reflow oven should be turned on now
+        if((len(fill_bank)==(self.capacity_per_stage-self.k[self.fill_index])) and self.reflow_pointer!=None):
+            self.reflow_pointer.turn_ON()
+
+        if (len(fill_bank)==self.capacity_per_stage):
+            self.seal_fill_bank()
+            self.update_buffering_state()
+
+        return self.wait_for_output_slot()
+
+    # Wait until the middle of the slot, to output a PCB.
+    # While no bank is full or being drained, there is nothing to output,
+    # and the module (already starved) waits for the next slot instead.
+    def wait_for_output_slot(self):
+        if(self.bank_states[self.drain_index]==BANK_FREE and self.flow_stats.starved_since!=None):
+            return self.input_pcb, self.env.timeout(1)
+        return self.output_pcb, self.env.timeout(0.5)
+
+    #================================================
+    # Output
+    #================================================
+    # Output can happen only at the middle of time-slots. (0.5, 1.5, 2.5...)
+    def output_pcb(self, value):
+        self.hand_over()
+        drain_bank = self.banks[self.drain_index]
+        if(self.bank_states[self.drain_index]!=BANK_DRAINING):
+            self.flow_stats.get_refused()
+        elif(self.outp.can_put()):
+            if(self.buffering_mode=="LIFO"):
+                self.pcb = drain_bank.pop()
+            else:
+                self.pcb = drain_bank.popleft()
+            return self.placed_pcb, self.outp.put(self.pcb)
+        else:
+            self.outp.flow_stats.put_refused()
+        return self.wait_for_input_slot()
+
+    def placed_pcb(self, value):
+        drain_bank = self.banks[self.drain_index]
+        print("T=",self.env.now+0.0,self.name,"in ",self.buffering_mode," mode output ",self.pcb,"to",self.outp)
+        if(self.trace!=None): self.trace.leave(self.pcb, self.env.now)
+        self.flow_stats.got()
+
+        if (len(drain_bank)==0):
+            print("T=",self.env.now+0.0,self.name,"bank",self.drain_index,"is empty.")
+            self.bank_states[self.drain_index] = BANK_FREE
+            self.drain_index = (self.drain_index+1) % self.num_banks
+            self.update_buffering_state()
+            # Now turn the reflow oven OFF
+            if(self.reflow_pointer!=None): self.reflow_pointer.turn_OFF()
+        return self.wait_for_input_slot()
+
+    # Wait until the start of the next slot, to input a PCB.
+    # While no bank can accept a PCB, there is nothing to input,
+    # and the module (already blocked) waits for the middle of the next slot instead.
+    def wait_for_input_slot(self):
+        if(self.bank_states[self.fill_index]!=BANK_FREE and self.flow_stats.blocked_since!=None):
+            return self.output_pcb, self.env.timeout(1)
+        return self.input_pcb, self.env.timeout(0.5)
+
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        state = BaseOperator.get_state(self)
+        state["pcb"] = item_to_data(self.pcb)
+        state["flow_stats"] = self.flow_stats.get_state()
+        if(self.banks!=None):
+            state["banks"] = [[item_to_data(pcb) for pcb in b] for b in self.banks]
+            state["bank_states"] = list(self.bank_states)
+            state["fill_index"] = self.fill_index
+            state["drain_index"] = self.drain_index
+        return state
+
+    def set_state(self, state):
+        BaseOperator.set_state(self, state)
+        self.pcb = item_from_data(state["pcb"])
+        self.flow_stats.set_state(state["flow_stats"])
+        if(self.banks!=None):
+            assert(len(state["banks"])==self.num_banks)
+            self.banks = [deque([item_from_data(d) for d in b]) for b in state["banks"]]
+            self.bank_states = list(state["bank_states"])
+            self.fill_index = state["fill_index"]
+            self.drain_index = state["drain_index"]
@@ -12,6 +12,8 @@
 #       processing_delay:   time to perform placement for each PCB, 
 #       reel_replacement_interval:  number of PCBs processed after which a replacement is 
 #                                    performed. This is an integer random variable.
+#   Both parameters can be specified either as fixed integers or as 
+#   distribution specs (see RandomVariates.py).
 #       
 #   Author: Neha Karanjkar
 
@@ -20,6 +22,7 @@ import random,simpy,math
 from PCB import *
 from PCB_types import *
 from BaseOperator import BaseOperator
+from Steps import run_steps
 
 class PickAndPlace(BaseOperator):
     
@@ -34,12 +37,13 @@ class PickAndPlace(BaseOperator):
         
         # state variables
         self.num_pcbs_processed_since_last_reel_replacement=0
+        self.pcb=None
         
         # states
         self.define_states(states=["idle","waiting_for_reel_replacement","processing","waiting_to_output"],start_state="idle")
-        self.process=env.process(self.behavior())
+        self.process=env.process(run_steps(self, self.behavior))
         
-        # this is the operator we interrupt
+        # this is the operator (or OperatorPool) we request
         # for performing reel replacements
         self.reel_replacement_operator=None
         
@@ -52,69 +56,119 @@ class PickAndPlace(BaseOperator):
         self.reel_replacement_operator=operator
     
     
-    def behavior(self):
+    def behavior(self, value):
 
         #checks:
-        assert( (type(self.processing_delay)==int) and (self.processing_delay>=1))
+        assert( (type(self.processing_delay)!=int) or (self.processing_delay>=1))
         assert(type(self.start_time)==int)
         assert(self.reel_replacement_operator!=None),("please assign a reel_replacement_operator to "+self.name)
         
+        # streams of values for the (possibly random) parameters
+        self.processing_delay_stream = self.get_variate_stream(self.processing_delay, "processing_delay")
+        self.reel_replacement_interval_stream = self.get_variate_stream(self.reel_replacement_interval, "reel_replacement_interval")
+        self.current_reel_replacement_interval = self.reel_replacement_interval_stream.next()
+        
         # wait until the start time 
-        yield (self.env.timeout(self.start_time))
-
-        while True:
-            self.change_state("idle")
-
-            # wait at integer time instants until 
-            # there's a PCB at the input
-            pcb = None
-            while(not pcb):
-                if self.inp.can_get():
-                    pcb = yield self.inp.get()
-                    break
-                else:
-                    yield (self.env.timeout(1))
-            
-            # got a pcb.
-            print("T=",self.env.now+0.0,self.name,"started processing pcb ",pcb)
-            
-            
+        return self.start, self.env.timeout(self.start_time)
+
+    # Steps of the behavior (see Steps.py):
 
-            # check if a reel replacement is required.
-            reel_replacement_required = False
-            if(self.num_pcbs_processed_since_last_reel_replacement >= self.reel_replacement_interval):
-                print("T=",self.env.now+0.0,self.name,"Reel replacement required! Notifying human operator.")
-                self.reel_replacement_operator.behavior.interrupt(self.name+":"+"reel_replacement")
-                self.change_state("waiting_for_reel_replacement")
-                
-                # wait until reel replacement is performed
-                yield self.reel_replacement_done.get()
-                print("T=",self.env.now+0.0,self.name,"reel replacement done.")
-                self.num_pcbs_processed_since_last_reel_replacement = 0
-                # wait until an integer time instant
-                yield (self.env.timeout(math.ceil(self.env.now)-self.env.now))
+    def start(self, value):
+        # go down if a failure has occured
+        if(self.failure_due):
+            return self.breakdown(next_step=self.idle)
+        return self.idle, None
+
+    def idle(self, value):
+        self.change_state("idle")
+        return self.wait_for_pcb, None
+
+    # wait at integer time instants until 
+    # there's a PCB at the input (a polling step, see Steps.py)
+    def wait_for_pcb(self, value):
+        if not self.inp.can_get():
+            self.inp.flow_stats.get_refused()
+            while not self.inp.can_get():
+                yield self.env.timeout(1)
+        return self.got_pcb, self.inp.get()
+
+    def got_pcb(self, value):
+        self.pcb = value
+        if(self.trace!=None): self.trace.enter(self.pcb, self.env.now)
+        print("T=",self.env.now+0.0,self.name,"started processing pcb ",self.pcb)
+        
+        
+
+        # check if a reel replacement is required.
+        if(self.num_pcbs_processed_since_last_reel_replacement >= self.current_reel_replacement_interval):
+            print("T=",self.env.now+0.0,self.name,"Reel replacement required! Notifying human operator.")
+            self.reel_replacement_operator.request_task(self.name, "reel_replacement")
+            self.change_state("waiting_for_reel_replacement")
             
-            # start processing the PCB
-            self.change_state("processing")
-            yield (self.env.timeout(self.processing_delay-1.0))
-
-            # output the PCB if the output buffer is empty,
-            # else go into 'waiting_to_output' state.
-            while(1):
-                if self.outp.can_put():
-                    # can output.
-                    # wait until the middle of the time-slot.
-                    yield (self.env.timeout(0.5))
-                    # place the pcb at the output
-                    yield self.outp.put(pcb)
-                    print("T=",self.env.now+0.0,self.name,"placed",pcb,"on",self.outp)
-                    self.num_pcbs_processed_since_last_reel_replacement += 1
-                    yield (self.env.timeout(0.5))
-                    break
-                else:
-                    yield (self.env.timeout(1))
-                    if(self.current_state != "waiting_to_output"):
-                        self.change_state("waiting_to_output")
+            # wait until reel replacement is performed
+            return self.reel_replaced, self.reel_replacement_done.get()
+        return self.start_processing, None
+
+    def reel_replaced(self, value):
+        print("T=",self.env.now+0.0,self.name,"reel replacement done.")
+        self.num_pcbs_processed_since_last_reel_replacement = 0
+        self.current_reel_replacement_interval = self.reel_replacement_interval_stream.next()
+        # wait until an integer time instant
+        return self.start_processing, self.env.timeout(math.ceil(self.env.now)-self.env.now)
+        
+    # start processing the PCB
+    def start_processing(self, value):
+        self.change_state("processing")
+        return self.output_pcb, self.env.timeout(self.processing_delay_stream.next()-1.0)
+
+    # output the PCB if the output buffer is empty,
+    # else go into 'waiting_to_output' state.
+    def output_pcb(self, value):
+        if self.outp.can_put():
+            # can output.
+            # wait until the middle of the time-slot.
+            return self.place_pcb, self.env.timeout(0.5)
+        self.outp.flow_stats.put_refused()
+        return self.waiting_to_output, self.env.timeout(1)
+
+    # (a polling step, see Steps.py)
+    def waiting_to_output(self, value):
+        if(self.current_state != "waiting_to_output"):
+            self.change_state("waiting_to_output")
+        while not self.outp.can_put():
+            yield self.env.timeout(1)
+        return self.place_pcb, self.env.timeout(0.5)
+
+    # place the pcb at the output
+    def place_pcb(self, value):
+        return self.placed_pcb, self.outp.put(self.pcb)
+
+    def placed_pcb(self, value):
+        print("T=",self.env.now+0.0,self.name,"placed",self.pcb,"on",self.outp)
+        if(self.trace!=None): self.trace.leave(self.pcb, self.env.now)
+        self.num_pcbs_processed_since_last_reel_replacement += 1
+        return self.start, self.env.timeout(0.5)
+
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        state = BaseOperator.get_state(self)
+        state["pcb"] = item_to_data(self.pcb)
+        state["num_pcbs_processed_since_last_reel_replacement"] = self.num_pcbs_processed_since_last_reel_replacement
+        state["current_reel_replacement_interval"] = self.current_reel_replacement_interval
+        state["reel_replacement_done"] = list(self.reel_replacement_done.items)
+        state["processing_delay_stream"] = self.processing_delay_stream.get_state()
+        state["reel_replacement_interval_stream"] = self.reel_replacement_interval_stream.get_state()
+        return state
+
+    # (to be called after the behavior has created the streams)
+    def set_state(self, state):
+        BaseOperator.set_state(self, state)
+        self.pcb = item_from_data(state["pcb"])
+        self.num_pcbs_processed_since_last_reel_replacement = state["num_pcbs_processed_since_last_reel_replacement"]
+        self.current_reel_replacement_interval = state["current_reel_replacement_interval"]
+        self.reel_replacement_done.items = list(state["reel_replacement_done"])
+        self.processing_delay_stream.set_state(state["processing_delay_stream"])
+        self.reel_replacement_interval_stream.set_state(state["reel_replacement_interval_stream"])
 
 
 # Reel replacement task
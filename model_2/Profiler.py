@@ -0,0 +1,250 @@
+# Profiler.py
+#
+# An optional profiler that attributes the processed events, and the
+# wall-clock time spent in processing them, to the components of the line.
+#
+# ProfiledEnvironment() creates a SimPy Environment with an EventProfiler,
+# which measures the time spent in processing each event. The event is
+# attributed to the process that it resumes, i.e. the component that was waiting
+# for it (and which also created it: a timeout, or a request to a buffer). Thus, the wall-clock
+# time is the time spent in resuming that component's behavior until it
+# waits again. Events that do not resume a process (for example, the failure
+# events of MachineFailures.py, or the conditions used to end a run) are
+# attributed to the object that handles them.
+#
+# For each component, the following are recorded:
+#   events     : number of events processed
+#   wall_time  : wall-clock time (seconds) spent in processing them
+#   first/last : the simulation times of the first and last events
+# and the wall-clock time is also recorded per step of the behavior (see Steps.py),
+# so that it can be written as collapsed stacks ("component;step microseconds"),
+# which can be read by flamegraph tools (such as flamegraph.pl or speedscope).
+#
+# Usage:
+#   set profile_simulation = True in AssemblyLine.py, or
+#   env = ProfiledEnvironment()
+#   line = AssemblyLine.BuildAssemblyLine(env)
+#   env.run(until=...)
+#   PrintProfile(env)
+#   SaveCollapsedStacks(env, "profile.collapsed")
+#
+# To keep the overhead low, only a sample of the events is measured: on average
+# one in every <sample_interval> events (at random intervals, so that the samples
+# do not follow a periodic pattern of events). The events and wall-clock times of
+# each component are then estimated from its samples, and first/last are the times
+# of its first and last sampled events. With sample_interval=1, every event is measured.
+#
+# When the profiler is not used, the simulation is not affected at all.
+# (The profiler has its own random number generator, and does not
+# change the random numbers drawn by the model)
+#
+# Author: Neha Karanjkar
+
+import sys
+import random
+from heapq import heappop
+from time import perf_counter
+import simpy
+
+
+class EventProfiler():
+
+    def __init__(self, env, sample_interval=1):
+        assert(isinstance(sample_interval, int) and sample_interval>=1)
+        self.env = env
+        self.sample_interval = sample_interval
+        self.sampler = random.Random(0)
+        # number of events until the next sample
+        self.countdown = self.get_next_interval()
+
+        # stats per handler of events (a process, or another object):
+        # handler --> [first, last, component, {step: [samples, wall_time]}]
+        self.stats = {}
+
+        # The profiler replaces env.run() of a plain simpy.Environment.
+        # (The environment is not a subclass of simpy.Environment,
+        # as creating events in a subclass is slower)
+        env.run = self.run
+        env.profiler = self
+
+    # number of events between two samples (sample_interval on average)
+    def get_next_interval(self):
+        if(self.sample_interval==1):
+            return 1
+        return self.sampler.randint(1, 2*self.sample_interval-1)
+
+    # This is simpy.Environment.run(), with the loop over events
+    # (simpy.Environment.step()) inlined, and the sampling added.
+    def run(self, until=None):
+        env = self.env
+        if until is not None:
+            if not isinstance(until, simpy.events.Event):
+                at = until if isinstance(until, int) else float(until)
+                if at <= env.now:
+                    raise ValueError("until (%s) must be greater than the current simulation time"%at)
+                until = simpy.events.Event(env)
+                until._ok = True
+                until._value = None
+                env.schedule(until, simpy.events.URGENT, at - env.now)
+            elif until.callbacks is None:
+                return until.value
+            until.callbacks.append(simpy.core.StopSimulation.callback)
+
+        try:
+            self.process_events()
+        except simpy.core.StopSimulation as exc:
+            return exc.args[0]
+        except simpy.core.EmptySchedule:
+            if until is not None:
+                assert not until.triggered
+                raise RuntimeError("No scheduled events left but \"until\" event was not triggered: %s"%until) from None
+        return None
+
+    # The wall-clock time of a sampled event is the time between its start
+    # and the start of the next event. The handler of the event (and its
+    # current step) is looked up only for the sampled events, so the other
+    # events only decrement the countdown.
+    #
+    # Note: like simpy.Environment.step(), this loop uses the internals of
+    # SimPy (env._queue, env._now, event._ok/_value/_defused), as of SimPy 4.1.
+    def process_events(self):
+        env = self.env
+        queue = env._queue
+        countdown = self.countdown
+        counter = None
+        try:
+            while True:
+                try:
+                    t, _, _, event = heappop(queue)
+                except IndexError:
+                    raise simpy.core.EmptySchedule from None
+                env._now = t
+
+                callbacks, event.callbacks = event.callbacks, None
+                if counter is not None:
+                    counter[1] += perf_counter() - start
+                    counter = None
+                countdown -= 1
+                if countdown == 0:
+                    countdown = self.get_next_interval()
+                    counter = self.count_event(callbacks, t)
+                    start = perf_counter()
+
+                try:
+                    for callback in callbacks:
+                        callback(event)
+                except simpy.core.StopSimulation:
+                    event.callbacks = callbacks[callbacks.index(callback) + 1 :]
+                    env.schedule(event, simpy.events.EventPriority(-1))
+                    raise
+
+                if not event._ok and not hasattr(event, "_defused"):
+                    exc = type(event._value)(*event._value.args)
+                    exc.__cause__ = event._value
+                    raise exc
+        finally:
+            self.countdown = countdown
+            # the time after the last event is not counted
+            if counter is not None:
+                counter[1] += perf_counter() - start
+
+    # count a sampled event, and return the counter
+    # of the handler and step to which its time is added.
+    def count_event(self, callbacks, t):
+        handler = getattr(callbacks[0], "__self__", None) if callbacks else None
+        entry = self.stats.get(handler)
+        if entry is None:
+            entry = self.add_handler(handler, t)
+        entry[1] = t
+        step = getattr(entry[2], "step", None)
+        counter = entry[3].get(step)
+        if counter is None:
+            counter = entry[3][step] = [0, 0.0]
+        counter[0] += 1
+        return counter
+
+    # entry of a handler: [first, last, component, {step: [samples, wall_time]}]
+    # (the step is component.step, if its behavior is run in steps, see Steps.py)
+    def add_handler(self, handler, t):
+        component = None
+        if(isinstance(handler, simpy.events.Process)):
+            # the component whose behavior the process runs
+            # (in steps, see Steps.py, or in a behavior() generator)
+            frame = handler._generator.gi_frame
+            if(frame!=None):
+                component = frame.f_locals.get("component", frame.f_locals.get("self"))
+        entry = [t, t, component, {}]
+        self.stats[handler] = entry
+        return entry
+
+    # name of the component (or object) that handles events
+    def get_handler_name(self, handler, component):
+        if(component!=None and hasattr(component, "name")):
+            return component.name
+        if(isinstance(handler, simpy.events.Process)):
+            return handler._generator.__name__
+        if(handler==None):
+            return "(no handler)"
+        machine = getattr(handler, "machine", None)
+        if(machine!=None):
+            return machine.name+" ("+type(handler).__name__+")"
+        return getattr(handler, "name", "("+type(handler).__name__+")")
+
+    # stats per component: name --> [events, wall_time, first, last]
+    # (estimated from the samples)
+    def get_profile(self):
+        profile = {}
+        for handler, entry in self.stats.items():
+            name = self.get_handler_name(handler, entry[2])
+            events = sum([c[0] for c in entry[3].values()])*self.sample_interval
+            wall_time = sum([c[1] for c in entry[3].values()])*self.sample_interval
+            p = profile.get(name)
+            if(p==None):
+                profile[name] = [events, wall_time, entry[0], entry[1]]
+            else:
+                profile[name] = [p[0]+events, p[1]+wall_time, min(p[2],entry[0]), max(p[3],entry[1])]
+        return profile
+
+    # wall time per (component, step of its behavior)
+    def get_step_times(self):
+        step_times = {}
+        for handler, entry in self.stats.items():
+            name = self.get_handler_name(handler, entry[2])
+            for step, counter in entry[3].items():
+                key = (name, step.__name__ if step!=None else "-")
+                step_times[key] = step_times.get(key, 0.0) + counter[1]*self.sample_interval
+        return step_times
+
+
+# A SimPy environment whose events are profiled
+# (with an EventProfiler, available as env.profiler)
+def ProfiledEnvironment(initial_time=0, sample_interval=1):
+    env = simpy.Environment(initial_time)
+    EventProfiler(env, sample_interval)
+    return env
+
+
+# Print a table of the components, ranked by the wall time
+# spent in processing their events.
+def PrintProfile(env, file=None):
+    file = file if file!=None else sys.stdout
+    profile = env.profiler.get_profile()
+    total_events = sum([p[0] for p in profile.values()])
+    total_wall_time = sum([p[1] for p in profile.values()])
+    print("\n================================", file=file)
+    sampling = "" if env.profiler.sample_interval==1 else ", estimated from 1 in %d events"%(env.profiler.sample_interval)
+    print("Profile (%d events, %0.2f seconds%s):"%(total_events, total_wall_time, sampling), file=file)
+    print("================================", file=file)
+    print("%-45s %10s %7s %10s %7s %10s %12s %12s"%("component", "events", "%", "wall (s)", "%", "us/event", "first T", "last T"), file=file)
+    total_wall_time = max(total_wall_time, 1e-12)
+    for name, p in sorted(profile.items(), key=lambda x: -x[1][1]):
+        print("%-45s %10d %6.1f%% %10.3f %6.1f%% %10.2f %12.1f %12.1f"%(name, p[0], 100.0*p[0]/max(total_events,1),
+              p[1], 100.0*p[1]/total_wall_time, 1e6*p[1]/p[0], p[2], p[3]), file=file)
+
+
+# Save the wall time per component and step as collapsed
+# stacks (one line "line;component;step microseconds" per step)
+def SaveCollapsedStacks(env, file_name):
+    with open(file_name, "w") as f:
+        for (name, step), wall_time in sorted(env.profiler.get_step_times().items()):
+            f.write("line;%s;%s %d\n"%(name.replace(";",":").replace(" ","_"), step, int(round(wall_time*1e6))))
@@ -0,0 +1,174 @@
+# RandomVariates.py
+#
+# Streams of integer-valued random variates for machine parameters
+# such as processing delays and reel replacement intervals.
+#
+# A parameter can be specified either as a fixed integer (deterministic)
+# or as a distribution spec, which is a tuple of the form:
+#
+#   ("exponential", mean)
+#   ("lognormal", mean, std_dev)
+#   ("gamma", mean, std_dev)
+#   ("empirical", [values])  or  ("empirical", [values], [weights])
+#
+# Variates are drawn in large blocks using NumPy, from a stream
+# that belongs to the component (seeded from the component's random_seed
+# and the name of the parameter), and are consumed one at a time by index.
+# All variates are rounded to integers >= 1, since all delays in the
+# model are integral multiples of a second (see README.txt).
+#
+# NumPy is required only if a distribution spec is used.
+#
+# Author: Neha Karanjkar
+
+import math
+import zlib
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DISTRIBUTIONS = ["exponential", "lognormal", "gamma", "empirical"]
+
+
+# A stream that returns the same value every time.
+# (Used when a parameter is specified as a fixed integer.)
+class ConstantStream():
+
+    def __init__(self, value):
+        assert(isinstance(value,int))
+        self.value = value
+
+    def next(self):
+        return self.value
+
+    def reseed(self, fork_id):
+        pass
+
+    def get_state(self):
+        return {"spec":self.value}
+
+    def set_state(self, state):
+        pass
+
+    def mean(self):
+        return self.value
+
+
+class VariateStream():
+
+    def __init__(self, spec, seed, block_size=4096):
+        assert(np!=None),("NumPy is required for sampling from the distribution "+str(spec))
+        assert(isinstance(spec,tuple) and spec[0] in DISTRIBUTIONS),("unknown distribution spec "+str(spec))
+        assert(isinstance(block_size,int) and block_size>=1)
+
+        self.spec = spec
+        self.block_size = block_size
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        # the current block of variates and
+        # the index of the next variate to be consumed.
+        # (the state of the generator before the block was drawn
+        # is noted down, so that the block can be redrawn. See get_state)
+        self.block = []
+        self.index = 0
+        self.block_rng_state = None
+
+        if(spec[0]=="exponential"):
+            assert(spec[1]>0)
+        elif(spec[0]=="lognormal" or spec[0]=="gamma"):
+            mean, std = spec[1], spec[2]
+            assert(mean>0 and std>=0)
+        else:
+            assert(len(spec[1])>=1)
+            if(len(spec)>2):
+                assert(len(spec[2])==len(spec[1]))
+
+    # draw a new block of variates
+    def refill(self):
+        spec = self.spec
+        n = self.block_size
+        self.block_rng_state = self.rng.bit_generator.state
+        if(spec[0]=="exponential"):
+            x = self.rng.exponential(spec[1], n)
+        elif(spec[0]=="lognormal"):
+            mean, std = spec[1], spec[2]
+            # parameters of the underlying normal distribution
+            sigma = math.sqrt(math.log(1.0 + (std/mean)**2))
+            mu = math.log(mean) - sigma**2/2.0
+            x = self.rng.lognormal(mu, sigma, n)
+        elif(spec[0]=="gamma"):
+            mean, std = spec[1], spec[2]
+            if(std==0):
+                x = np.full(n, float(mean))
+            else:
+                x = self.rng.gamma((mean/std)**2, std**2/mean, n)
+        else:
+            p = None
+            if(len(spec)>2):
+                p = np.asarray(spec[2], dtype=float)
+                p = p/p.sum()
+            x = self.rng.choice(np.asarray(spec[1], dtype=float), size=n, p=p)
+
+        # round to integers >= 1, and convert to a
+        # list of python ints for fast consumption by index.
+        self.block = np.maximum(np.rint(x), 1).astype(np.int64).tolist()
+        self.index = 0
+
+    # start an independent sequence of variates
+    # (used to create different stochastic forks of a running model).
+    # The remaining variates of the current block are discarded.
+    def reseed(self, fork_id):
+        self.rng = np.random.default_rng(list(self.seed)+[fork_id])
+        self.block = []
+        self.index = 0
+
+    # state of the stream as plain data (see Snapshot.py).
+    # Instead of the current block, the state of the generator
+    # before the block was drawn is saved.
+    def get_state(self):
+        spec = [self.spec[0]] + [list(p) if isinstance(p,(list,tuple)) else p for p in self.spec[1:]]
+        if(len(self.block)!=0):
+            return {"spec":spec, "rng":self.block_rng_state, "block_drawn":True, "index":self.index}
+        return {"spec":spec, "rng":self.rng.bit_generator.state, "block_drawn":False, "index":0}
+
+    # restore the state saved by get_state(). If the state was saved from a
+    # stream with a different distribution (for example, when a variant
+    # of the line is started from a snapshot), the stream is left as it is.
+    def set_state(self, state):
+        if(state["spec"]!=self.get_state()["spec"]):
+            return
+        self.rng.bit_generator.state = state["rng"]
+        self.block = []
+        self.index = 0
+        if(state["block_drawn"]):
+            self.refill()
+            self.index = state["index"]
+
+    def next(self):
+        if(self.index>=len(self.block)):
+            self.refill()
+        v = self.block[self.index]
+        self.index += 1
+        return v
+
+    def mean(self):
+        spec = self.spec
+        if(spec[0]=="empirical"):
+            if(len(spec)>2):
+                return sum([v*w for v,w in zip(spec[1],spec[2])])/float(sum(spec[2]))
+            return sum(spec[1])/float(len(spec[1]))
+        return spec[1]
+
+
+# Create a stream for a parameter that can be either
+# a fixed integer or a distribution spec.
+# The seed is derived from the component's random_seed and the
+# stream name, so that each component gets its own independent stream.
+def get_variate_stream(spec, random_seed, stream_name, block_size=4096):
+    if(isinstance(spec,int)):
+        return ConstantStream(spec)
+    seed = [random_seed, zlib.crc32(stream_name.encode())]
+    return VariateStream(spec, seed, block_size)
@@ -18,6 +18,7 @@
 #   "setup": high power consumed until the required temperature profile is achieved.
 #   "temperature_maintain_unoccupied" : reflow oven is on but there are no PCBs on the belt.
 #   "temperature_maintain_occupied" : reflow oven is on and there is atleast on PCB on the belt.
+#   "down" : the reflow oven has failed and is waiting to be repaired (only if failures are enabled. See MachineFailures.py)
 #
 #
 # Modes:
@@ -35,6 +36,8 @@
 
 import random,simpy
 from BaseOperator import BaseOperator
+from PCB import item_to_data, item_from_data
+from Steps import run_steps
 import math
 
 class ReflowOven(BaseOperator):
@@ -72,7 +75,7 @@ class ReflowOven(BaseOperator):
         self.stages=[]
 
         # start behavior
-        self.process=env.process(self.behavior())
+        self.process=env.process(run_steps(self, self.behavior))
     
    
     def empty(self):
@@ -94,7 +97,7 @@ class ReflowOven(BaseOperator):
         self.external_signal="TURN_OFF"
         print("T=",self.env.now+0.0,self.name,"External control registered a TURN OFF request")
         
-    def behavior(self):
+    def behavior(self, value):
 
         # checks:
         assert( (type(self.num_stages)==int) and (self.num_stages>=2))
@@ -103,6 +106,11 @@ class ReflowOven(BaseOperator):
         # create a list to model stages
         self.stages=[None for i in range(self.num_stages)]
        
+        return self.power_up, None
+
+    # Steps of the behavior (see Steps.py):
+
+    def power_up(self, value):
         # set the initial temperature to room temperature.
         self.temp_current = self.temp_room
 
@@ -111,112 +119,151 @@ class ReflowOven(BaseOperator):
             self.change_state("setup")
         else:
             self.change_state("off")
+        return self.start, None
+
+    def start(self, value):
+        # go down if a failure has occured
+        if(self.failure_due):
+            return self.breakdown(next_step=self.operate)
+        return self.operate(None)
+
+    def operate(self, value):
+
+        # if the RFO is in setup state, perform the full setup.
+        # irrespective of the external control.
+        # After finishing the setup, check the external control signal.
+        if (self.current_state=="setup"):
+            # =====================
+            # SETUP
+            #
+            # compute the setup time which depends on current temperature
+            # and the maximum temperature to be attained.
+            t_setup = (self.temp_max - self.temp_current)/self.heating_rate_constant*3600
+            # round the setup time to an integer.
+            self.setup_time = int(round(t_setup))
+            assert( (type(self.setup_time)==int) and (self.setup_time>1))
+            print("T=",self.env.now+0.0,self.name,"Starting setup. Expected setup time = %0.2f hours"%(self.setup_time/3600.0))
+            return self.setup_done, self.env.timeout(self.setup_time)
+
         
-        while True:
-            
-            # if the RFO is in setup state, perform the full setup.
-            # irrespective of the external control.
-            # After finishing the setup, check the external control signal.
-            if (self.current_state=="setup"):
-                # =====================
-                # SETUP
-                #
-                # compute the setup time which depends on current temperature
-                # and the maximum temperature to be attained.
-                t_setup = (self.temp_max - self.temp_current)/self.heating_rate_constant*3600
-                # round the setup time to an integer.
-                self.setup_time = int(round(t_setup))
-                assert( (type(self.setup_time)==int) and (self.setup_time>1))
-                print("T=",self.env.now+0.0,self.name,"Starting setup. Expected setup time = %0.2f hours"%(self.setup_time/3600.0))
-                yield (self.env.timeout(self.setup_time))
-                self.temp_current = self.temp_max
-
-                # at the end of setup period, check the external signals:
-                if(self.operational_mode=="EXTERNAL_CONTROL" and self.external_signal=="TURN_OFF"): 
-                    assert(self.empty())
-                    #================
-                    # SETUP -> OFF
-                    #
-                    self.change_state("off")
-                    self.timestamp_turn_OFF = self.env.now
-                    #================
+        # if the RFO is off, do nothing.
+        # keep waiting for external control to turn on the oven.
+        elif (self.current_state=="off"):
+            assert(self.empty())
+            if(self.operational_mode=="EXTERNAL_CONTROL" and self.external_signal=="TURN_ON"): 
                 
-                else:
-                    assert(self.empty())
-                    #===================
-                    # SETUP -> MAINTAIN
-                    #
-                    self.change_state("temperature_maintain_unoccupied")
-                    #===================
+                #===================
+                # OFF -> SETUP
+                #
+                # compute the current temperature, which has decayed since the
+                # oven was turned off.
+                time_elapsed_in_hours = (self.env.now- self.timestamp_turn_OFF)/3600.0
+                self.temp_new = self.temp_room + (self.temp_current-self.temp_room)\
+                    * math.exp(-1.0* self.cooling_rate_constant *time_elapsed_in_hours)
+                self.temp_current = self.temp_new 
+                print("T=",self.env.now+0.0,self.name,"Turning ON. Time elapsed since last turn_OFF = %0.2f"%time_elapsed_in_hours,"hours. Current_temp = %0.2f"%self.temp_current)
+                self.change_state("setup")
+                #================
+                return self.start, None
+            else:
+                return self.start, self.env.timeout(1)
+        
+        
+        # if the RFO is in the temperature_maintain states:
+        # pick up the object from input if there's any. 
+        elif(self.inp.can_get()):
+            return self.input_pcb, self.inp.get()
+        else:
+            self.inp.flow_stats.get_refused()
+            return self.input_pcb(None)
 
-            
-            # if the RFO is off, do nothing.
-            # keep waiting for external control to turn on the oven.
-            elif (self.current_state=="off"):
-                assert(self.empty())
-                if(self.operational_mode=="EXTERNAL_CONTROL" and self.external_signal=="TURN_ON"): 
-                    
-                    #===================
-                    # OFF -> SETUP
-                    #
-                    # compute the current temperature, which has decayed since the
-                    # oven was turned off.
-                    time_elapsed_in_hours = (self.env.now- self.timestamp_turn_OFF)/3600.0
-                    self.temp_new = self.temp_room + (self.temp_current-self.temp_room)\
-                        * math.exp(-1.0* self.cooling_rate_constant *time_elapsed_in_hours)
-                    self.temp_current = self.temp_new 
-                    print("T=",self.env.now+0.0,self.name,"Turning ON. Time elapsed since last turn_OFF = %0.2f"%time_elapsed_in_hours,"hours. Current_temp = %0.2f"%self.temp_current)
-                    self.change_state("setup")
-                    #================
-                else:
-                    yield (self.env.timeout(1))
-            
-            
-            # if the RFO is in the temperature_maintain states:
+    def setup_done(self, value):
+        self.temp_current = self.temp_max
+
+        # at the end of setup period, check the external signals:
+        if(self.operational_mode=="EXTERNAL_CONTROL" and self.external_signal=="TURN_OFF"): 
+            assert(self.empty())
+            #================
+            # SETUP -> OFF
+            #
+            self.change_state("off")
+            self.timestamp_turn_OFF = self.env.now
+            #================
+        
+        else:
+            assert(self.empty())
+            #===================
+            # SETUP -> MAINTAIN
+            #
+            self.change_state("temperature_maintain_unoccupied")
+            #===================
+        return self.start, None
+
+    def input_pcb(self, value):
+        self.stages[0]=value
+        if(self.trace!=None and self.stages[0]!=None): self.trace.enter(self.stages[0], self.env.now)
+        
+        # if the reflow oven is empty,
+        # we can update the state as suggested
+        # by the external control.
+        if(self.empty()):
+            if (self.operational_mode=="EXTERNAL_CONTROL" and self.external_signal=="TURN_OFF"):
+                #================
+                # MAINTAIN -> OFF
+                #
+                self.change_state("off")
+                self.timestamp_turn_OFF = self.env.now
+                #================
             else:
-                
-                # pick up the object from input if there's any. 
-                if(self.inp.can_get()):
-                    pcb=yield self.inp.get()
-                    self.stages[0]=pcb
-                else:
-                    self.stages[0]=None
-                
-                # if the reflow oven is empty,
-                # we can update the state as suggested
-                # by the external control.
-                if(self.empty()):
-                    if (self.operational_mode=="EXTERNAL_CONTROL" and self.external_signal=="TURN_OFF"):
-                        #================
-                        # MAINTAIN -> OFF
-                        #
-                        self.change_state("off")
-                        self.timestamp_turn_OFF = self.env.now
-                        #================
-                    else:
-                        self.change_state("temperature_maintain_unoccupied")
-                else:
-                    self.change_state("temperature_maintain_occupied")
-                
-                if(self.current_state=="temperature_maintain_occupied" or self.current_state=="temperature_maintain_unoccupied"):
-                    #shift right
-                    self.stages = [None] + self.stages[0:-1]
-                    
-                    # delay
-                    yield (self.env.timeout(self.delay_per_stage-1))
-                    
-                    # wait until the middle of the time-slot
-                    yield (self.env.timeout(0.5))
-                    
-                    # put the last object in output_buf
-                    pcb=self.stages[-1]
-                    if(pcb!=None):
-                         
-                        # place the pcb at the output
-                        yield self.outp.put(pcb)
-                        self.stages[-1]=None
-                        print("T=",self.env.now+0.0,self.name,"placed",pcb,"on",self.outp)
-
-                    # wait until an integer time instant
-                    yield (self.env.timeout(0.5))
-                
+                self.change_state("temperature_maintain_unoccupied")
+        else:
+            self.change_state("temperature_maintain_occupied")
+        
+        if(self.current_state=="temperature_maintain_occupied" or self.current_state=="temperature_maintain_unoccupied"):
+            #shift right
+            self.stages = [None] + self.stages[0:-1]
+            
+            # delay
+            return self.half_slot, self.env.timeout(self.delay_per_stage-1)
+        return self.start, None
+
+    # wait until the middle of the time-slot
+    def half_slot(self, value):
+        return self.output_pcb, self.env.timeout(0.5)
+
+    # put the last object in output_buf
+    def output_pcb(self, value):
+        pcb=self.stages[-1]
+        if(pcb!=None):
+            # place the pcb at the output
+            return self.placed_pcb, self.outp.put(pcb)
+        # wait until an integer time instant
+        return self.start, self.env.timeout(0.5)
+
+    def placed_pcb(self, value):
+        pcb=self.stages[-1]
+        self.stages[-1]=None
+        print("T=",self.env.now+0.0,self.name,"placed",pcb,"on",self.outp)
+        if(self.trace!=None): self.trace.leave(pcb, self.env.now)
+
+        # wait until an integer time instant
+        return self.start, self.env.timeout(0.5)
+
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        state = BaseOperator.get_state(self)
+        state["stages"] = [item_to_data(i) for i in self.stages]
+        state["external_signal"] = self.external_signal
+        state["temp_current"] = self.temp_current
+        state["timestamp_turn_OFF"] = self.timestamp_turn_OFF
+        state["setup_time"] = self.setup_time
+        return state
+
+    def set_state(self, state):
+        BaseOperator.set_state(self, state)
+        assert(len(state["stages"])==self.num_stages)
+        self.stages = [item_from_data(d) for d in state["stages"]]
+        self.external_signal = state["external_signal"]
+        self.temp_current = state["temp_current"]
+        self.timestamp_turn_OFF = state["timestamp_turn_OFF"]
+        self.setup_time = state["setup_time"]
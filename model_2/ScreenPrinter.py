@@ -14,7 +14,7 @@
 #           adhesive_capacity
 #           adhesive_initial_amount
 #
-#           printing_delay (in seconds)
+#           printing_delay (in seconds, a fixed integer or a distribution spec. See RandomVariates.py)
 #           cleaning_delay (in seconds)
 #           num_pcbs_per_cleaning : a cleaning operation is performed after processing every <num_pcbs_per_cleaning> PCBs.
 #
@@ -24,6 +24,7 @@ import random,simpy,math
 from PCB import *
 from PCB_types import *
 from BaseOperator import BaseOperator
+from Steps import run_steps
 
 class ScreenPrinter(BaseOperator):
     
@@ -51,25 +52,30 @@ class ScreenPrinter(BaseOperator):
                
         # states
         self.define_states(states=["idle","waiting_for_refill","printing","cleaning","waiting_to_output"],start_state="idle")
-        self.process=env.process(self.behavior())
+        self.process=env.process(run_steps(self, self.behavior))
         
-        # this is the operator we interrupt 
-        # when the solder/adhesive reserves are low.
+        # this is the operator (or OperatorPool) we request
+        # a refill from when the solder/adhesive reserves are low.
         #
         self.refill_operator=None
         
                
         self.solder_reserve = None
         self.adhesive_reserve=None
+
+        # the PCB being printed
+        self.pcb = None
+        self.pcb_count_for_cleaning = 0
+        self.refill_needed = False
     
     def set_refill_operator(self,operator):
         self.refill_operator=operator
 
     
-    def behavior(self):
+    def behavior(self, value):
 
         # checks:
-        assert( (type(self.printing_delay)==int) and (self.printing_delay>=1))
+        assert( (type(self.printing_delay)!=int) or (self.printing_delay>=1))
         assert( (type(self.cleaning_delay)==int) and (self.cleaning_delay>=1))
         assert( (type(self.num_pcbs_per_cleaning)==int) and (self.num_pcbs_per_cleaning>1))
         assert(self.refill_operator!=None),("please assign a refill operator to "+self.name)
@@ -79,6 +85,9 @@ class ScreenPrinter(BaseOperator):
         assert(self.solder_capacity>0.0)
         assert(self.adhesive_capacity>0.0)
         
+        # stream of values for the (possibly random) printing delay
+        self.printing_delay_stream = self.get_variate_stream(self.printing_delay, "printing_delay")
+
         # create the reserves
         self.solder_reserve = simpy.Container(self.env,init=self.solder_initial_amount, capacity=self.solder_capacity)
         self.adhesive_reserve=simpy.Container(self.env,init=self.adhesive_initial_amount, capacity=self.adhesive_capacity)
@@ -86,87 +95,138 @@ class ScreenPrinter(BaseOperator):
         self.change_state("idle")
       
         # wait until the start time 
-        yield (self.env.timeout(self.start_time))
-
-        pcb_count_for_cleaning = 0
-        while True:
-            self.change_state("idle")
-
-            # wait at integer time instants until 
-            # there's a PCB at the input
-            pcb = None
-            while(not pcb):
-                if self.inp.can_get():
-                    pcb = yield self.inp.get()
-                    break
-                else:
-                    yield (self.env.timeout(1))
-            
-            # got a pcb.
-            print("T=",self.env.now+0.0,self.name,"started printing pcb ",pcb)
-            
-            
-            # infer consummable amounts from the PCB's type. 
-            # check if required amounts of solder/adhesive are present
-            # If not, interrupt a human operator to start the refilling process.
-            solder_amt_required = get_PCB_solder_amt(pcb.type_ID)
-            adhesive_amt_required = get_PCB_adhesive_amt(pcb.type_ID)
-            refill_needed=False
-            
-            if(self.solder_reserve.level<solder_amt_required):
-                print("T=",self.env.now+0.0,self.name,"Solder reserve low!! Needs refilling.")
-                refill_needed=True
-                self.refill_operator.behavior.interrupt(self.name+":"+"solder_refill")
-            
-            if(self.adhesive_reserve.level<adhesive_amt_required):
-                print("T=",self.env.now+0.0,self.name,"Adhesive reserve low!! Needs refilling.")
-                refill_needed=True
-                self.refill_operator.behavior.interrupt(self.name+":"+"adhesive_refill")
-            
-            if(refill_needed):
-                self.change_state("waiting_for_refill")
-                
-            # wait until solder/adhesive have been refilled
-            # and consume the required amounts of consummables.
-            yield self.solder_reserve.get(solder_amt_required)
-            yield self.adhesive_reserve.get(adhesive_amt_required)
-            
-            if(refill_needed):
-                print("T=",self.env.now+0.0,self.name,"refill done.")
-                refill_needed = False
+        self.pcb_count_for_cleaning = 0
+        return self.start, self.env.timeout(self.start_time)
 
+    # Steps of the behavior (see Steps.py):
+
+    def start(self, value):
+        # go down if a failure has occured
+        if(self.failure_due):
+            return self.breakdown(next_step=self.idle)
+        return self.idle, None
+
+    def idle(self, value):
+        self.change_state("idle")
+        return self.wait_for_pcb, None
+
+    # wait at integer time instants until 
+    # there's a PCB at the input (a polling step, see Steps.py)
+    def wait_for_pcb(self, value):
+        if not self.inp.can_get():
+            self.inp.flow_stats.get_refused()
+            while not self.inp.can_get():
+                yield self.env.timeout(1)
+        return self.got_pcb, self.inp.get()
+
+    def got_pcb(self, value):
+        self.pcb = value
+        if(self.trace!=None): self.trace.enter(self.pcb, self.env.now)
+        print("T=",self.env.now+0.0,self.name,"started printing pcb ",self.pcb)
+        
+        
+        # infer consummable amounts from the PCB's type. 
+        # check if required amounts of solder/adhesive are present
+        # If not, interrupt a human operator to start the refilling process.
+        solder_amt_required = get_PCB_solder_amt(self.pcb.type_ID)
+        adhesive_amt_required = get_PCB_adhesive_amt(self.pcb.type_ID)
+        self.refill_needed=False
+        
+        if(self.solder_reserve.level<solder_amt_required):
+            print("T=",self.env.now+0.0,self.name,"Solder reserve low!! Needs refilling.")
+            self.refill_needed=True
+            self.refill_operator.request_task(self.name, "solder_refill")
+        
+        if(self.adhesive_reserve.level<adhesive_amt_required):
+            print("T=",self.env.now+0.0,self.name,"Adhesive reserve low!! Needs refilling.")
+            self.refill_needed=True
+            self.refill_operator.request_task(self.name, "adhesive_refill")
+        
+        if(self.refill_needed):
+            self.change_state("waiting_for_refill")
             
-            # wait for an integer amount of time and start printing
-            yield (self.env.timeout(math.ceil(self.env.now)-self.env.now))
-            self.change_state("printing")
-            yield (self.env.timeout(self.printing_delay-1.0))
-            pcb_count_for_cleaning += 1
-
-            # output the PCB if the output buffer is empty,
-            # else go into 'waiting_to_output' state.
-            while(1):
-                if self.outp.can_put():
-                    #
-                    # can output.
-                    # wait until the middle of the time-slot.
-                    yield (self.env.timeout(0.5))
-                    #
-                    # place the pcb at the output
-                    yield self.outp.put(pcb)
-                    print("T=",self.env.now+0.0,self.name,"placed",pcb,"on",self.outp)
-                    yield (self.env.timeout(0.5))
-                    #
-                    # shall we perform a cleaning operation now?
-                    if(pcb_count_for_cleaning >= self.num_pcbs_per_cleaning):
-                        self.change_state("cleaning")
-                        yield (self.env.timeout(self.cleaning_delay))
-                        self.change_state("idle")
-                        pcb_count_for_cleaning = 0
-                    break
-                else:
-                    yield (self.env.timeout(1))
-                    if(self.current_state != "waiting_to_output"):
-                        self.change_state("waiting_to_output")
+        # wait until solder/adhesive have been refilled
+        # and consume the required amounts of consummables.
+        return self.got_solder, self.solder_reserve.get(solder_amt_required)
+
+    def got_solder(self, value):
+        return self.got_adhesive, self.adhesive_reserve.get(get_PCB_adhesive_amt(self.pcb.type_ID))
+
+    def got_adhesive(self, value):
+        if(self.refill_needed):
+            print("T=",self.env.now+0.0,self.name,"refill done.")
+            self.refill_needed = False
+
+        # wait for an integer amount of time and start printing
+        return self.start_printing, self.env.timeout(math.ceil(self.env.now)-self.env.now)
+
+    def start_printing(self, value):
+        self.change_state("printing")
+        return self.printed, self.env.timeout(self.printing_delay_stream.next()-1.0)
+
+    def printed(self, value):
+        self.pcb_count_for_cleaning += 1
+        return self.output_pcb(None)
+
+    # output the PCB if the output buffer is empty,
+    # else go into 'waiting_to_output' state.
+    def output_pcb(self, value):
+        if self.outp.can_put():
+            # can output.
+            # wait until the middle of the time-slot.
+            return self.place_pcb, self.env.timeout(0.5)
+        self.outp.flow_stats.put_refused()
+        return self.waiting_to_output, self.env.timeout(1)
+
+    # (a polling step, see Steps.py)
+    def waiting_to_output(self, value):
+        if(self.current_state != "waiting_to_output"):
+            self.change_state("waiting_to_output")
+        while not self.outp.can_put():
+            yield self.env.timeout(1)
+        return self.place_pcb, self.env.timeout(0.5)
+
+    # place the pcb at the output
+    def place_pcb(self, value):
+        return self.placed_pcb, self.outp.put(self.pcb)
+
+    def placed_pcb(self, value):
+        print("T=",self.env.now+0.0,self.name,"placed",self.pcb,"on",self.outp)
+        if(self.trace!=None): self.trace.leave(self.pcb, self.env.now)
+        return self.clean, self.env.timeout(0.5)
+
+    # shall we perform a cleaning operation now?
+    def clean(self, value):
+        if(self.pcb_count_for_cleaning >= self.num_pcbs_per_cleaning):
+            self.change_state("cleaning")
+            return self.cleaned, self.env.timeout(self.cleaning_delay)
+        return self.start, None
+
+    def cleaned(self, value):
+        self.change_state("idle")
+        self.pcb_count_for_cleaning = 0
+        return self.start, None
+
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        state = BaseOperator.get_state(self)
+        state["pcb"] = item_to_data(self.pcb)
+        state["pcb_count_for_cleaning"] = self.pcb_count_for_cleaning
+        state["refill_needed"] = self.refill_needed
+        state["solder_level"] = self.solder_reserve.level
+        state["adhesive_level"] = self.adhesive_reserve.level
+        state["printing_delay_stream"] = self.printing_delay_stream.get_state()
+        return state
+
+    # (to be called after the behavior has created the reserves and streams)
+    def set_state(self, state):
+        BaseOperator.set_state(self, state)
+        self.pcb = item_from_data(state["pcb"])
+        self.pcb_count_for_cleaning = state["pcb_count_for_cleaning"]
+        self.refill_needed = state["refill_needed"]
+        self.solder_reserve = simpy.Container(self.env,init=state["solder_level"], capacity=self.solder_capacity)
+        self.adhesive_reserve=simpy.Container(self.env,init=state["adhesive_level"], capacity=self.adhesive_capacity)
+        self.printing_delay_stream.set_state(state["printing_delay_stream"])
 
 
 #Solder refill task:
@@ -8,6 +8,7 @@
 import random
 import simpy
 from PCB import PCB
+from Steps import run_steps
 
 class Sink():
     def __init__(self, env, name, inp):
@@ -22,7 +23,7 @@ class Sink():
         self.start_time=0.0
         
         #start behavior
-        self.process=env.process(self.behavior())
+        self.process=env.process(run_steps(self, self.behavior))
         self.stop_condition = simpy.events.Event(env) # create an event for the stop condition.
         # simulation is stopped whan this even is triggered.
 
@@ -33,32 +34,53 @@ class Sink():
         self.average_cycle_time=0.0
         self.max_cycle_time=0.0
 
+        # traceability (see Traceability.py)
+        self.trace = None
 
-    def behavior(self):
+        # number of PCBs in the line (see FlowStats.py)
+        self.wip = None
+
+
+    def behavior(self, value):
         
-        yield self.env.timeout(self.start_time)
+        return self.wait_for_pcb, self.env.timeout(self.start_time)
+
+    # Steps of the behavior (see Steps.py):
+
+    #wait until there's a PCB at the input.
+    def wait_for_pcb(self, value):
+        return self.consume_pcb, self.inp.get()
+
+    def consume_pcb(self, pcb):
+        assert(isinstance(pcb,PCB))
+        if(self.trace!=None): self.trace.enter(pcb, self.env.now)
+        if(self.wip!=None): self.wip.got()
+        PCB_cycle_time = self.env.now - pcb.creation_timestamp
+        self.max_cycle_time = max(self.max_cycle_time, PCB_cycle_time) 
+        self.average_cycle_time = self.average_cycle_time * self.num_items_finished + PCB_cycle_time
+        self.num_items_finished+=1
+        self.average_cycle_time = self.average_cycle_time/self.num_items_finished
+        print("T=", self.env.now+0.0, self.name, "consumed a single PCB ",pcb,"from ",self.inp," which incurred a cycle time of %0.2f"%(PCB_cycle_time/3600.0),"hours. The Max cycle-time so far is %0.2f"%(self.max_cycle_time/3600.0),"hours.")
+
         
-        while(True):
-            
-            #wait until there's a PCB at the input.
-            pcb =yield self.inp.get()
-            assert(isinstance(pcb,PCB))
-            PCB_cycle_time = self.env.now - pcb.creation_timestamp
-            self.max_cycle_time = max(self.max_cycle_time, PCB_cycle_time) 
-            self.average_cycle_time = self.average_cycle_time * self.num_items_finished + PCB_cycle_time
-            self.num_items_finished+=1
-            self.average_cycle_time = self.average_cycle_time/self.num_items_finished
-            print("T=", self.env.now+0.0, self.name, "consumed a single PCB ",pcb,"from ",self.inp," which incurred a cycle time of %0.2f"%(PCB_cycle_time/3600.0),"hours. The Max cycle-time so far is %0.2f"%(self.max_cycle_time/3600.0),"hours.")
-
-            
-            #produce a delay
-            yield self.env.timeout(self.delay)
-
-            # stop simulation if <batch_size> number of PCBs have been processed.
-            if (self.num_items_finished >= self.batch_size):
-                print("T=", self.env.now+0.0, self.name, "finished processing",self.num_items_finished,"PCBs. Stopping simulation.")
-                self.stop_condition.succeed()
-                
-                
+        #produce a delay
+        return self.check_batch, self.env.timeout(self.delay)
+
+    def check_batch(self, value):
+        # stop simulation if <batch_size> number of PCBs have been processed.
+        if (self.num_items_finished >= self.batch_size):
+            print("T=", self.env.now+0.0, self.name, "finished processing",self.num_items_finished,"PCBs. Stopping simulation.")
+            self.stop_condition.succeed()
+        return self.wait_for_pcb, None
 
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        return {"num_items_finished":self.num_items_finished, "average_cycle_time":self.average_cycle_time,
+                "max_cycle_time":self.max_cycle_time, "stopped":self.stop_condition.triggered}
 
+    def set_state(self, state):
+        self.num_items_finished = state["num_items_finished"]
+        self.average_cycle_time = state["average_cycle_time"]
+        self.max_cycle_time = state["max_cycle_time"]
+        if(state["stopped"] and not self.stop_condition.triggered):
+            self.stop_condition.succeed()
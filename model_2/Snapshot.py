@@ -0,0 +1,193 @@
+# Snapshot.py
+#
+# Snapshots of the complete state of a running assembly line model,
+# as plain data (dictionaries, lists, numbers and strings) that
+# can be saved into a JSON file.
+#
+# A snapshot taken at time t contains:
+#   time       : t
+#   parameters : the simulation parameters with which the line was built
+#                (see AssemblyLine.GetParameters)
+#   components : the state of each component, as returned by its get_state() method:
+#                stages of the machines and belts, contents of the buffers, counters,
+#                levels of containers, the current state and the time spent in each state,
+#                the temperature of the reflow oven, queued operator tasks,
+#                and the states of the streams of random variates.
+#   steps      : for each component with a behavior (see Steps.py), the step at which
+#                it is waiting and what it is waiting for: either a timeout
+#                {"time": <time at which it expires>, "order": <position in the event queue>}
+#                or a request to a buffer or container: {"get": [component, attribute]},
+#                {"put": [component, attribute], "item": <item>}, etc.
+#   failures   : the next failure of each machine (if failures are enabled),
+#                as {"time":..., "order":...}.
+#
+# The line is restored by building a new line at time t (in a new SimPy environment)
+# and then overwriting the state of its components. Each behavior continues from the
+# step at which it was saved, and the pending timeouts are re-created in their
+# original order, so that the restored line behaves exactly like the original one.
+#
+# Snapshots can only be taken between calls to env.run(until=<time>),
+# when no event at the current time is waiting to be processed.
+#
+# Usage:
+#   env.run(until=8*3600)                        # warm-up
+#   SaveSnapshot(TakeSnapshot(line), "warm_line.json")
+#   ...
+#   line = AssemblyLine.RestoreAssemblyLine(LoadSnapshot("warm_line.json"))
+#   line.env.run(until=...)
+#
+# Author: Neha Karanjkar
+
+import os
+import json
+import simpy
+
+from PCB import item_to_data, item_from_data
+from Buffer import Buffer
+
+
+# components whose behavior is written as steps
+# (see Steps.py) and has started.
+def get_process_components(line):
+    return [c for c in line.components.values() if hasattr(c, "step")]
+
+# the stores and containers of each component, as a dictionary
+# resource --> [component name, attribute name]
+def get_resources(line):
+    resources = {}
+    for c in line.components.values():
+        for attribute, value in vars(c).items():
+            if(isinstance(value, (simpy.Store, simpy.Container))):
+                resources[value] = [c.name, attribute]
+    return resources
+
+
+# description of the event a component is waiting for
+def get_wait(event, queue_order, resources):
+    if(event==None):
+        return None
+    if(event in queue_order):
+        assert(isinstance(event, simpy.events.Timeout)),("A snapshot can only be taken between calls to env.run(until=<time>)")
+        order, time = queue_order[event]
+        return {"time":time, "order":order}
+    assert(not event.triggered)
+    path = resources[event.resource]
+    if(isinstance(event, simpy.resources.store.StorePut)):
+        return {"put":path, "item":item_to_data(event.item)}
+    if(isinstance(event, simpy.resources.store.StoreGet)):
+        return {"get":path}
+    if(isinstance(event, simpy.resources.container.ContainerPut)):
+        return {"put":path, "amount":event.amount}
+    if(isinstance(event, simpy.resources.container.ContainerGet)):
+        return {"get":path, "amount":event.amount}
+    assert(False),("Cannot save a wait on event "+str(event))
+
+
+# re-create the request described by <wait>
+def make_request(line, wait):
+    if("get" in wait):
+        name, attribute = wait["get"]
+        resource = getattr(line.components[name], attribute)
+        return resource.get(wait["amount"]) if "amount" in wait else resource.get()
+    name, attribute = wait["put"]
+    resource = getattr(line.components[name], attribute)
+    return resource.put(wait["amount"]) if "amount" in wait else resource.put(item_from_data(wait["item"]))
+
+
+def TakeSnapshot(line):
+    env = line.env
+
+    # position of each pending event in the event queue
+    queue_order = {}
+    for order, (time, priority, eid, event) in enumerate(sorted(env._queue, key=lambda e: e[:3])):
+        queue_order[event] = (order, time)
+
+    assert(len(get_process_components(line))!=0),("A snapshot can only be taken after the line has started running")
+    snapshot = {"time":env.now, "parameters":getattr(line, "parameters", None), "components":{}, "steps":{}, "failures":{}}
+    for name, c in line.components.items():
+        snapshot["components"][name] = c.get_state()
+
+    resources = get_resources(line)
+    for c in get_process_components(line):
+        snapshot["steps"][c.name] = {"step": c.step.__name__ if c.step!=None else None,
+                                     "wait": get_wait(c.process.target, queue_order, resources)}
+        if(getattr(c, "failure_schedule", None)!=None):
+            order, time = queue_order[c.failure_schedule.event]
+            snapshot["failures"][c.name] = {"time":time, "order":order}
+    return snapshot
+
+
+# Restore a snapshot into a line that has just been built
+# (in an environment whose current time is the time of the snapshot).
+def RestoreSnapshot(snapshot, line):
+    env = line.env
+    assert(env.now==snapshot["time"]),("The line should be built at the time of the snapshot")
+    assert(set(line.components)==set(snapshot["components"])),("The line does not have the same components as the snapshot")
+    processes = [line.components[name] for name in snapshot["steps"]]
+
+    # the event that the behaviors wait for before continuing
+    # from their saved steps.
+    restored = simpy.events.Event(env)
+
+    # The states are restored by a process that starts after the
+    # behaviors of all components have been initialized (and would
+    # otherwise overwrite the restored states).
+    def restore_line():
+
+        # buffers first, as some states depend on their contents
+        components = sorted(line.components.values(), key=lambda c: not isinstance(c, Buffer))
+        for c in components:
+            c.set_state(snapshot["components"][c.name])
+        restored.succeed()
+
+        # re-create the pending timeouts in their original order
+        timeouts = []
+        for name, s in snapshot["steps"].items():
+            if(s["wait"]!=None and "time" in s["wait"]):
+                timeouts.append((s["wait"]["order"], "steps", name))
+        for name, f in snapshot["failures"].items():
+            timeouts.append((f["order"], "failures", name))
+        for order, kind, name in sorted(timeouts):
+            time = snapshot[kind][name]["time"] if kind=="failures" else snapshot[kind][name]["wait"]["time"]
+            event = env.timeout(time - env.now)
+            if(kind=="failures"):
+                line.components[name].failure_schedule.resume(event)
+            else:
+                line.components[name].restored_event = event
+        yield restored
+
+    # function returning the (step, event) with which a behavior continues
+    def get_step(c):
+        s = snapshot["steps"][c.name]
+        step = getattr(c, s["step"]) if s["step"]!=None else None
+        wait = s["wait"]
+        if(wait==None):
+            event = None
+        elif("time" in wait):
+            event = c.restored_event
+            c.restored_event = None
+        else:
+            event = make_request(line, wait)
+        return step, event
+
+    for c in processes:
+        c.resume = (restored, lambda c=c: get_step(c))
+    env.process(restore_line())
+    return line
+
+
+# Save a snapshot into a JSON file.
+# (The file is replaced atomically, so that the last saved
+# snapshot is not lost if the program crashes while saving)
+def SaveSnapshot(snapshot, file_name):
+    temp_file_name = file_name+".tmp"
+    with open(temp_file_name, "w") as f:
+        json.dump(snapshot, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file_name, file_name)
+
+
+def LoadSnapshot(file_name):
+    with open(file_name) as f:
+        return json.load(f)
@@ -19,6 +19,7 @@ import simpy
 
 from PCB import *
 from PCB_types import *
+from Steps import run_steps
 
 
 class Source():
@@ -37,12 +38,16 @@ class Source():
         self.start_time=0
 
         self.num_items_created =0
+
+        # number of PCBs in the line (see FlowStats.py),
+        # shared with the sink (set by AssemblyLine.py)
+        self.wip = None
         
         #start behavior
-        self.process=env.process(self.behavior())
+        self.process=env.process(run_steps(self, self.behavior))
         
 
-    def behavior(self):
+    def behavior(self, value):
         
         assert(isinstance(self.start_time, int))
         assert(isinstance(self.delay, int))
@@ -51,31 +56,40 @@ class Source():
 
 
         #wait until start time
-        yield self.env.timeout(self.start_time)
-
-        # run behavior until a certain number of PCBs have been created.
-        while(self.num_items_created < self.PCB_batch_size):
-            
-
-            #create a stack of PCBs
-            stack = []
-            for i in range(self.PCB_stack_size):
-                self.num_items_created += 1
-                stack.append(PCB(type_ID=self.PCB_type, serial_ID=self.num_items_created, creation_timestamp=self.env.now))
-
-            #place it at the output buffer
-            yield self.outp.put(stack)
-
-            print("T=", self.env.now+0.0, self.name,"output PCB stack to",self.outp)
-
-            #delay
-            yield (self.env.timeout(self.delay))
-
-
-        # Now, do nothing. Stay inactive.
-        print("T=", self.env.now+0.0, self.name,"Finished creating",self.num_items_created,"PCBs.")
-        #while(True): 
-        #    yield (self.env.timeout(100*self.delay))
-
-            
-
+        return self.create_stack, self.env.timeout(self.start_time)
+
+    # Steps of the behavior (see Steps.py):
+
+    # run behavior until a certain number of PCBs have been created.
+    def create_stack(self, value):
+        if(self.num_items_created >= self.PCB_batch_size):
+            # Now, do nothing. Stay inactive.
+            print("T=", self.env.now+0.0, self.name,"Finished creating",self.num_items_created,"PCBs.")
+            return None, None
+
+        #create a stack of PCBs
+        #(the PCBs are created as they are taken from the stack, see PCB.py)
+        stack = PCBStack(type_ID=self.PCB_type, first_serial_ID=self.num_items_created+1, num_PCBs=self.PCB_stack_size, creation_timestamp=self.env.now)
+        self.num_items_created += self.PCB_stack_size
+        if(self.wip!=None): self.wip.put(self.PCB_stack_size)
+
+        #place it at the output buffer
+        return self.output_stack, self.outp.put(stack)
+
+    def output_stack(self, value):
+        print("T=", self.env.now+0.0, self.name,"output PCB stack to",self.outp)
+
+        #delay
+        return self.create_stack, self.env.timeout(self.delay)
+
+    # state as plain data (see Snapshot.py)
+    def get_state(self):
+        state = {"num_items_created":self.num_items_created}
+        if(self.wip!=None):
+            state["wip"] = self.wip.get_state()
+        return state
+
+    def set_state(self, state):
+        self.num_items_created = state["num_items_created"]
+        if(self.wip!=None):
+            self.wip.set_state(state["wip"])
@@ -0,0 +1,183 @@
+# StateHistory.py
+#
+# Recorded histories of the states of the machines (and operators)
+# of the line, with a query API. For example:
+#
+#   when was pick_and_place_1 "waiting_to_output" while the reflow oven was in "setup"?
+#       history.intersect([("pick_and_place_1","waiting_to_output"), ("reflow_oven","setup")])
+#   total time that belt_SP_to_PP1 was "stalled" between hours 10 and 20:
+#       history.time_in_state("belt_SP_to_PP1", "stalled", 10*3600, 20*3600)
+#   states of all components at T=5 hours:
+#       history.snapshot(5*3600)
+#
+# The history of each component is run-length encoded: only the times
+# at which its state changes are recorded (by BaseOperator.change_state()),
+# along with the new state. The state at any time is then given by the
+# last change at or before that time (or the state at the time the recording
+# started, if there were no changes), and the history is a sorted array
+# of intervals [start, end) (each end being the start of the next interval,
+# or the current simulation time for the last one).
+# The queries work on whole arrays at a time (using NumPy), and
+# return intervals as a pair of arrays (starts, ends).
+#
+# Usage:
+#   set record_state_histories = True in AssemblyLine.py, or
+#   history = LineHistory(env)
+#   history.add_component(component)    (for each component)
+#   ...run the simulation...
+#   history.time_in_state(...)
+#
+# NumPy is required only for the queries.
+#
+# Author: Neha Karanjkar
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Run-length encoded history of the states of a single component
+class ComponentHistory():
+
+    def __init__(self, component, start_time):
+        self.component = component
+        # the time at which the recording started
+        self.start_time = start_time
+        # times at which the state changed, and the
+        # (index of the) state that the component changed to
+        self.times = array("d")
+        self.states = array("h")
+
+    # Record a change of state at time t.
+    # (called by the component just before it changes state)
+    def record(self, t, new_state):
+        if(len(self.times)==0):
+            # the state that the component was in until now
+            self.times.append(self.start_time)
+            self.states.append(self.component.states.index(self.component.current_state))
+        state = self.component.states.index(new_state)
+        if(self.times[-1]==t):
+            # the previous state lasted for zero time
+            self.times.pop()
+            self.states.pop()
+            if(len(self.states)!=0 and self.states[-1]==state):
+                return
+        self.times.append(t)
+        self.states.append(state)
+
+    # the history as arrays (starts, ends, state indices),
+    # with the last interval ending at end_time
+    def get_intervals(self, end_time):
+        if(len(self.times)==0):
+            starts = np.array([self.start_time])
+            states = np.array([self.component.states.index(self.component.current_state)])
+        else:
+            starts = np.frombuffer(self.times, dtype=np.float64).copy()
+            states = np.frombuffer(self.states, dtype=np.int16).copy()
+        ends = np.append(starts[1:], max(end_time, starts[-1]))
+        return starts, ends, states
+
+
+class LineHistory():
+
+    def __init__(self, env):
+        assert(np!=None),("NumPy is required for the state histories")
+        self.env = env
+        self.components = {}
+
+    # start recording the state changes of a component
+    def add_component(self, component):
+        history = ComponentHistory(component, self.env.now)
+        component.state_listeners.append(history)
+        self.components[component.name] = history
+
+    # the end of the recorded history (the current simulation time)
+    def get_end_time(self):
+        return self.env.now
+
+    # Intervals (starts, ends) during which a component was in the given state,
+    # clipped to the window [start, end) (by default, the entire history).
+    def get_intervals(self, name, state, start=None, end=None):
+        history = self.components[name]
+        starts, ends, states = history.get_intervals(self.get_end_time())
+        assert(state in history.component.states),("unknown state "+str(state)+" of "+name)
+        selected = (states==history.component.states.index(state))
+        return clip(starts[selected], ends[selected], start, end)
+
+    # total time spent by a component in the given state
+    # within the window [start, end)
+    def time_in_state(self, name, state, start=None, end=None):
+        starts, ends = self.get_intervals(name, state, start, end)
+        return float(np.sum(ends-starts))
+
+    # total time spent by a component in each of its states
+    # within the window [start, end)
+    def time_in_states(self, name, start=None, end=None):
+        return {state:self.time_in_state(name, state, start, end) for state in self.components[name].component.states}
+
+    # state of a component at time t
+    def state_at(self, name, t):
+        history = self.components[name]
+        starts, ends, states = history.get_intervals(self.get_end_time())
+        i = np.searchsorted(starts, t, side="right")-1
+        if(i<0 or t>ends[-1]):
+            return None
+        return history.component.states[states[i]]
+
+    # states of all components at time t
+    def snapshot(self, t):
+        return {name:self.state_at(name, t) for name in self.components}
+
+    # Intervals (starts, ends) during which all the conditions hold.
+    # Each condition is a pair (component name, state).
+    def intersect(self, conditions, start=None, end=None):
+        assert(len(conditions)>=1)
+        intervals = [self.get_intervals(name, state, start, end) for name, state in conditions]
+        return intersect_intervals(intervals)
+
+    # Save the histories into a (compressed) NumPy .npz file,
+    # as the arrays <name>.starts, <name>.ends and <name>.states
+    # (with the names of the states in <name>.state_names)
+    def save(self, file_name):
+        columns = {"components":np.array(list(self.components.keys()))}
+        for name, history in self.components.items():
+            starts, ends, states = history.get_intervals(self.get_end_time())
+            columns[name+".starts"] = starts
+            columns[name+".ends"] = ends
+            columns[name+".states"] = states
+            columns[name+".state_names"] = np.array(history.component.states)
+        np.savez_compressed(file_name, **columns)
+
+
+# Clip intervals to the window [start, end),
+# dropping those that fall outside it.
+def clip(starts, ends, start=None, end=None):
+    if(start!=None):
+        starts = np.maximum(starts, start)
+    if(end!=None):
+        ends = np.minimum(ends, end)
+    keep = (ends>starts)
+    return starts[keep], ends[keep]
+
+# Intersection of several lists of intervals (each a pair of arrays
+# (starts, ends) of sorted, non-overlapping intervals).
+# The boundaries of all intervals are sorted (with the ends before
+# the starts at the same time), and the intersection is where
+# the number of open intervals equals the number of lists.
+def intersect_intervals(intervals):
+    n = len(intervals)
+    times = np.concatenate([s for s, e in intervals] + [e for s, e in intervals])
+    deltas = np.concatenate([np.ones(len(s), dtype=np.int64) for s, e in intervals] + [-np.ones(len(e), dtype=np.int64) for s, e in intervals])
+    order = np.lexsort((deltas, times))
+    times = times[order]
+    count = np.cumsum(deltas[order])
+    # an interval of the intersection starts where the count
+    # reaches n, and ends at the next boundary.
+    opening = np.nonzero(count==n)[0]
+    starts = times[opening]
+    ends = times[opening+1]
+    keep = (ends>starts)
+    return starts[keep], ends[keep]
@@ -0,0 +1,72 @@
+# Steps.py
+#
+# The behavior of each component of the line (machines, operators,
+# source and sink) is written as a set of steps, so that the state of a
+# running model can be saved and restored (see Snapshot.py).
+# The process of a component runs its steps, starting with the step
+# component.behavior(), which sets up the component:
+#   self.process = env.process(run_steps(self, self.behavior))
+#
+# A step is a method of the component that performs some actions
+# (at a single time instant) and returns a tuple (next_step, event):
+# the step to be executed next, and the event (a timeout, or a get/put
+# request to a buffer or container) to wait for before executing it.
+# The next step is called with the value of the event (for example, the PCB
+# returned by a get request) as its argument.
+# If the event is None, the next step is executed right away (with the value None).
+# If next_step is None, the behavior ends.
+#
+# A step that polls (waits at integer time instants until a buffer can be
+# accessed, for example) can also be written as a generator, which yields the
+# events it waits for in a loop, and returns (next_step, event) when done.
+# When such a step is restarted (after a snapshot is restored), it must continue
+# as if the loop had not been left, i.e. each wait must be followed by the
+# same checks that are made at the start of the step.
+#
+# While a component is waiting, component.step is the step it will continue
+# with, and component.process.target the event it is waiting for.
+#
+# If a component is interrupted while waiting (see HumanOperator.py),
+# its method interrupted(cause) is called, which returns (next_step, event).
+#
+# Note: run_steps() runs for every event of the simulation, so it is kept small:
+# the next step is called directly, only component.step is set when the component
+# waits, and the polling steps wait without leaving their generator.
+#
+# Author: Neha Karanjkar
+
+import simpy
+
+
+# Run the behavior of a component, starting with <step> after
+# waiting for <event>. (A generator, to be run as a SimPy process)
+def run_steps(component, step, event=None):
+
+    # when the line is restored from a snapshot, component.resume is
+    # a tuple (restored, get_step). The first step (the set up of the component)
+    # is executed, and the component then waits until the states of all components
+    # have been restored (event <restored>) and continues from the step at which
+    # it was saved: get_step() returns (step, event).
+    if(getattr(component, "resume", None)!=None):
+        restored, get_step = component.resume
+        component.resume = None
+        step(None)
+        yield restored
+        step, event = get_step()
+
+    while(step is not None):
+        try:
+            if(event is None):
+                value = None
+            else:
+                component.step = step
+                value = yield event
+            waiting = step(value)
+            if(waiting.__class__ is not tuple):
+                # a polling step (a generator)
+                component.step = step
+                waiting = yield from waiting
+        except simpy.Interrupt as i:
+            waiting = component.interrupted(i.cause)
+        step, event = waiting
+    component.step = None
@@ -0,0 +1,243 @@
+# Timeline.py
+#
+# Gantt charts (timelines) of the states of the machines of the line,
+# exported as SVG or PNG images, for long runs.
+#
+# The timelines are drawn from the state histories recorded by
+# BaseOperator.change_state() (see StateHistory.py). A long run can have
+# millions of intervals, far more than there are pixels in an image. So, for
+# each component, a multi-resolution pyramid is precomputed: at level k, the
+# timeline is divided into bins of width w*2^k seconds, and each bin holds
+# the state in which the component spent the most time within the bin
+# (the dominant state). Successive bins with the same dominant state are merged.
+#
+# To draw a window [start, end) of the timeline that is <width> pixels wide,
+# the coarsest level whose bins are no wider than a pixel is used. If the pixels
+# are narrower than the bins of the finest level, the dominant state of each
+# pixel is computed directly from the recorded intervals within the window.
+# Thus, the time taken to draw a window depends on the number of pixels
+# (and the intervals within the window), not on the length of the run.
+#
+# Usage:
+#   set record_state_histories = True in AssemblyLine.py, and run the simulation
+#   timeline = Timeline(line.history)
+#   timeline.save_svg("timeline.svg", start=10*3600, end=20*3600, width=1200)
+#   timeline.save_png("timeline.png")
+#
+# NumPy is required. (The PNG images are written without other libraries,
+# and do not have text labels. The rows are in the order of timeline.names)
+#
+# Author: Neha Karanjkar
+
+import zlib
+import struct
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Colors (R,G,B) of the states.
+# States not listed here get colors from OTHER_COLORS.
+STATE_COLORS = {
+    "idle"                            : (200, 200, 200),
+    "empty"                           : (200, 200, 200),
+    "off"                             : (230, 230, 230),
+    "bypass"                          : (200, 200, 200),
+    "loading"                         : (60, 170, 75),
+    "printing"                        : (60, 170, 75),
+    "processing"                      : (60, 170, 75),
+    "moving"                          : (60, 170, 75),
+    "busy"                            : (60, 170, 75),
+    "temperature_maintain_occupied"   : (60, 170, 75),
+    "temperature_maintain_unoccupied" : (255, 225, 25),
+    "filling"                         : (70, 140, 240),
+    "emptying"                        : (145, 30, 180),
+    "buffering_enabled"               : (70, 140, 240),
+    "setup"                           : (70, 140, 240),
+    "cleaning"                        : (70, 240, 240),
+    "waiting_to_output"               : (245, 130, 48),
+    "stalled"                         : (245, 130, 48),
+    "waiting_for_refill"              : (240, 50, 230),
+    "waiting_for_reel_replacement"    : (240, 50, 230),
+    "travelling"                      : (170, 110, 40),
+    "down"                            : (230, 25, 75),
+}
+OTHER_COLORS = [(0, 128, 128), (128, 0, 0), (128, 128, 0), (0, 0, 128), (250, 190, 212)]
+
+
+def get_color(state, i):
+    return STATE_COLORS.get(state, OTHER_COLORS[i % len(OTHER_COLORS)])
+
+
+# Time spent in each state from the start of the given intervals
+# up to each of the times t. Returns a matrix of shape (len(t), num_states).
+def get_cumulative_occupancy(starts, ends, states, num_states, t):
+    durations = ends-starts
+    i = np.clip(np.searchsorted(starts, t, side="right")-1, 0, len(starts)-1)
+    partial = np.clip(t-starts[i], 0, durations[i])
+    occupancy = np.zeros((len(t), num_states))
+    for s in range(num_states):
+        cumulative = np.concatenate([[0.0], np.cumsum(np.where(states==s, durations, 0.0))])
+        occupancy[:, s] = cumulative[i] + np.where(states[i]==s, partial, 0.0)
+    return occupancy
+
+# The dominant state in each of the bins between successive <edges>,
+# given the time spent in each state within each bin (<occupancy>),
+# with successive bins of the same state merged.
+# Returns (starts, ends, states).
+def merge_bins(edges, occupancy):
+    dominant = np.argmax(occupancy, axis=1)
+    changes = np.concatenate([[0], np.nonzero(np.diff(dominant))[0]+1])
+    return edges[changes], np.append(edges[changes[1:]], edges[-1]), dominant[changes]
+
+
+# The pyramid of a single component
+class ComponentTimeline():
+
+    def __init__(self, name, state_names, starts, ends, states, finest_bins, coarsest_bins):
+        self.name = name
+        self.state_names = state_names
+        self.starts, self.ends, self.states = starts, ends, states
+
+        # levels of the pyramid: (bin width, starts, ends, states).
+        # The time spent in each state within each bin of the finest level
+        # is computed from the intervals, and the bins of each
+        # level are then summed in pairs to get the next level.
+        self.levels = []
+        start, end = starts[0], ends[-1]
+        bin_width = max(1.0, (end-start)/float(finest_bins))
+        num_bins = max(int(np.ceil((end-start)/bin_width)), 1)
+        edges = np.minimum(start + bin_width*np.arange(num_bins+1), end)
+        occupancy = np.diff(get_cumulative_occupancy(starts, ends, states, len(state_names), edges), axis=0)
+        while(True):
+            self.levels.append((bin_width,) + merge_bins(edges, occupancy))
+            if(len(occupancy)<=coarsest_bins):
+                break
+            if(len(occupancy)%2==1):
+                occupancy = np.vstack([occupancy, np.zeros((1, len(state_names)))])
+                edges = np.append(edges, end)
+            occupancy = occupancy[0::2] + occupancy[1::2]
+            edges = edges[0::2]
+            bin_width *= 2
+
+    # The intervals (starts, ends, states) to be drawn for the
+    # window [start, end), where each pixel is <pixel_width> seconds wide.
+    def get_visible(self, start, end, pixel_width):
+        level = None
+        for l in self.levels:
+            if(l[0]<=pixel_width):
+                level = l
+        if(level!=None):
+            bin_width, starts, ends, states = level
+        else:
+            # compute the dominant state of each pixel from
+            # the recorded intervals that fall within the window
+            first = max(np.searchsorted(self.starts, start, side="right")-1, 0)
+            last = np.searchsorted(self.starts, end, side="left")
+            window_start = max(start, self.starts[0])
+            window_end = min(end, self.ends[-1])
+            if(window_end<=window_start):
+                return self.starts[:0], self.ends[:0], self.states[:0]
+            num_pixels = int(np.ceil((window_end-window_start)/pixel_width))
+            edges = np.minimum(window_start + pixel_width*np.arange(num_pixels+1), window_end)
+            occupancy = np.diff(get_cumulative_occupancy(self.starts[first:last], self.ends[first:last], self.states[first:last], len(self.state_names), edges), axis=0)
+            return merge_bins(edges, occupancy)
+
+        first = max(np.searchsorted(starts, start, side="right")-1, 0)
+        last = np.searchsorted(starts, end, side="left")
+        starts, ends, states = starts[first:last], ends[first:last], states[first:last]
+        return np.maximum(starts, start), np.minimum(ends, end), states
+
+
+class Timeline():
+
+    # history: a StateHistory.LineHistory
+    # finest_bins: number of bins in the finest level of the pyramids
+    # coarsest_bins: (at most) the number of bins in the coarsest level
+    def __init__(self, history, finest_bins=2**16, coarsest_bins=256):
+        assert(np!=None),("NumPy is required for the timelines")
+        self.names = []
+        self.components = {}
+        end_time = history.get_end_time()
+        for name, component_history in history.components.items():
+            starts, ends, states = component_history.get_intervals(end_time)
+            self.names.append(name)
+            self.components[name] = ComponentTimeline(name, list(component_history.component.states),
+                    starts, ends, states, finest_bins, coarsest_bins)
+        self.start_time = min([c.starts[0] for c in self.components.values()])
+        self.end_time = end_time
+
+    # the rows to draw: a list of (name, state names, starts, ends, states)
+    def get_rows(self, start, end, width, names=None):
+        start = self.start_time if start==None else start
+        end = self.end_time if end==None else end
+        assert(end>start and width>=1)
+        pixel_width = (end-start)/float(width)
+        rows = []
+        for name in (names if names!=None else self.names):
+            c = self.components[name]
+            rows.append((name, c.state_names) + c.get_visible(start, end, pixel_width))
+        return start, end, rows
+
+    # Save the window [start, end) of the timeline as an SVG image
+    def save_svg(self, file_name, start=None, end=None, width=1200, row_height=20, names=None):
+        start, end, rows = self.get_rows(start, end, width, names)
+        scale = width/float(end-start)
+        label_width = 220
+        height = row_height*(len(rows)+3)
+        legend = []
+        with open(file_name, "w") as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="sans-serif" font-size="%d">\n'%(label_width+width+10, height, row_height*0.6))
+            for r, (name, state_names, starts, ends, states) in enumerate(rows):
+                y = r*row_height
+                f.write('<text x="4" y="%0.1f">%s</text>\n'%(y+row_height*0.7, name))
+                for s, e, state in zip(starts, ends, states):
+                    color = get_color(state_names[state], state)
+                    if((state_names[state], color) not in legend):
+                        legend.append((state_names[state], color))
+                    f.write('<rect x="%0.2f" y="%d" width="%0.2f" height="%d" fill="rgb%s"><title>%s %0.1f-%0.1f</title></rect>\n'%(
+                        label_width+(s-start)*scale, y+1, max((e-s)*scale, 0.1), row_height-2, str(color), state_names[state], s, e))
+            # time axis (in hours)
+            y = len(rows)*row_height
+            for i in range(11):
+                t = start + (end-start)*i/10.0
+                f.write('<text x="%0.1f" y="%0.1f" text-anchor="middle">%0.2fh</text>\n'%(label_width+(t-start)*scale, y+row_height*0.7, t/3600.0))
+            # legend
+            x = label_width
+            for state, color in legend:
+                f.write('<rect x="%d" y="%d" width="%d" height="%d" fill="rgb%s"/>'%(x, y+row_height*1.5, row_height*0.6, row_height*0.6, str(color)))
+                f.write('<text x="%d" y="%0.1f">%s</text>\n'%(x+row_height, y+row_height*2.1, state))
+                x += row_height + len(state)*row_height*0.4
+            f.write('</svg>\n')
+
+    # Save the window [start, end) of the timeline as a PNG image
+    # (one row of <row_height> pixels per component, without labels)
+    def save_png(self, file_name, start=None, end=None, width=1200, row_height=20, names=None):
+        start, end, rows = self.get_rows(start, end, width, names)
+        scale = width/float(end-start)
+        image = np.full((row_height*len(rows), width, 3), 255, dtype=np.uint8)
+        for r, (name, state_names, starts, ends, states) in enumerate(rows):
+            colors = np.array([get_color(s, i) for i, s in enumerate(state_names)], dtype=np.uint8)
+            # the state at the middle of each pixel
+            x = start + (np.arange(width)+0.5)/scale
+            i = np.searchsorted(starts, x, side="right")-1
+            visible = (i>=0) & (x<ends[np.clip(i, 0, None)]) if len(starts)>0 else np.zeros(width, dtype=bool)
+            row = image[r*row_height+1:(r+1)*row_height-1]
+            row[:, visible] = colors[states[i[visible]]]
+        write_png(file_name, image)
+
+
+# Write an image (an array of shape (height, width, 3) of uint8) as a PNG file
+def write_png(file_name, image):
+    height, width, _ = image.shape
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind+data) & 0xffffffff)
+    # each row of pixels is preceded by a filter type (0: none)
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, width*3)], axis=1)
+    with open(file_name, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
@@ -0,0 +1,198 @@
+# Traceability.py
+#
+# A store of per-PCB timestamps, to break down the cycle time of
+# PCBs by station (for example, the time spent waiting in the buffering
+# module versus the time spent in the reflow oven).
+#
+# The timestamps are not kept as attributes of the PCB objects. Instead,
+# each station of the line writes the times at which a PCB enters and
+# leaves it into NumPy columns (one pair of columns per station)
+# indexed by the serial_ID of the PCB:
+#   enter : time at which the station takes the PCB from its input
+#   leave : time at which the station has placed the PCB at its output
+# The time between the leave of one station and the enter of the
+# next one is spent waiting in the buffer (or on the belt) between them.
+# The creation time of each PCB is kept in a separate column.
+# The columns are preallocated for <num_PCBs> PCBs (and grown if required),
+# and hold NaN for the PCBs that have not (yet) passed a station.
+#
+# Usage:
+#   set trace_PCBs = True in AssemblyLine.py, or
+#   trace = TraceStore(num_PCBs=batch_size)
+#   station.trace = trace.add_station(station.name)   (for each station)
+#   ...run the simulation...
+#   PrintSojournTimes(trace)
+#   trace.save("traces.npz")
+#
+# The analysis functions below work on whole columns at a time,
+# so that they scale to millions of PCBs.
+#
+# NumPy is required only if the traceability store is used.
+#
+# Author: Neha Karanjkar
+
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# The columns of a single station, into which the station
+# writes the enter/leave times of PCBs.
+class StationTrace():
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    def enter(self, pcb, t):
+        serial_ID = pcb.serial_ID
+        if(serial_ID<1):
+            # PCBs added by the digital twin do not have serial IDs.
+            return
+        if(serial_ID>=len(self.store.creation)):
+            self.store.grow(serial_ID)
+        self.store.enter[self.name][serial_ID] = t
+        self.store.creation[serial_ID] = pcb.creation_timestamp
+
+    def leave(self, pcb, t):
+        serial_ID = pcb.serial_ID
+        if(serial_ID<1):
+            return
+        if(serial_ID>=len(self.store.creation)):
+            self.store.grow(serial_ID)
+        self.store.leave[self.name][serial_ID] = t
+
+
+class TraceStore():
+
+    def __init__(self, num_PCBs):
+        assert(np!=None),("NumPy is required for the traceability store")
+        assert(isinstance(num_PCBs,int) and num_PCBs>=1)
+
+        # row i of each column holds the times of the PCB with serial_ID i
+        # (row 0 is not used, as serial IDs start from 1)
+        self.num_rows = num_PCBs+1
+        self.creation = np.full(self.num_rows, np.nan)
+
+        # station names, in the order of the line,
+        # and the columns of each station
+        self.stations = []
+        self.enter = {}
+        self.leave = {}
+
+    # Add a station (at the end of the line).
+    # Returns the StationTrace into which the station writes.
+    def add_station(self, name):
+        assert(name not in self.stations),("station "+name+" added twice")
+        self.stations.append(name)
+        self.enter[name] = np.full(self.num_rows, np.nan)
+        self.leave[name] = np.full(self.num_rows, np.nan)
+        return StationTrace(self, name)
+
+    # grow all columns so that they can hold the given serial_ID
+    def grow(self, serial_ID):
+        num_rows = max(2*self.num_rows, serial_ID+1)
+        def grown(column):
+            c = np.full(num_rows, np.nan)
+            c[:len(column)] = column
+            return c
+        self.creation = grown(self.creation)
+        for name in self.stations:
+            self.enter[name] = grown(self.enter[name])
+            self.leave[name] = grown(self.leave[name])
+        self.num_rows = num_rows
+
+    # Save the columns into a (compressed) NumPy .npz file.
+    def save(self, file_name):
+        columns = {"stations":np.array(self.stations), "creation":self.creation}
+        for name in self.stations:
+            columns["enter."+name] = self.enter[name]
+            columns["leave."+name] = self.leave[name]
+        np.savez_compressed(file_name, **columns)
+
+
+# Load a store saved using TraceStore.save()
+def LoadTraces(file_name):
+    assert(np!=None),("NumPy is required for the traceability store")
+    with np.load(file_name) as columns:
+        store = TraceStore(num_PCBs=len(columns["creation"])-1)
+        store.creation = columns["creation"]
+        for name in columns["stations"]:
+            name = str(name)
+            store.add_station(name)
+            store.enter[name] = columns["enter."+name]
+            store.leave[name] = columns["leave."+name]
+    return store
+
+
+#===============================================
+# Analysis
+#===============================================
+
+# time spent by each PCB in a station (from enter to leave),
+# for the PCBs that have left it. Returns (serial_IDs, sojourn times).
+def GetSojournTimes(store, station):
+    sojourn = store.leave[station] - store.enter[station]
+    serial_IDs = np.nonzero(~np.isnan(sojourn))[0]
+    return serial_IDs, sojourn[serial_IDs]
+
+# time spent by each PCB waiting at the input of a station:
+# from the time it left the previous station (or was created, for
+# the first station) to the time it entered this station.
+def GetWaitingTimes(store, station):
+    i = store.stations.index(station)
+    previous = store.leave[store.stations[i-1]] if i>0 else store.creation
+    waiting = store.enter[station] - previous
+    serial_IDs = np.nonzero(~np.isnan(waiting))[0]
+    return serial_IDs, waiting[serial_IDs]
+
+# Summary statistics (count, mean, percentiles and max)
+# of the waiting and sojourn times at each station.
+# Returns a list of (station, "waiting"/"sojourn", stats)
+def GetSummary(store, percentiles=(50, 95, 99)):
+    summary = []
+    for station in store.stations:
+        for kind, get_times in [("waiting", GetWaitingTimes), ("sojourn", GetSojournTimes)]:
+            serial_IDs, times = get_times(store, station)
+            if(len(times)==0):
+                continue
+            stats = {"count":len(times), "mean":float(np.mean(times)), "max":float(np.max(times))}
+            for p, value in zip(percentiles, np.percentile(times, percentiles)):
+                stats["p%d"%p] = float(value)
+            summary.append((station, kind, stats))
+    return summary
+
+# PCBs whose sojourn time in a station is unusually long,
+# i.e. more than <factor> interquartile ranges above the upper quartile.
+# (For example, PCBs that were starved at the bottom of a bank
+# of the buffering module in the "LIFO" mode.)
+# Returns (serial_IDs, sojourn times), longest first.
+def GetOutliers(store, station="buffering_module", factor=3.0):
+    serial_IDs, sojourn = GetSojournTimes(store, station)
+    if(len(sojourn)==0):
+        return serial_IDs, sojourn
+    q1, q3 = np.percentile(sojourn, [25, 75])
+    threshold = q3 + factor*(q3-q1)
+    outliers = np.nonzero(sojourn>threshold)[0]
+    order = outliers[np.argsort(-sojourn[outliers], kind="stable")]
+    return serial_IDs[order], sojourn[order]
+
+
+# Print the waiting and sojourn times at each station (in seconds),
+# and the outliers in the buffering module.
+def PrintSojournTimes(store, file=None):
+    file = file if file!=None else sys.stdout
+    print("\n================================", file=file)
+    print("Time spent by PCBs at each station (seconds):", file=file)
+    print("================================", file=file)
+    print("%-30s %-8s %10s %10s %10s %10s %10s %10s"%("station", "", "PCBs", "mean", "p50", "p95", "p99", "max"), file=file)
+    for station, kind, s in GetSummary(store):
+        print("%-30s %-8s %10d %10.1f %10.1f %10.1f %10.1f %10.1f"%(station, kind, s["count"], s["mean"], s["p50"], s["p95"], s["p99"], s["max"]), file=file)
+    if("buffering_module" in store.stations):
+        serial_IDs, sojourn = GetOutliers(store, "buffering_module")
+        print("Outliers in buffering_module:", len(serial_IDs), "PCBs", file=file)
+        for serial_ID, t in list(zip(serial_IDs, sojourn))[:10]:
+            print("   PCB serial_ID=%d spent %0.1f seconds"%(serial_ID, t), file=file)
@@ -0,0 +1,57 @@
+# TravelTimes.py
+#
+# A precomputed matrix of the times (in seconds) required by a
+# human operator to walk between any two stations (machines) on the shop floor.
+# The matrix is computed once, from the (x,y) positions of the stations
+# (in metres) and the walking speed of the operators, so that each lookup
+# during the simulation costs O(1).
+#
+# Travel times are rounded up to an integer number of seconds
+# (see the timing convention in README.txt).
+#
+# Usage:
+#   travel_times = TravelTimes(station_positions={"screen_printer":(0,0), "pick_and_place_1":(6,0)}, walking_speed=1.0)
+#   travel_times.get_travel_time("screen_printer","pick_and_place_1")  # --> 6
+#
+# Author: Neha Karanjkar
+
+import math
+
+
+class TravelTimes():
+
+    def __init__(self, station_positions, walking_speed=1.0):
+        assert(walking_speed>0)
+
+        self.stations = list(station_positions.keys())
+        self.walking_speed = walking_speed
+
+        # index of each station in the matrix
+        self.index = {}
+        for i in range(len(self.stations)):
+            self.index[self.stations[i]] = i
+
+        # precompute the travel-time matrix
+        self.matrix = []
+        for s1 in self.stations:
+            row = []
+            x1, y1 = station_positions[s1]
+            for s2 in self.stations:
+                x2, y2 = station_positions[s2]
+                distance = math.sqrt((x2-x1)**2 + (y2-y1)**2)
+                row.append(int(math.ceil(distance/walking_speed)))
+            self.matrix.append(row)
+
+    # time (in seconds) to walk from station <source> to station <destination>.
+    # An operator with no known location (source=None) incurs no travel time.
+    def get_travel_time(self, source, destination):
+        if(source==None or source==destination):
+            return 0
+        return self.matrix[self.index[source]][self.index[destination]]
+
+    # print the travel-time matrix
+    def print_matrix(self):
+        width = max([len(s) for s in self.stations])
+        print(" "*width, " ".join(["%*s"%(width, s) for s in self.stations]))
+        for i in range(len(self.stations)):
+            print("%*s"%(width, self.stations[i]), " ".join(["%*d"%(width, t) for t in self.matrix[i]]))
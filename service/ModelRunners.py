@@ -0,0 +1,181 @@
+# ModelRunners.py
+#
+# Functions that run a single simulation job
+# inside a (warm) worker process of the SMT service.
+#
+# The two models (../model and ../model_2) use modules with the same names,
+# so a worker process serves only one of them. When a worker starts,
+# it adds the directory of its model to sys.path and imports SimPy and
+# the model modules once (see load_model). Each job then only has to
+# build and run the model.
+#
+# Jobs and results are plain dictionaries (that can be sent as JSON):
+#
+#   model  : {"model":"model", "simulation_time":3600,
+#             "parameters":{"screen_printer":{"delay":12}, ...}}
+#             (parameters can also be given in the format of
+#              SMT_simulation.model_parameters)
+#
+#   model_2: {"model":"model_2",
+#             "parameters":{"batch_size":1024, "buffer_capacity_per_stage":32, ...}}
+#             (any of the simulation parameters listed in AssemblyLine.PARAMETERS.
+#              Other names, such as the names of output files, are rejected)
+#
+# The results of a model_2 job are
+#   {"model":"model_2", "kpis":{<name>:<value>}, "flow_stats":{<name>:{...}}, "line_WIP":{...}, "report":...}
+# with the names of the KPIs given by AssemblyLine.RESULT_NAMES, the statistics of each
+# buffer, conveyor belt and buffering module keyed by its name, and the WIP of the line
+# (see AssemblyLine.GetFlowStats).
+#
+# Author: Neha Karanjkar
+
+import os
+import sys
+import ast
+import traceback
+import contextlib
+from io import StringIO
+
+
+MODEL_DIRS = {
+    "model"   : os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model"),
+    "model_2" : os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "model_2"),
+}
+
+# The model loaded by this worker process:
+loaded_model = {"name":None, "module":None, "defaults":None}
+
+# names of the simulation parameters of model_2 that jobs can set
+# (read without importing the model, see get_parameter_names)
+model_2_parameter_names = []
+
+
+# import the modules of a model into this process.
+def load_model(model_name):
+    assert(model_name in MODEL_DIRS),("unknown model "+str(model_name))
+    assert(loaded_model["name"]==None or loaded_model["name"]==model_name)
+    if(loaded_model["name"]==model_name):
+        return
+    sys.path.insert(0, os.path.abspath(MODEL_DIRS[model_name]))
+    if(model_name=="model"):
+        import SMT_simulation
+        loaded_model["module"] = SMT_simulation
+    else:
+        import AssemblyLine
+        loaded_model["module"] = AssemblyLine
+        # default values of the simulation parameters,
+        # to be restored before each job.
+        loaded_model["defaults"] = AssemblyLine.GetParameters()
+    loaded_model["name"] = model_name
+
+
+# Names of the simulation parameters of model_2 (AssemblyLine.PARAMETERS).
+# The list is read from the source of AssemblyLine.py, so that the
+# front-end can check jobs without importing the model (the workers
+# of both models are forked from it, and the models use modules with the same names)
+def get_parameter_names():
+    if(len(model_2_parameter_names)==0):
+        with open(os.path.join(MODEL_DIRS["model_2"], "AssemblyLine.py")) as f:
+            tree = ast.parse(f.read())
+        for node in tree.body:
+            if(isinstance(node, ast.Assign) and any([isinstance(t, ast.Name) and t.id=="PARAMETERS" for t in node.targets])):
+                model_2_parameter_names.extend(ast.literal_eval(node.value))
+    return model_2_parameter_names
+
+
+# Check a job before it is queued. Raises a ValueError
+# if the job sets parameters that are not simulation parameters.
+def check_job(job):
+    if(job.get("model","model_2")!="model_2"):
+        return
+    parameters = job.get("parameters",{})
+    if(not isinstance(parameters, dict)):
+        raise ValueError("parameters should be a JSON object")
+    unknown = [name for name in parameters if name not in get_parameter_names()]
+    if(len(unknown)!=0):
+        raise ValueError("unknown parameters: "+", ".join(sorted([str(name) for name in unknown])))
+
+
+# distribution specs such as ["lognormal", 85, 10]
+# arrive as lists in JSON, but are expected as tuples.
+def to_spec(value):
+    if(isinstance(value,list) and len(value)>=1 and isinstance(value[0],str)):
+        return tuple(value)
+    if(isinstance(value,dict)):
+        return dict([(k,to_spec(v)) for k,v in value.items()])
+    return value
+
+
+# run a job in this worker process. Returns a dictionary
+# with the results, or with an "error" message.
+def run_job(job):
+    try:
+        model_name = job.get("model","model_2")
+        load_model(model_name)
+        if(model_name=="model"):
+            return run_model_job(job)
+        else:
+            return run_model_2_job(job)
+    except Exception:
+        return {"error":traceback.format_exc()}
+
+
+def run_model_job(job):
+    SMT_simulation = loaded_model["module"]
+    simulation_time = int(job.get("simulation_time", 3600))
+    assert(simulation_time>=2),("simulation_time should be at least 2 seconds")
+
+    simulator = SMT_simulation.SMT_simulation()
+    parameter_values = {}
+    for machine_id, parameters in job.get("parameters",{}).items():
+        assert(machine_id in simulator.model_parameters),("unknown machine "+str(machine_id))
+        parameter_values[machine_id] = {}
+        for param, value in parameters.items():
+            assert(param in simulator.model_parameters[machine_id]["parameters"]),("unknown parameter "+machine_id+"."+str(param))
+            # accept either {"param":value} or {"param":{"value":value, ...}}
+            if(isinstance(value,dict)):
+                value = value["value"]
+            parameter_values[machine_id][param] = value
+    simulator.set_parameter_values(parameter_values)
+
+    # keep the final snapshot of the KPIs
+    kpis = {}
+    def save_snapshot(simulated_time, num_pcbs_completed, get_snapshot):
+        if(simulated_time >= simulation_time):
+            kpis.update(get_snapshot())
+        return True
+
+    original_stdout = sys.stdout
+    try:
+        results_string = simulator.run_simulation(simulation_time, False, progress_callback=save_snapshot, progress_step=simulation_time)
+    finally:
+        sys.stdout = original_stdout
+    return {"model":"model", "kpis":kpis, "report":results_string.getvalue()}
+
+
+def run_model_2_job(job):
+    AssemblyLine = loaded_model["module"]
+    defaults = loaded_model["defaults"]
+
+    # restore the default values, then apply the parameters of this job
+    # (only the simulation parameters can be set. check_job() has been
+    # called by the front-end, and SetParameters checks the names again)
+    check_job(job)
+    AssemblyLine.SetParameters(defaults)
+    AssemblyLine.SetParameters(dict([(name, to_spec(value)) for name, value in job.get("parameters",{}).items()]))
+
+    # run the line (the activity log is not printed)
+    with open(os.devnull, "w") as f, contextlib.redirect_stdout(f):
+        line = AssemblyLine.BuildAssemblyLine(AssemblyLine.CreateEnvironment())
+        line.env.run(until=AssemblyLine.GetEndEvent(line))
+
+    # GetResults prints the report into sys.stdout.
+    flow_stats = AssemblyLine.GetFlowStats(line)
+    report = StringIO()
+    with contextlib.redirect_stdout(report):
+        result = AssemblyLine.GetResults(line)
+
+    assert(len(result)==len(AssemblyLine.RESULT_NAMES))
+    kpis = dict(zip(AssemblyLine.RESULT_NAMES, result))
+    return {"model":"model_2", "kpis":kpis, "flow_stats":flow_stats["elements"], "line_WIP":flow_stats["line"],
+            "report":report.getvalue()}
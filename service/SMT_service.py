@@ -0,0 +1,286 @@
+# SMT_service.py
+#
+# A headless HTTP/JSON service for running simulations
+# of the SMT assembly line models (../model and ../model_2).
+#
+# Architecture:
+#   * A pool of worker processes is forked when the service starts
+#     (<num_workers> per model). Each worker imports SimPy and the modules of
+#     its model once, and then runs jobs received over a pipe
+#     (see ModelRunners.py). Thus the start-up cost is paid only once.
+#   * Submitted jobs wait in a bounded queue (one per model).
+#     When the queue is full, new jobs are rejected with
+#     "503 Service Unavailable" (backpressure), and the client may retry later.
+#   * The front-end is a small HTTP server built on asyncio.
+#     It never blocks on a simulation: it only exchanges messages
+#     with the workers, and waits for their results asynchronously.
+#   * If a worker process dies, its job fails with an error
+#     and the worker is replaced.
+#
+# API (all bodies are JSON):
+#   POST /jobs             submit a job (see ModelRunners.py for the format).
+#                          returns {"job_id":...} with status 202.
+#                          With "?wait=1", waits and returns the job with its results.
+#   GET  /jobs/<job_id>    returns the job: {"job_id", "status", "result"}
+#                          status is one of "queued", "running", "done", "error"
+#   GET  /status           returns the number of workers and queued jobs.
+#
+# Usage:
+#   $ python3 SMT_service.py --port 8080 --workers 2 --queue-size 16
+#   $ curl -X POST "http://127.0.0.1:8080/jobs?wait=1" -d '{"model":"model_2","parameters":{"batch_size":256}}'
+#
+# Only the Python standard library is used (apart from the models themselves).
+#
+# Author: Neha Karanjkar
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+from collections import OrderedDict
+
+import ModelRunners
+
+
+#===============================================
+# Worker processes
+#===============================================
+
+# Function executed in a worker process:
+# load the model, then run jobs received over the pipe
+# and send back the results, until the pipe is closed.
+def worker_main(model_name, conn):
+    ModelRunners.load_model(model_name)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        conn.send(ModelRunners.run_job(job))
+
+
+class Worker():
+
+    def __init__(self, context, model_name, index):
+        self.model_name = model_name
+        self.name = model_name+"_worker_"+str(index)
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(model_name, child_conn), name=self.name)
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.num_jobs = 0
+
+    # send a job and wait (asynchronously) for its result.
+    async def run(self, job):
+        loop = asyncio.get_running_loop()
+        self.conn.send(job)
+        readable = loop.create_future()
+        loop.add_reader(self.conn.fileno(), lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            loop.remove_reader(self.conn.fileno())
+        self.num_jobs += 1
+        return self.conn.recv()
+
+    def stop(self):
+        self.conn.close()
+        self.process.join(timeout=1)
+        if(self.process.is_alive()):
+            self.process.terminate()
+
+
+#===============================================
+# The service
+#===============================================
+
+class SMT_service():
+
+    def __init__(self, num_workers=2, queue_size=16, max_finished_jobs=1000, models=("model","model_2")):
+        assert(num_workers>=1 and queue_size>=1)
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self.max_finished_jobs = max_finished_jobs
+        self.models = list(models)
+
+        # The workers are forked before the event loop starts
+        # (the "fork" start method is used where available).
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        self.workers = {}
+        for m in self.models:
+            self.workers[m] = [Worker(self.context, m, i+1) for i in range(num_workers)]
+
+        # job_id --> job (a dictionary).
+        # Finished jobs are kept in the order in which they finished,
+        # and the oldest ones are discarded when there are too many.
+        self.jobs = OrderedDict()
+        self.num_finished_jobs = 0
+        self.job_counter = itertools.count(1)
+
+        self.queues = {}
+        self.dispatchers = []
+
+    # create the job queues and start one dispatcher
+    # coroutine per worker. (to be called from within the event loop)
+    def start(self):
+        for m in self.models:
+            self.queues[m] = asyncio.Queue(maxsize=self.queue_size)
+            for i in range(len(self.workers[m])):
+                self.dispatchers.append(asyncio.ensure_future(self.dispatcher(m, i)))
+
+    def stop(self):
+        for d in self.dispatchers:
+            d.cancel()
+        for m in self.models:
+            for w in self.workers[m]:
+                w.stop()
+
+    # submit a job. Returns the job, or None if the queue is full.
+    def submit(self, request):
+        model_name = request.get("model","model_2")
+        if model_name not in self.queues:
+            raise ValueError("unknown model "+str(model_name))
+        ModelRunners.check_job(request)
+        if(self.queues[model_name].full()):
+            return None
+        job_id = str(next(self.job_counter))
+        job = {"job_id":job_id, "status":"queued", "request":request, "result":None, "finished":asyncio.Event()}
+        self.jobs[job_id] = job
+        self.queues[model_name].put_nowait(job)
+        return job
+
+    # take jobs from the queue and run them on the i'th worker of a model.
+    async def dispatcher(self, model_name, i):
+        while True:
+            job = await self.queues[model_name].get()
+            job["status"] = "running"
+            worker = self.workers[model_name][i]
+            try:
+                result = await worker.run(job["request"])
+            except (EOFError, OSError) as e:
+                # the worker process died. Replace it.
+                result = {"error":"worker "+worker.name+" failed ("+str(e)+")"}
+                worker.stop()
+                self.workers[model_name][i] = Worker(self.context, model_name, i+1)
+            job["result"] = result
+            job["status"] = "error" if "error" in result else "done"
+            job["finished"].set()
+            self.discard_old_jobs(job["job_id"])
+
+    def discard_old_jobs(self, job_id):
+        # move the finished job to the end, and remove the oldest finished jobs
+        self.jobs.move_to_end(job_id)
+        self.num_finished_jobs += 1
+        while(self.num_finished_jobs > self.max_finished_jobs):
+            for key, job in self.jobs.items():
+                if(job["finished"].is_set()):
+                    del self.jobs[key]
+                    self.num_finished_jobs -= 1
+                    break
+
+    def get_status(self):
+        status = {}
+        for m in self.models:
+            status[m] = {"workers":len(self.workers[m]), "queued_jobs":self.queues[m].qsize(),
+                    "queue_size":self.queue_size, "jobs_completed":sum([w.num_jobs for w in self.workers[m]])}
+        return status
+
+
+#===============================================
+# HTTP front-end
+#===============================================
+
+def job_to_json(job):
+    return {"job_id":job["job_id"], "status":job["status"], "result":job["result"]}
+
+
+async def send_response(writer, code, body):
+    reasons = {200:"OK", 202:"Accepted", 400:"Bad Request", 404:"Not Found", 405:"Method Not Allowed", 503:"Service Unavailable"}
+    data = json.dumps(body).encode()
+    headers = "HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: close\r\n"%(code, reasons[code], len(data))
+    if(code==503):
+        headers += "Retry-After: 1\r\n"
+    writer.write((headers+"\r\n").encode() + data)
+    await writer.drain()
+
+
+async def handle_request(service, method, path, body):
+    path, _, query = path.partition("?")
+    if(path=="/jobs" and method=="POST"):
+        try:
+            request = json.loads(body.decode() or "{}")
+            assert(isinstance(request, dict)),("the request should be a JSON object")
+            job = service.submit(request)
+        except (ValueError, AssertionError) as e:
+            return 400, {"error":str(e)}
+        if(job==None):
+            return 503, {"error":"the job queue is full, please retry later"}
+        if("wait=1" in query.split("&")):
+            await job["finished"].wait()
+            return 200, job_to_json(job)
+        return 202, {"job_id":job["job_id"]}
+    if(path.startswith("/jobs/")):
+        if(method!="GET"):
+            return 405, {"error":"method not allowed"}
+        job = service.jobs.get(path[len("/jobs/"):])
+        if(job==None):
+            return 404, {"error":"no such job"}
+        return 200, job_to_json(job)
+    if(path=="/status"):
+        return 200, service.get_status()
+    return 404, {"error":"not found"}
+
+
+async def handle_connection(service, reader, writer):
+    try:
+        request_line = await reader.readline()
+        parts = request_line.decode("latin-1").split()
+        if(len(parts)<2):
+            return
+        method, path = parts[0], parts[1]
+
+        # headers
+        content_length = 0
+        while True:
+            line = await reader.readline()
+            if(line in (b"\r\n", b"\n", b"")):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if(name.strip().lower()=="content-length"):
+                content_length = int(value.strip())
+        body = await reader.readexactly(content_length) if content_length>0 else b""
+
+        code, response = await handle_request(service, method, path, body)
+        await send_response(writer, code, response)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host, port):
+    service.start()
+    server = await asyncio.start_server(lambda r,w: handle_connection(service, r, w), host, port)
+    print("SMT service listening on http://%s:%d"%(host, port))
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="HTTP/JSON service for running SMT line simulations")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="number of worker processes per model")
+    parser.add_argument("--queue-size", type=int, default=16, help="max number of queued jobs per model")
+    args = parser.parse_args()
+
+    service = SMT_service(num_workers=args.workers, queue_size=args.queue_size)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()